@@ -7,17 +7,26 @@ Email, Estado, ...). Este adaptador traduce entre los dos y, si el CSV destino
 ya existe, agrega solo los negocios nuevos: nunca pisa el trabajo comercial ya
 hecho (Estado, Fecha contacto, Notas).
 
+Todo se procesa de a un registro: del CSV destino solo se guardan en memoria
+las claves (o, con --indice, ni eso: van a un SQLite al lado), y los negocios
+nuevos se pegan al final del archivo en un solo paso. Las filas que ya estaban
+no se reescriben, salvo que el destino tenga otras columnas que COLUMNAS.
+
 Uso:
+    python3 a_csv_comercial.py campana_gmb.jsonl --salida ../gmb/inmobiliarias-lima.csv
     python3 a_csv_comercial.py campana_gmb.json --salida ../gmb/inmobiliarias-lima.csv
     python3 a_csv_comercial.py campana_gmb.csv --servicio SEO
 """
 import argparse
 import csv
-import json
 import os
 import re
+import shutil
 import sys
 
+from progreso import IndiceClaves
+from salidas import leer_registros
+
 # Esquema exacto de la cola comercial (lucuma/comercial/generar-cola.py)
 COLUMNAS = ['Origen', 'Tipo', 'Fecha contacto', 'Nombre', 'Contacto', 'Rubro',
             'Ciudad', 'Zona', 'WhatsApp', 'Web', 'IG', 'FB', 'Email',
@@ -58,14 +67,6 @@ def clave_negocio(nombre, telefono, web):
     return f"nom:{limpio(nombre).lower()}"
 
 
-def leer_entrada(ruta):
-    if ruta.endswith('.json'):
-        with open(ruta, encoding='utf-8') as f:
-            return json.load(f)
-    with open(ruta, encoding='utf-8-sig') as f:
-        return list(csv.DictReader(f))
-
-
 def a_fila(reg, servicio=''):
     telefono = normalizar_telefono(reg.get('phone'))
     web = limpio(reg.get('website'))
@@ -100,75 +101,169 @@ def a_fila(reg, servicio=''):
     }
 
 
+def encabezado(ruta):
+    with open(ruta, encoding='utf-8-sig', newline='') as f:
+        return next(csv.reader(f), None)
+
+
+def filas_destino(ruta):
+    with open(ruta, encoding='utf-8-sig', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def claves_previas(ruta, ruta_indice=None):
+    """Claves de los prospectos que ya estan en `ruta`: (claves, cuantas filas).
+
+    Sin indice es un set. Con indice, las claves quedan en SQLite y solo se
+    releen si el CSV cambio desde la ultima vez (tamano o fecha distintos: el
+    equipo comercial lo edita a mano).
+    """
+    if ruta_indice is None:
+        claves, filas = set(), 0
+        if os.path.exists(ruta):
+            for r in filas_destino(ruta):
+                claves.add(clave_negocio(r.get('Nombre'), r.get('WhatsApp'), r.get('Web')))
+                filas += 1
+        return claves, filas
+
+    indice = IndiceClaves(ruta_indice)
+    st = os.stat(ruta) if os.path.exists(ruta) else None
+    firma = {'bytes': st.st_size, 'mtime_ns': st.st_mtime_ns} if st else {'bytes': 0, 'mtime_ns': 0}
+    if indice.meta('filas', None) is None or any(indice.meta(k, None) != v
+                                                 for k, v in firma.items()):
+        indice.vaciar()
+        filas = [0]
+
+        def claves():
+            for r in filas_destino(ruta):
+                filas[0] += 1
+                yield clave_negocio(r.get('Nombre'), r.get('WhatsApp'), r.get('Web'))
+
+        indice.agregar(claves() if st else (), **firma)
+        # Recien ahora se sabe cuantas filas eran; hasta aca el indice no vale
+        indice.agregar((), filas=filas[0])
+    return indice, indice.meta('filas')
+
+
+def anexar(ruta, temporal):
+    """Pega `temporal` al final de `ruta` en un solo paso.
+
+    Si algo falla a mitad de camino, `ruta` vuelve al tamano que tenia: nunca
+    queda una fila cortada en la cola comercial.
+    """
+    tamano = os.path.getsize(ruta)
+    try:
+        with open(ruta, 'ab') as destino, open(temporal, 'rb') as origen:
+            if tamano:
+                with open(ruta, 'rb') as f:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        destino.write(b'\r\n')
+            shutil.copyfileobj(origen, destino)
+            destino.flush()
+            os.fsync(destino.fileno())
+    except BaseException:
+        with open(ruta, 'rb+') as f:
+            f.truncate(tamano)
+        raise
+    finally:
+        os.remove(temporal)
+
+
 def main():
     p = argparse.ArgumentParser(description='Salida del scraper -> CSV de la cola comercial')
-    p.add_argument('entrada', help='campana_gmb.json o .csv del scraper')
+    p.add_argument('entrada', help='campana_gmb.jsonl, .json o .csv del scraper')
     p.add_argument('--salida', default='prospectos-gmb.csv')
     p.add_argument('--servicio', default='', help='servicio a ofrecer (ej: SEO)')
     p.add_argument('--min-rating', type=float, default=0)
     p.add_argument('--solo-con-contacto', action='store_true',
                    help='descartar negocios sin telefono ni email')
+    p.add_argument('--indice', nargs='?', const='', default=None,
+                   help='guardar las claves del CSV destino en un indice SQLite en vez de en '
+                        'memoria, para colas de millones de filas (por defecto <salida>.idx.sqlite)')
     args = p.parse_args()
 
     if not os.path.exists(args.entrada):
         print(f"No existe {args.entrada}")
         return 1
 
-    registros = leer_entrada(args.entrada)
-    print(f"{len(registros)} fichas leidas de {args.entrada}")
+    ruta_indice = None
+    if args.indice is not None:
+        ruta_indice = args.indice or os.path.splitext(args.salida)[0] + '.idx.sqlite'
 
     # Lo que ya esta en el CSV destino no se toca ni se repite
-    existentes, claves_previas = [], set()
-    if os.path.exists(args.salida):
-        with open(args.salida, encoding='utf-8-sig') as f:
-            existentes = list(csv.DictReader(f))
-        for r in existentes:
-            claves_previas.add(clave_negocio(r.get('Nombre'), r.get('WhatsApp'), r.get('Web')))
-        print(f"{len(existentes)} prospectos ya en {args.salida} (se conservan tal cual)")
-
-    nuevas, descartadas, repetidas = [], 0, 0
-    vistas = set(claves_previas)
-
-    for reg in registros:
-        if not limpio(reg.get('name')):
-            descartadas += 1
-            continue
-
-        try:
-            if args.min_rating and float(reg.get('rating') or 0) < args.min_rating:
+    existe = os.path.exists(args.salida)
+    previas, n_previas = claves_previas(args.salida, ruta_indice)
+    if existe:
+        print(f"{n_previas} prospectos ya en {args.salida} (se conservan tal cual)")
+    # Destino con otras columnas (version vieja): hay que reescribirlo entero
+    reescribir = existe and encabezado(args.salida) != COLUMNAS
+
+    leidas, nuevas, descartadas, repetidas = 0, 0, 0, 0
+    con_email = con_tel = 0
+    claves_nuevas = set()
+
+    temporal = args.salida + '.tmp'
+    bom = 'utf-8' if existe and not reescribir else 'utf-8-sig'
+    with open(temporal, 'w', newline='', encoding=bom) as f:
+        escritor = csv.DictWriter(f, fieldnames=COLUMNAS, extrasaction='ignore')
+        if not existe or reescribir:
+            escritor.writeheader()
+        if reescribir:
+            for r in filas_destino(args.salida):
+                escritor.writerow({c: r.get(c, '') for c in COLUMNAS})
+
+        for reg in leer_registros(args.entrada):
+            leidas += 1
+            if not limpio(reg.get('name')):
                 descartadas += 1
                 continue
-        except (TypeError, ValueError):
-            pass
-
-        fila = a_fila(reg, args.servicio)
 
-        if args.solo_con_contacto and not (fila['WhatsApp'] or fila['Email']):
-            descartadas += 1
-            continue
+            try:
+                if args.min_rating and float(reg.get('rating') or 0) < args.min_rating:
+                    descartadas += 1
+                    continue
+            except (TypeError, ValueError):
+                pass
 
-        clave = clave_negocio(fila['Nombre'], fila['WhatsApp'], fila['Web'])
-        if clave in vistas:
-            repetidas += 1
-            continue
+            fila = a_fila(reg, args.servicio)
 
-        vistas.add(clave)
-        nuevas.append(fila)
+            if args.solo_con_contacto and not (fila['WhatsApp'] or fila['Email']):
+                descartadas += 1
+                continue
 
-    with open(args.salida, 'w', newline='', encoding='utf-8-sig') as f:
-        escritor = csv.DictWriter(f, fieldnames=COLUMNAS, extrasaction='ignore')
-        escritor.writeheader()
-        for r in existentes:
-            escritor.writerow({c: r.get(c, '') for c in COLUMNAS})
-        escritor.writerows(nuevas)
+            clave = clave_negocio(fila['Nombre'], fila['WhatsApp'], fila['Web'])
+            if clave in claves_nuevas or clave in previas:
+                repetidas += 1
+                continue
 
-    print(f"\n+{len(nuevas)} prospectos nuevos"
+            claves_nuevas.add(clave)
+            escritor.writerow(fila)
+            nuevas += 1
+            con_email += bool(fila['Email'])
+            con_tel += bool(fila['WhatsApp'])
+
+    print(f"{leidas} fichas leidas de {args.entrada}")
+
+    if existe and not reescribir:
+        if nuevas:
+            anexar(args.salida, temporal)
+        else:
+            os.remove(temporal)
+    else:
+        os.replace(temporal, args.salida)
+
+    if isinstance(previas, IndiceClaves):
+        st = os.stat(args.salida)
+        previas.agregar(claves_nuevas, bytes=st.st_size, mtime_ns=st.st_mtime_ns,
+                        filas=n_previas + nuevas)
+        previas.cerrar()
+
+    print(f"\n+{nuevas} prospectos nuevos"
           f" · {repetidas} repetidos omitidos"
           f" · {descartadas} descartados por filtros")
-    print(f"Total en {args.salida}: {len(existentes) + len(nuevas)}")
+    print(f"Total en {args.salida}: {n_previas + nuevas}")
 
-    con_email = sum(1 for r in nuevas if r['Email'])
-    con_tel = sum(1 for r in nuevas if r['WhatsApp'])
     if nuevas:
         print(f"De los nuevos: {con_tel} con telefono, {con_email} con email")
     return 0
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""Almacen de leads en SQLite: todos los negocios de todas las campanas.
+
+Hasta ahora lo scrapeado quedaba repartido entre campana_gmb.csv/.jsonl, los
+CSV por distrito, vistos.jsonl y el CSV comercial, cada uno deduplicado con su
+propia clave. Aca queda todo junto:
+
+  negocios       uno por place_id (o nombre|direccion si no hay), con los
+                 ultimos datos vistos; la dedup es un upsert por clave primaria
+  observaciones  cada vez que se abrio la ficha: rating y reviews de ese dia
+  emails         los emails de cada negocio, uno por fila
+  campanas       cada corrida de correr_campana.py, con sus parametros
+
+Exportar es una consulta:
+
+    python3 almacen.py leads.sqlite --csv san_isidro.csv --distrito "San Isidro"
+    python3 a_csv_comercial.py leads.sqlite --salida ../gmb/prospectos-gmb-peru.csv
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Columnas de negocios, con el nombre que tienen en la salida del scraper
+CAMPOS = ['name', 'rating', 'review_count', 'address', 'phone', 'website', 'category',
+          'hours', 'location', 'department', 'province', 'district', 'search_keyword']
+
+VACIOS = ('', 'N/A', 'No disponible')
+
+
+def _valor(v):
+    return None if v is None or (isinstance(v, str) and v.strip() in VACIOS) else v
+
+
+def clave_negocio(reg):
+    """La misma identidad que usa el scraper para `vistos`."""
+    return reg.get('place_id') or f"{reg.get('name', '')}|{reg.get('address', '')}".lower()
+
+
+class AlmacenLeads:
+    """Negocios, observaciones, emails y campanas en un solo SQLite."""
+
+    def __init__(self, ruta='leads.sqlite'):
+        self.ruta = ruta
+        # Lo escribe el hilo escritor y lo leen los workers al final
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        columnas = ',\n                '.join(
+            f"{c} {'REAL' if c == 'rating' else 'INTEGER' if c == 'review_count' else 'TEXT'}"
+            for c in CAMPOS)
+        self._db.executescript(f'''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS campanas (
+                id INTEGER PRIMARY KEY,
+                nombre TEXT,
+                parametros TEXT,
+                inicio TEXT,
+                fin TEXT,
+                fichas INTEGER DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS negocios (
+                place_id TEXT PRIMARY KEY,
+                {columnas},
+                primera_vez TEXT,
+                ultima_vez TEXT,
+                campana INTEGER REFERENCES campanas(id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_negocios_distrito ON negocios(district);
+            CREATE INDEX IF NOT EXISTS idx_negocios_categoria ON negocios(category);
+            CREATE INDEX IF NOT EXISTS idx_negocios_rubro ON negocios(search_keyword);
+            CREATE TABLE IF NOT EXISTS observaciones (
+                place_id TEXT NOT NULL REFERENCES negocios(place_id),
+                visto TEXT NOT NULL,
+                campana INTEGER REFERENCES campanas(id),
+                rating REAL,
+                review_count INTEGER,
+                search_keyword TEXT,
+                district TEXT,
+                PRIMARY KEY (place_id, visto)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS emails (
+                place_id TEXT NOT NULL REFERENCES negocios(place_id),
+                email TEXT NOT NULL,
+                PRIMARY KEY (place_id, email)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_emails_email ON emails(email);
+        ''')
+        self._db.commit()
+
+    # --- campanas -----------------------------------------------------------
+
+    def abrir_campana(self, nombre, **parametros):
+        """Registra una corrida y devuelve su id (para `guardar`)."""
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                'INSERT INTO campanas (nombre, parametros, inicio) VALUES (?, ?, ?)',
+                (nombre, json.dumps(parametros, ensure_ascii=False, default=str),
+                 datetime.now().isoformat(timespec='seconds')))
+        return cursor.lastrowid
+
+    def cerrar_campana(self, campana):
+        with self._lock, self._db:
+            self._db.execute(
+                'UPDATE campanas SET fin = ?, fichas = (SELECT COUNT(*) FROM observaciones '
+                'WHERE campana = ?) WHERE id = ?',
+                (datetime.now().isoformat(timespec='seconds'), campana, campana))
+
+    # --- escritura ----------------------------------------------------------
+
+    def guardar(self, registros, campana=None, visto=None):
+        """Upsert de los negocios del lote; devuelve cuantos no estaban.
+
+        Idempotente: una observacion se identifica por place_id + timestamp de
+        la ficha, asi que reaplicar un lote (DiarioCampana) no la duplica.
+        `visto` es el timestamp de los registros que no traen el suyo (por
+        defecto, ahora). Un dato que esta vez vino vacio no pisa el que ya se
+        tenia.
+        """
+        nuevos = 0
+        ahora = visto or datetime.now().isoformat(timespec='seconds')
+        actualizar = ', '.join(f"{c} = COALESCE(excluded.{c}, negocios.{c})" for c in CAMPOS)
+        with self._lock, self._db:
+            for reg in registros:
+                clave = clave_negocio(reg)
+                visto = reg.get('timestamp') or ahora
+                valores = [_valor(reg.get(c)) for c in CAMPOS]
+                existia = self._db.execute('SELECT 1 FROM negocios WHERE place_id = ?',
+                                           (clave,)).fetchone()
+                nuevos += existia is None
+                self._db.execute(
+                    f"INSERT INTO negocios (place_id, {', '.join(CAMPOS)}, primera_vez, ultima_vez, "
+                    f"campana) VALUES (?, {', '.join('?' * len(CAMPOS))}, ?, ?, ?) "
+                    f"ON CONFLICT(place_id) DO UPDATE SET {actualizar}, "
+                    f"primera_vez = MIN(negocios.primera_vez, excluded.primera_vez), "
+                    f"ultima_vez = MAX(negocios.ultima_vez, excluded.ultima_vez), "
+                    f"campana = COALESCE(excluded.campana, negocios.campana)",
+                    [clave, *valores, visto, visto, campana])
+                self._db.execute(
+                    'INSERT OR IGNORE INTO observaciones VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (clave, visto, campana, _valor(reg.get('rating')),
+                     _valor(reg.get('review_count')), _valor(reg.get('search_keyword')),
+                     _valor(reg.get('district'))))
+                emails = reg.get('emails') or []
+                if isinstance(emails, str):
+                    emails = [emails]
+                if _valor(reg.get('email')):
+                    emails = [*emails, reg['email']]
+                self._db.executemany('INSERT OR IGNORE INTO emails VALUES (?, ?)',
+                                     [(clave, e) for e in emails if _valor(e)])
+        return nuevos
+
+    # --- lectura ------------------------------------------------------------
+
+    def registros(self, distrito=None, categoria=None, rubro=None, campana=None):
+        """Negocios en el formato de la salida del scraper, filtrados por los
+        indices. Se leen de a uno: sirve de entrada para a_csv_comercial.py."""
+        condiciones, parametros = [], []
+        for columna, valor in (('district', distrito), ('category', categoria),
+                               ('search_keyword', rubro)):
+            if valor:
+                condiciones.append(f"n.{columna} = ?")
+                parametros.append(valor)
+        if campana is not None:
+            condiciones.append('n.place_id IN (SELECT place_id FROM observaciones WHERE campana = ?)')
+            parametros.append(campana)
+        donde = f"WHERE {' AND '.join(condiciones)}" if condiciones else ''
+        consulta = (f"SELECT n.*, (SELECT GROUP_CONCAT(email, char(10)) FROM emails e "
+                    f"WHERE e.place_id = n.place_id) AS lista_emails "
+                    f"FROM negocios n {donde} ORDER BY n.district, n.search_keyword, n.name")
+        # Conexion propia: la lectura no bloquea al escritor mientras se itera
+        db = sqlite3.connect(self.ruta)
+        db.row_factory = sqlite3.Row
+        try:
+            for fila in db.execute(consulta, parametros):
+                reg = {c: (fila[c] if fila[c] is not None else 'N/A') for c in CAMPOS}
+                reg['place_id'] = fila['place_id']
+                emails = sorted(fila['lista_emails'].split('\n')) if fila['lista_emails'] else []
+                reg['emails'] = emails
+                reg['email'] = emails[0] if emails else 'N/A'
+                reg['timestamp'] = fila['ultima_vez']
+                yield reg
+        finally:
+            db.close()
+
+    def exportar_csv(self, ruta, **filtros):
+        """CSV con las columnas del scraper; devuelve cuantas filas escribio."""
+        total = 0
+        with open(ruta, 'w', newline='', encoding='utf-8-sig') as f:
+            escritor = csv.DictWriter(f, fieldnames=['place_id', *CAMPOS, 'email', 'emails',
+                                                     'timestamp'])
+            escritor.writeheader()
+            for reg in self.registros(**filtros):
+                escritor.writerow(dict(reg, emails='; '.join(reg['emails'])))
+                total += 1
+        return total
+
+    def resumen(self):
+        with self._lock:
+            contar = lambda tabla: self._db.execute(f'SELECT COUNT(*) FROM {tabla}').fetchone()[0]
+            return {
+                'negocios': contar('negocios'),
+                'observaciones': contar('observaciones'),
+                'con_email': self._db.execute(
+                    'SELECT COUNT(DISTINCT place_id) FROM emails').fetchone()[0],
+                'campanas': contar('campanas'),
+            }
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
+
+
+def main():
+    p = argparse.ArgumentParser(description='Consultas y exportaciones del almacen de leads')
+    p.add_argument('almacen', help='leads.sqlite')
+    p.add_argument('--csv', help='exportar los negocios (con los filtros) a este CSV')
+    p.add_argument('--distrito')
+    p.add_argument('--categoria')
+    p.add_argument('--rubro', help='termino buscado (search_keyword)')
+    p.add_argument('--campana', type=int, help='solo los negocios vistos en esa campana (id)')
+    p.add_argument('--importar', nargs='+', metavar='ARCHIVO',
+                   help='cargar salidas previas del scraper (.jsonl, .json o .csv)')
+    args = p.parse_args()
+
+    almacen = AlmacenLeads(args.almacen)
+    if args.importar:
+        from salidas import leer_registros
+        for ruta in args.importar:
+            # Un CSV viejo no trae timestamp: se usa la fecha del archivo, asi
+            # importarlo dos veces no duplica sus observaciones
+            visto = datetime.fromtimestamp(os.path.getmtime(ruta)).isoformat(timespec='seconds')
+            nuevos = almacen.guardar(leer_registros(ruta), visto=visto)
+            print(f"  {ruta}: {nuevos} negocios nuevos")
+
+    if args.csv:
+        total = almacen.exportar_csv(args.csv, distrito=args.distrito, categoria=args.categoria,
+                                     rubro=args.rubro, campana=args.campana)
+        print(f"{total} negocios exportados a {args.csv}")
+
+    r = almacen.resumen()
+    print(f"{args.almacen}: {r['negocios']} negocios ({r['con_email']} con email), "
+          f"{r['observaciones']} observaciones, {r['campanas']} campanas")
+    almacen.cerrar()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""Benchmark de extraccion de punta a punta contra las fixtures locales.
+
+Levanta servidor_fixtures.py, apunta GMBScraper.URL_MAPS a el y corre el
+scraper REAL (Chrome incluido) con un Ritmo sin pausas ni tope: lo que queda
+es el costo propio del scraper. Reporta por etapa (llamadas, mediana, p90 y
+comandos WebDriver), comandos WebDriver por ficha, fichas/minuto y si los
+campos extraidos coinciden con los esperados de negocios.json.
+
+Con --json el resultado se guarda junto al commit (`git describe`); con
+--comparar se contrasta contra otro resultado y se sale con 1 si algo empeoro
+mas que --tolerancia, para poder correrlo antes de mergear.
+
+Uso:
+  python3 benchmarks/bench_extraccion.py --json bench_base.json
+  python3 benchmarks/bench_extraccion.py --comparar bench_base.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gmb_scraper_lite import GMBScraper  # noqa: E402
+from ritmo import Ritmo  # noqa: E402
+from servidor_fixtures import ServidorFixtures  # noqa: E402
+
+# Metodos del scraper que se miden; los tiempos son inclusivos (una ficha
+# por URL incluye la lectura del panel y, sin --web-async, la web)
+ETAPAS = [
+    'init_driver',
+    'search_business',
+    'recolectar_candidatos',
+    '_leer_listado',
+    'extraer_desde_url',
+    'extraer_en_pestanas',
+    '_extraer_datos_ficha',
+    '_lugares_red',
+    '_leer_ficha_red',
+    '_ficha_red_de_pagina',
+    '_leer_ficha_js',
+    '_leer_ficha_selenium',
+    'extract_hours',
+    '_html_panel',
+    'extract_emails_from_website',
+    '_emails_from_html',
+    '_find_contact_urls',
+]
+
+CAMPOS_VERIFICADOS = ['name', 'rating', 'review_count', 'address', 'phone',
+                      'website', 'category', 'hours', 'emails']
+
+
+class Medidor:
+    """Cronometra metodos del scraper y cuenta los comandos a chromedriver."""
+
+    def __init__(self):
+        self.tiempos = defaultdict(list)
+        self.comandos_etapa = defaultdict(int)
+        self.comandos = 0
+        self.por_comando = Counter()
+
+    def envolver(self, scraper, nombre):
+        # Atributo de instancia: las llamadas internas (self.metodo) tambien pasan
+        original = getattr(scraper, nombre)
+
+        def medido(*args, **kwargs):
+            inicio, antes = time.perf_counter(), self.comandos
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.tiempos[nombre].append(time.perf_counter() - inicio)
+                self.comandos_etapa[nombre] += self.comandos - antes
+
+        setattr(scraper, nombre, medido)
+
+    def contar_comandos(self, driver):
+        # WebElement tambien manda sus comandos por driver.execute
+        original = driver.execute
+
+        def execute(comando, params=None):
+            self.comandos += 1
+            self.por_comando[comando] += 1
+            return original(comando, params)
+
+        driver.execute = execute
+
+    def etapas(self):
+        resumen = {}
+        for nombre in ETAPAS:
+            tiempos = self.tiempos.get(nombre)
+            if not tiempos:
+                continue
+            ordenados = sorted(tiempos)
+            resumen[nombre] = {
+                'llamadas': len(tiempos),
+                'mediana_ms': round(statistics.median(tiempos) * 1000, 1),
+                'p90_ms': round(ordenados[int(0.9 * (len(ordenados) - 1))] * 1000, 1),
+                'total_s': round(sum(tiempos), 3),
+                'comandos_por_llamada': round(self.comandos_etapa[nombre] / len(tiempos), 1),
+            }
+        return resumen
+
+
+def version_codigo():
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], cwd=RAIZ,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except Exception:
+        return 'desconocida'
+
+
+def verificar(servidor, resultados):
+    """Compara cada ficha extraida con lo esperado; devuelve (ok, total, errores)."""
+    slug_de = {place_id: slug for slug, place_id, _, _ in servidor.fichas()}
+    ok, total, errores = 0, 0, []
+    for r in resultados:
+        esperado = servidor.esperado(slug_de.get(r.get('place_id'), ''))
+        if esperado is None:
+            continue  # captura grabada: no hay valores de referencia
+        total += 1
+        obtenido = dict(r, emails=sorted(r.get('emails') or []))
+        diferencias = {c: [obtenido.get(c), esperado[c]] for c in CAMPOS_VERIFICADOS
+                       if obtenido.get(c) != esperado[c]}
+        if diferencias:
+            errores.append({'place_id': r.get('place_id'), 'diferencias': diferencias})
+        else:
+            ok += 1
+    return ok, total, errores
+
+
+def correr(args):
+    servidor = ServidorFixtures(latencia=args.latencia / 1000, snapshots=args.snapshots).iniciar()
+    medidor = Medidor()
+
+    s = GMBScraper(headless=not args.visible)
+    s.URL_MAPS = servidor.url_maps
+    # Sin pausas humanas ni tope: solo se espera a que cada pagina este lista
+    s.ritmo = Ritmo(escala=0, por_minuto=0, por_hora=0)
+    s.motor_ficha = args.motor
+    s.pestanas = args.pestanas
+    s.ligero = args.ligero
+    for nombre in ETAPAS:
+        medidor.envolver(s, nombre)
+
+    if args.web_async:
+        from enriquecedor_web import EnriquecedorEmails
+        s.enriquecedor = EnriquecedorEmails(s, concurrencia=8, pausa_host=(0, 0))
+
+    resultados = []
+    try:
+        s.init_driver()
+        medidor.contar_comandos(s.driver)
+        comandos_inicio = medidor.comandos
+
+        inicio = time.perf_counter()
+        for ronda in range(args.rondas):
+            # Cada ronda vuelve a extraer las mismas fichas
+            s.vistos = set()
+            s.results = []
+            lote = s.search_location('estudio contable', 'Lima', 'Lima', 'San Isidro',
+                                     max_results=args.fichas)
+            if s.enriquecedor is not None:
+                s.enriquecedor.esperar(lote)
+            resultados.extend(lote)
+            print(f"  ronda {ronda + 1}/{args.rondas}: {len(lote)} fichas")
+        segundos = time.perf_counter() - inicio
+    finally:
+        if s.enriquecedor is not None:
+            s.enriquecedor.cerrar()
+        try:
+            s.close()
+        except Exception:
+            pass
+        servidor.cerrar()
+
+    fichas = len(resultados)
+    comandos = medidor.comandos - comandos_inicio
+    ok, total, errores = verificar(servidor, resultados)
+    return {
+        'version': version_codigo(),
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'parametros': {'motor': args.motor, 'pestanas': args.pestanas, 'fichas': args.fichas,
+                       'rondas': args.rondas, 'latencia_ms': args.latencia,
+                       'web_async': args.web_async, 'ligero': args.ligero},
+        'fichas': fichas,
+        'segundos': round(segundos, 2),
+        'fichas_por_minuto': round(fichas / segundos * 60, 1) if segundos else 0.0,
+        'kb_por_ficha': round(servidor.bytes_servidos / 1024 / fichas, 1) if fichas else 0.0,
+        'comandos_por_ficha': round(comandos / fichas, 1) if fichas else 0.0,
+        'comandos_mas_usados': dict(medidor.por_comando.most_common(8)),
+        'etapas': medidor.etapas(),
+        'correctas': ok,
+        'verificadas': total,
+        'errores': errores[:10],
+    }
+
+
+def imprimir(r):
+    p = r['parametros']
+    print(f"\n=== {r['version']}  motor={p['motor']} pestanas={p['pestanas']} "
+          f"web_async={p['web_async']} ligero={p.get('ligero', False)} "
+          f"latencia={p['latencia_ms']}ms ===")
+    print(f"{r['fichas']} fichas en {r['segundos']}s -> {r['fichas_por_minuto']} fichas/min, "
+          f"{r['comandos_por_ficha']} comandos WebDriver por ficha, "
+          f"{r.get('kb_por_ficha', 0)} KB servidos por ficha")
+    print(f"Campos correctos en {r['correctas']}/{r['verificadas']} fichas")
+    for e in r['errores']:
+        print(f"  DIFERENTE {e['place_id']}: {e['diferencias']}")
+    print(f"\n{'etapa':30} {'llamadas':>8} {'mediana':>9} {'p90':>9} {'cmd/llamada':>12}")
+    for nombre, e in r['etapas'].items():
+        print(f"{nombre:30} {e['llamadas']:8} {e['mediana_ms']:7.1f}ms {e['p90_ms']:7.1f}ms "
+              f"{e['comandos_por_llamada']:12}")
+
+
+def comparar(actual, base, tolerancia):
+    """Imprime las diferencias contra `base`; devuelve cuantas metricas empeoraron."""
+    # (nombre, valor actual, valor base, +1 si mas es mejor / -1 si menos es mejor)
+    metricas = [
+        ('fichas_por_minuto', actual['fichas_por_minuto'], base['fichas_por_minuto'], 1),
+        ('comandos_por_ficha', actual['comandos_por_ficha'], base['comandos_por_ficha'], -1),
+    ]
+    if 'kb_por_ficha' in base:
+        metricas.append(('kb_por_ficha', actual['kb_por_ficha'], base['kb_por_ficha'], -1))
+    for nombre, e in actual['etapas'].items():
+        if nombre in base.get('etapas', {}):
+            metricas.append((f"{nombre} (mediana ms)", e['mediana_ms'],
+                             base['etapas'][nombre]['mediana_ms'], -1))
+
+    if actual['parametros'] != base.get('parametros'):
+        print(f"\nAVISO: parametros distintos a la base {base.get('parametros')}")
+
+    print(f"\n=== {actual['version']} contra {base.get('version')} (tolerancia {tolerancia:.0f}%) ===")
+    peores = 0
+    for nombre, ahora, antes, sentido in metricas:
+        cambio = (ahora - antes) / antes * 100 if antes else 0.0
+        empeoro = cambio * sentido < -tolerancia
+        peores += empeoro
+        print(f"{nombre:40} {antes:10} -> {ahora:10} ({cambio:+6.1f}%)"
+              f"{'  PEOR' if empeoro else ''}")
+
+    if actual['correctas'] < base.get('correctas', 0):
+        print(f"Campos correctos: {base['correctas']} -> {actual['correctas']}  PEOR")
+        peores += 1
+    return peores
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark del scraper contra fixtures locales')
+    parser.add_argument('--fichas', type=int, default=10, help='Fichas por busqueda')
+    parser.add_argument('--rondas', type=int, default=3, help='Busquedas a repetir')
+    parser.add_argument('--motor', choices=['js', 'selenium', 'red'], default='js')
+    parser.add_argument('--pestanas', type=int, default=1)
+    parser.add_argument('--web-async', action='store_true',
+                        help='Webs de negocios con el EnriquecedorEmails en segundo plano')
+    parser.add_argument('--ligero', action='store_true',
+                        help='Modo ligero: sin teselas, fotos, fuentes, video ni trackers')
+    parser.add_argument('--latencia', type=float, default=0,
+                        help='Milisegundos agregados a cada respuesta del servidor')
+    parser.add_argument('--snapshots', help='Servir tambien las capturas grabadas de esta carpeta')
+    parser.add_argument('--visible', action='store_true', help='Chrome con ventana')
+    parser.add_argument('--json', help='Guardar el resultado en este archivo')
+    parser.add_argument('--comparar', help='Resultado previo (--json) contra el cual comparar')
+    parser.add_argument('--tolerancia', type=float, default=15,
+                        help='Porcentaje de empeoramiento aceptado al comparar')
+    args = parser.parse_args()
+
+    resultado = correr(args)
+    imprimir(resultado)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"\nResultado guardado en {args.json}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+        if comparar(resultado, base, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
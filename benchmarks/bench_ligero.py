@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""Modo ligero contra las fixtures: bytes y tiempo de carga por ficha.
+
+Abre cada ficha del servidor local con el navegador normal y con
+`GMBScraper.ligero`, y cuenta lo que el servidor tuvo que mandar (la pagina
+mas las teselas, fotos, street view, fuentes, video y trackers que pide) y lo
+que tardo el evento load. Tambien comprueba que la ficha se siga leyendo igual:
+bloquear de mas no puede costar campos.
+
+Uso:
+  python3 benchmarks/bench_ligero.py
+  python3 benchmarks/bench_ligero.py --latencia 80 --rondas 3
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gmb_scraper_lite import GMBScraper  # noqa: E402
+from servidor_fixtures import ServidorFixtures  # noqa: E402
+
+CAMPOS_VERIFICADOS = ['name', 'rating', 'review_count', 'address', 'phone',
+                      'website', 'category', 'hours']
+
+
+def esperar_quietud(servidor, quieto=0.3, maximo=3.0):
+    """Espera a que el servidor deje de mandar bytes (video y scripts async
+    siguen bajando despues del load)."""
+    limite = time.monotonic() + maximo
+    anterior, desde = servidor.bytes_servidos, time.monotonic()
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        if servidor.bytes_servidos != anterior:
+            anterior, desde = servidor.bytes_servidos, time.monotonic()
+        elif time.monotonic() - desde >= quieto:
+            break
+
+
+def medir_modo(servidor, ligero, rondas, visible):
+    """{slug: {'bytes': [..], 'ms': [..], 'ok': bool}} abriendo cada ficha `rondas` veces."""
+    s = GMBScraper(headless=not visible)
+    s.ligero = ligero
+    medidas = {}
+    try:
+        s.init_driver()
+        for _ in range(rondas):
+            for slug, place_id, _, _ in servidor.fichas():
+                esperado = servidor.esperado(slug)
+                esperar_quietud(servidor)
+                antes = servidor.bytes_servidos
+                s.driver.get(servidor.href_ficha(slug, place_id))
+                esperar_quietud(servidor)
+                carga = s.driver.execute_script(
+                    "const n = performance.getEntriesByType('navigation')[0];"
+                    "return n ? n.loadEventEnd : null;")
+                leido = s._leer_ficha_js()
+                ok = leido is not None and (esperado is None or all(
+                    leido[0].get(c) == esperado[c] for c in CAMPOS_VERIFICADOS))
+
+                m = medidas.setdefault(slug, {'bytes': [], 'ms': [], 'ok': True})
+                m['bytes'].append(servidor.bytes_servidos - antes)
+                m['ms'].append(carga or 0.0)
+                m['ok'] = m['ok'] and ok
+    finally:
+        s.close()
+    return medidas
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bytes y carga por ficha, normal contra ligero')
+    parser.add_argument('--rondas', type=int, default=2, help='Veces que se abre cada ficha')
+    parser.add_argument('--latencia', type=float, default=0,
+                        help='Milisegundos agregados a cada respuesta del servidor')
+    parser.add_argument('--visible', action='store_true', help='Chrome con ventana')
+    args = parser.parse_args()
+
+    servidor = ServidorFixtures(latencia=args.latencia / 1000).iniciar()
+    try:
+        normal = medir_modo(servidor, False, args.rondas, args.visible)
+        ligero = medir_modo(servidor, True, args.rondas, args.visible)
+    finally:
+        servidor.cerrar()
+
+    print(f"\n{'ficha':34} {'KB normal':>10} {'KB ligero':>10} {'ms normal':>10} "
+          f"{'ms ligero':>10}  campos")
+    totales = {'kb_n': [], 'kb_l': [], 'ms_n': [], 'ms_l': []}
+    fallas = 0
+    for slug, n in normal.items():
+        l = ligero.get(slug, {'bytes': [0], 'ms': [0.0], 'ok': False})
+        fila = {'kb_n': statistics.median(n['bytes']) / 1024,
+                'kb_l': statistics.median(l['bytes']) / 1024,
+                'ms_n': statistics.median(n['ms']), 'ms_l': statistics.median(l['ms'])}
+        for clave, valor in fila.items():
+            totales[clave].append(valor)
+        iguales = n['ok'] and l['ok']
+        fallas += not iguales
+        print(f"{slug[:34]:34} {fila['kb_n']:10.1f} {fila['kb_l']:10.1f} {fila['ms_n']:10.1f} "
+              f"{fila['ms_l']:10.1f}  {'ok' if iguales else 'DIFERENTES'}")
+
+    if not totales['kb_n']:
+        print("No se midio ninguna ficha")
+        return 1
+    kb_n, kb_l = statistics.mean(totales['kb_n']), statistics.mean(totales['kb_l'])
+    ms_n, ms_l = statistics.mean(totales['ms_n']), statistics.mean(totales['ms_l'])
+    print(f"\nPromedio por ficha: {kb_n:.1f} KB -> {kb_l:.1f} KB "
+          f"({(1 - kb_l / kb_n) * 100 if kb_n else 0:.0f}% menos), "
+          f"load {ms_n:.0f} ms -> {ms_l:.0f} ms")
+    if fallas:
+        print(f"{fallas} fichas no se leyeron igual en los dos modos")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Benchmark: tiempo por ficha del motor 'selenium' contra el motor 'js'.
+
+Abre N fichas del servidor de fixtures (servidor_fixtures.py, nada de Google)
+y, sobre la MISMA pagina ya cargada, lee los campos con los dos motores
+(alternando, varias veces) para que la red no entre en la medicion. Reporta
+la mediana por ficha de cada uno, el cociente, si los dos devolvieron los
+mismos campos y si coinciden con los esperados de negocios.json.
+
+Uso:
+  python3 benchmarks/bench_motor_ficha.py
+  python3 benchmarks/bench_motor_ficha.py --fichas 10 --repeticiones 5
+  python3 benchmarks/bench_motor_ficha.py --snapshots capturas/   # paneles grabados
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from gmb_scraper_lite import GMBScraper  # noqa: E402
+from servidor_fixtures import ServidorFixtures  # noqa: E402
+
+CAMPOS_VERIFICADOS = ['name', 'rating', 'review_count', 'address', 'phone',
+                      'website', 'category', 'hours']
+
+
+def medir(funcion):
+    inicio = time.perf_counter()
+    resultado = funcion()
+    return time.perf_counter() - inicio, resultado
+
+
+def esperar_ficha(s, segundos=10):
+    limite = time.monotonic() + segundos
+    while time.monotonic() < limite:
+        if s._ficha_abierta():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Motor selenium contra motor js, sobre las fixtures')
+    parser.add_argument('--fichas', type=int, default=5, help='Fichas a medir')
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help='Lecturas por motor sobre cada ficha')
+    parser.add_argument('--latencia', type=float, default=0,
+                        help='Milisegundos agregados a cada respuesta del servidor')
+    parser.add_argument('--snapshots', help='Directorio de snapshots a servir como fichas')
+    parser.add_argument('--visible', action='store_true', help='Chrome con ventana')
+    args = parser.parse_args()
+
+    servidor = ServidorFixtures(latencia=args.latencia / 1000, snapshots=args.snapshots).iniciar()
+    s = GMBScraper(headless=not args.visible)
+    tiempos = {'selenium': [], 'js': []}
+    distintas, incorrectas = [], []
+    try:
+        s.init_driver()
+        fichas = [f for f in servidor.fichas() if not f[3]][:args.fichas]
+
+        for slug, place_id, nombre, _ in fichas:
+            s.driver.get(servidor.href_ficha(slug, place_id))
+            if not esperar_ficha(s):
+                print(f"  {nombre}: no cargo, se salta")
+                continue
+
+            por_ficha = {'selenium': [], 'js': []}
+            campos = {}
+            for _ in range(args.repeticiones):
+                for motor, leer in (('selenium', s._leer_ficha_selenium), ('js', s._leer_ficha_js)):
+                    segundos, leido = medir(leer)
+                    por_ficha[motor].append(segundos)
+                    campos[motor] = leido[0] if leido else None
+
+            for motor in tiempos:
+                tiempos[motor].append(statistics.median(por_ficha[motor]))
+            if campos['selenium'] != campos['js']:
+                distintas.append((nombre, campos['selenium'], campos['js']))
+            esperado = servidor.esperado(slug)
+            if esperado is not None and campos['js'] is not None and any(
+                    campos['js'].get(c) != esperado[c] for c in CAMPOS_VERIFICADOS):
+                incorrectas.append(nombre)
+            print(f"  {nombre[:40]:40} selenium {tiempos['selenium'][-1]*1000:7.0f} ms"
+                  f"   js {tiempos['js'][-1]*1000:6.0f} ms")
+    finally:
+        try:
+            s.close()
+        except Exception:
+            pass
+        servidor.cerrar()
+
+    if not tiempos['js']:
+        return 1
+
+    sel = statistics.median(tiempos['selenium'])
+    js = statistics.median(tiempos['js'])
+    print(f"\n=== {len(tiempos['js'])} fichas, mediana por ficha ===")
+    print(f"selenium  {sel*1000:7.0f} ms")
+    print(f"js        {js*1000:7.0f} ms   ({sel/js:.1f}x mas rapido)")
+    print(f"Campos identicos en {len(tiempos['js']) - len(distintas)}/{len(tiempos['js'])} fichas")
+    for nombre, a, b in distintas:
+        diferencias = {k: (a.get(k), b.get(k)) for k in a if a.get(k) != b.get(k)} if a and b else 'ilegible'
+        print(f"  DIFERENTE {nombre}: {diferencias}")
+    for nombre in incorrectas:
+        print(f"  NO COINCIDE con negocios.json: {nombre}")
+    return 1 if distintas or incorrectas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Micro-benchmark de los parsers sobre un corpus de paginas guardadas.
+
+No abre Chrome ni toca la red: pasa por parseo.py (y por los parsers de
+emails de GMBScraper) las paginas de las fixtures (listado, fichas y webs de
+benchmarks/fixtures/), mas las capturas de `--snapshots DIR` y cualquier
+`*.html` / `*.html.gz` de `--html DIR`. Es lo que importa al reparsear
+archivos de cientos de miles de paginas.
+
+Uso:
+  python3 benchmarks/bench_parseo.py
+  python3 benchmarks/bench_parseo.py --snapshots snapshots --repeticiones 20
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parseo  # noqa: E402
+from gmb_scraper_lite import GMBScraper  # noqa: E402
+from servidor_fixtures import ServidorFixtures  # noqa: E402
+from snapshots import crudos_desde_html  # noqa: E402
+
+# Emails de relleno que aparecen en webs reales: el filtro tiene que tirarlos
+EMAILS_RUIDO = ['noreply@empresa.pe', 'logo@2x.png', 'user@example.com', 'a@o123.ingest.sentry.io',
+                'ventas@sentry.wixpress.com', 'Info@Estudio.PE.', 'nombre@dominio.com']
+
+
+def armar_corpus(args):
+    """{'fichas': [html], 'webs': [html], 'listados': [html]}"""
+    corpus = {'fichas': [], 'webs': [], 'listados': []}
+    servidor = ServidorFixtures(snapshots=args.snapshots)
+    try:
+        corpus['listados'].append(servidor.pagina_listado('estudio contable'))
+        for slug, _, _, _ in servidor.fichas():
+            corpus['fichas'].append(servidor.pagina_ficha(slug))
+            for contacto in (False, True):
+                web = servidor.pagina_web(slug, contacto)
+                if web:
+                    corpus['webs'].append(web)
+    finally:
+        servidor._httpd.server_close()
+
+    if args.html:
+        for nombre in sorted(os.listdir(args.html)):
+            ruta = os.path.join(args.html, nombre)
+            if nombre.endswith('.html.gz'):
+                with gzip.open(ruta, 'rt', encoding='utf-8', errors='replace') as f:
+                    corpus['webs'].append(f.read())
+            elif nombre.endswith('.html'):
+                with open(ruta, encoding='utf-8', errors='replace') as f:
+                    corpus['webs'].append(f.read())
+    return corpus
+
+
+def medir(nombre, funcion, entradas, repeticiones):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for entrada in entradas:
+            funcion(entrada)
+    segundos = time.perf_counter() - inicio
+    llamadas = len(entradas) * repeticiones
+    print(f"{nombre:28} {llamadas:8} {segundos * 1000:10.1f}ms "
+          f"{segundos / llamadas * 1e6 if llamadas else 0:10.1f}us")
+    return segundos
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmark de parseo.py')
+    parser.add_argument('--snapshots', help='Sumar al corpus las capturas de esta carpeta')
+    parser.add_argument('--html', help='Sumar al corpus los *.html / *.html.gz de esta carpeta')
+    parser.add_argument('--repeticiones', type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = armar_corpus(args)
+    scraper = GMBScraper(headless=True)
+    rep = args.repeticiones
+
+    # Entradas ya preparadas: se mide el parser, no la preparacion
+    crudos = [crudos_desde_html(html) for html in corpus['fichas']]
+    textos_panel = [c.get('texto_panel') or '' for c in crudos]
+    f7nice = [t for c in crudos for t in c.get('f7nice') or []]
+    arias = [a for c in crudos for a in c.get('arias') or []]
+    hrefs = re.findall(r'href="([^"]*/maps/place/[^"]*)"', ''.join(corpus['listados']))
+    emails = [e for html in corpus['webs'] for e in scraper._emails_from_html(html)[0]]
+    emails = (emails + EMAILS_RUIDO) * 10
+
+    print(f"Corpus: {len(corpus['fichas'])} fichas, {len(corpus['webs'])} webs, "
+          f"{len(hrefs)} hrefs de listado, {len(emails)} emails · {rep} repeticiones\n")
+    print(f"{'parser':28} {'llamadas':>8} {'total':>12} {'por llamada':>12}")
+
+    total = 0.0
+    total += medir('campos_desde_crudos', parseo.campos_desde_crudos, crudos, rep)
+    total += medir('crudos_desde_html', crudos_desde_html, corpus['fichas'], max(1, rep // 10))
+    total += medir('rating/reviews_de_texto',
+                   lambda t: (parseo.rating_de_texto(t), parseo.reviews_de_texto(t)), f7nice, rep)
+    total += medir('reviews_de_aria', parseo.reviews_de_aria, arias, rep)
+    total += medir('emails_de_texto', parseo.emails_de_texto, textos_panel, rep)
+    total += medir('_emails_from_html', scraper._emails_from_html, corpus['webs'],
+                   max(1, rep // 10))
+    total += medir('email_valido', parseo.email_valido, emails, rep)
+    total += medir('filtrar_emails', scraper.filtrar_emails, [emails], rep)
+    total += medir('extraer_place_id', GMBScraper.extraer_place_id, hrefs, rep)
+    print(f"\nTotal: {total:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,321 @@
+#!/usr/bin/env python3
+"""Servidor HTTP local que imita Maps y las webs de los negocios.
+
+Sirve, desde benchmarks/fixtures/:
+  /maps/search/<consulta>   listado con una tarjeta por negocio (mas un anuncio)
+  /maps/place/<slug>/data=!4m7!3m6!1s<id>!8m2   ficha de detalle
+  /web/<slug>/  y  /web/<slug>/contacto          web del negocio
+  teselas, fotos, street view, fuentes, video y trackers que la ficha pide
+  como la de Maps, con tamanos parecidos: lo que el modo ligero no deberia bajar
+
+Como en Maps, el listado y la ficha traen ademas sus datos en
+`window.APP_INITIALIZATION_STATE` (arrays con prefijo `)]}'`, ver red_maps.py),
+para probar la extraccion por red contra la del DOM.
+
+Las fichas salen de negocios.json sobre plantillas con la misma estructura de
+DOM que Maps (div[role="main"] del listado y del panel, F7nice, botones con
+data-item-id, bloque de horarios, etc.), asi el scraper real corre sin
+cambios. Con `snapshots` se suman las capturas grabadas por
+`--snapshots DIR` (ver snapshots.py): el panel se sirve tal cual se guardo.
+
+Uso suelto: python3 benchmarks/servidor_fixtures.py [--puerto 8765] [--latencia 0]
+"""
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+from urllib.parse import unquote
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIRECTORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Recursos que acompanan a la ficha: (prefijo de la ruta, tipo, bytes)
+RECURSOS = [
+    ('/maps/vt', 'image/png', 24_000),
+    ('/p/', 'image/jpeg', 60_000),
+    ('/cbk', 'image/jpeg', 12_000),
+    ('/fonts/', 'font/woff2', 45_000),
+    ('/media/', 'video/mp4', 150_000),
+    ('/gtag/js', 'application/javascript', 90_000),
+    ('/gen_204', 'image/gif', 43),
+]
+
+
+def _plantilla(directorio, nombre):
+    with open(os.path.join(directorio, nombre), encoding='utf-8') as f:
+        return Template(f.read())
+
+
+def _llenar(plantilla, **valores):
+    """Sustituye escapando todo salvo los bloques ya armados (prefijo 'html_')."""
+    escapados = {k: (v if k.startswith('html_') else html.escape(str(v), quote=True))
+                 for k, v in valores.items()}
+    return plantilla.safe_substitute(escapados)
+
+
+class ServidorFixtures:
+    """Levanta el servidor en un hilo; `url_maps` va en GMBScraper.URL_MAPS."""
+
+    def __init__(self, directorio=DIRECTORIO_FIXTURES, puerto=0, latencia=0.0, snapshots=None):
+        self.directorio = directorio
+        self.latencia = latencia          # segundos agregados a cada respuesta
+        self.pedidos = 0
+        self.bytes_servidos = 0
+        self._lock = threading.Lock()
+
+        with open(os.path.join(directorio, 'negocios.json'), encoding='utf-8') as f:
+            self.negocios = json.load(f)
+        self.por_slug = {n['slug']: n for n in self.negocios}
+        self.grabadas = {}                # slug -> (meta, html del panel)
+        if snapshots:
+            self._cargar_snapshots(snapshots)
+
+        self.p_listado = _plantilla(directorio, 'listado.html')
+        self.p_tarjeta = _plantilla(directorio, 'tarjeta.html')
+        self.p_ficha = _plantilla(directorio, 'ficha.html')
+        self.p_web = _plantilla(directorio, 'web.html')
+
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                servidor._atender(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', puerto), Manejador)
+        self._httpd.daemon_threads = True
+        self.puerto = self._httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.puerto}"
+        self.url_maps = f"{self.url}/maps"
+        self._hilo = None
+
+    def _cargar_snapshots(self, directorio):
+        from snapshots import ArchivoSnapshots
+        for meta, panel in ArchivoSnapshots(directorio):
+            slug = 'grabada-' + ArchivoSnapshots.nombre_archivo(
+                meta.get('place_id'), meta.get('href')).replace('.html.gz', '')
+            self.grabadas[slug] = (meta, panel)
+
+    # --- URLs ---------------------------------------------------------------
+
+    def href_ficha(self, slug, id_lugar):
+        return f"{self.url}/maps/place/{slug}/data=!4m7!3m6!1s{id_lugar}!8m2"
+
+    def url_web(self, slug):
+        return f"{self.url}/web/{slug}/"
+
+    def fichas(self):
+        """[(slug, place_id, nombre, patrocinado)] en el orden del listado."""
+        filas = [(n['slug'], n['id'], n['nombre'], bool(n.get('patrocinado')))
+                 for n in self.negocios]
+        for slug, (meta, _) in self.grabadas.items():
+            filas.append((slug, meta.get('place_id') or slug, slug, False))
+        return filas
+
+    def esperado(self, slug):
+        """Campos que el scraper deberia sacar de la ficha `slug` (None si grabada)."""
+        n = self.por_slug.get(slug)
+        if n is None:
+            return None
+        emails = [n['email_ficha']] if n.get('email_ficha') else []
+        if n.get('web') and (n.get('email_home') or n.get('email_contacto')):
+            emails.append(n.get('email_home') or n.get('email_contacto'))
+        return {
+            'name': n['nombre'],
+            'rating': float(n['rating'].replace(',', '.')),
+            'review_count': int(re.sub(r'\D', '', n['reviews'])),
+            'address': n['direccion'],
+            'phone': n.get('telefono') or 'N/A',
+            'website': self.url_web(slug) if n.get('web') else 'N/A',
+            'category': n['categoria'],
+            'hours': n.get('horario') or n.get('estado_horario') or 'N/A',
+            'emails': sorted(emails),
+        }
+
+    # --- Datos de red (APP_INITIALIZATION_STATE) ------------------------------
+
+    def lugar_maps(self, slug):
+        """Array de un negocio con las posiciones que lee red_maps.campos_de_lugar."""
+        n = self.por_slug.get(slug)
+        if n is None:
+            return None
+        lugar = [None] * 179
+        lugar[2] = [p.strip() for p in n['direccion'].split(',')]
+        lugar[4] = [None] * 7 + [float(n['rating'].replace(',', '.')),
+                                 int(re.sub(r'\D', '', n['reviews']))]
+        if n.get('web'):
+            lugar[7] = [self.url_web(slug), self.url_web(slug)[7:]]
+        lugar[9] = [None, None, n.get('lat', -12.09), n.get('lng', -77.03)]
+        lugar[10] = n['id']
+        lugar[11] = n['nombre']
+        lugar[13] = [n['categoria']]
+        if n.get('horario'):
+            lugar[34] = [None, [[dia, [franja]] for dia, _, franja in
+                                (d.partition(', ') for d in n['horario'].split('; '))]]
+        lugar[39] = n['direccion']
+        if n.get('telefono'):
+            lugar[178] = [[n['telefono'], [[n['telefono'], 1]]]]
+        return lugar
+
+    def estado_inicial(self, lugares):
+        """<script> con el estado inicial de la pagina, como lo sirve Maps."""
+        carga = ")]}'\n" + json.dumps([None] * 6 + [lugares[0]] if len(lugares) == 1
+                                       else [None, [[None] * 14 + [l] for l in lugares]],
+                                       ensure_ascii=False)
+        estado = json.dumps([[None], None, None, [None, None, carga]], ensure_ascii=False)
+        estado = estado.replace('</', '<\\/')  # que un "</script>" en los datos no corte el tag
+        return f'<script>window.APP_INITIALIZATION_STATE={estado};window.APP_FLAGS=[];</script>'
+
+
+    # --- Paginas ------------------------------------------------------------
+
+    def pagina_listado(self, consulta):
+        tarjetas = []
+        for slug, id_lugar, nombre, patrocinado in self.fichas():
+            n = self.por_slug.get(slug, {})
+            tarjetas.append(_llenar(
+                self.p_tarjeta, nombre=nombre, href=self.href_ficha(slug, id_lugar),
+                etiqueta_aria=' · Patrocinado' if patrocinado else '',
+                html_patrocinado='<span class="jHLihd">Patrocinado</span> · ' if patrocinado else '',
+                rating=n.get('rating', ''), reviews=n.get('reviews', ''),
+                categoria=n.get('categoria', ''), direccion=n.get('direccion', '')))
+        lugares = [l for l in (self.lugar_maps(slug) for slug, _, _, _ in self.fichas()) if l]
+        return _llenar(self.p_listado, consulta=consulta, html_tarjetas=''.join(tarjetas),
+                       html_estado_inicial=self.estado_inicial(lugares) if lugares else '')
+
+    def pagina_ficha(self, slug):
+        if slug in self.grabadas:
+            meta, panel = self.grabadas[slug]
+            return ('<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"></head><body>'
+                    '<div role="main" aria-label="Resultados"><h1>Resultados</h1></div>'
+                    f'{panel}</body></html>')
+
+        n = self.por_slug.get(slug)
+        if n is None:
+            return None
+
+        boton_horario = ''
+        if n.get('horario'):
+            boton_horario = _llenar(Template(
+                '      <div class="t39EBf GUrTXd" role="button" tabindex="0" '
+                'aria-label="$horario, Copiar el horario de atención"></div>\n'),
+                horario=n['horario'])
+        elif n.get('estado_horario'):
+            boton_horario = _llenar(Template(
+                '      <div class="OqCZI" jsaction="pane.openhours.wfvdle"><span>$estado</span></div>\n'),
+                estado=n['estado_horario'])
+
+        boton_web = ''
+        if n.get('web'):
+            boton_web = _llenar(Template(
+                '      <a class="CsEnBe" data-item-id="authority" href="$url" '
+                'aria-label="Sitio web: $url"><div class="Io6YTe">$url</div></a>\n'),
+                url=self.url_web(slug))
+
+        boton_telefono = ''
+        if n.get('telefono'):
+            boton_telefono = _llenar(Template(
+                '      <button class="CsEnBe" data-item-id="phone:tel:$digitos" '
+                'aria-label="Teléfono: $telefono"><div class="Io6YTe">$telefono</div></button>\n'),
+                telefono=n['telefono'], digitos=re.sub(r'\D', '', n['telefono']))
+
+        return _llenar(
+            self.p_ficha, nombre=n['nombre'], rating=n['rating'], reviews=n['reviews'],
+            reviews_num=n['reviews'].strip('()'), categoria=n['categoria'],
+            direccion=n['direccion'], texto_email=n.get('email_ficha') or '',
+            html_boton_horario=boton_horario, html_boton_web=boton_web,
+            html_boton_telefono=boton_telefono, slug=slug,
+            html_estado_inicial=self.estado_inicial([self.lugar_maps(slug)]))
+
+    def pagina_web(self, slug, contacto):
+        n = self.por_slug.get(slug)
+        if n is None or not n.get('web'):
+            return None
+        if contacto:
+            email = n.get('email_contacto')
+            cuerpo = (f'Escríbanos a <a href="mailto:{html.escape(email)}">{html.escape(email)}</a>'
+                      if email else 'Llámenos o visítenos en nuestra oficina.')
+        else:
+            email = n.get('email_home')
+            cuerpo = (f'Consultas: {html.escape(email)}' if email
+                      else 'Asesoría contable y tributaria para empresas.')
+        return _llenar(self.p_web, nombre=n['nombre'], html_cuerpo=cuerpo)
+
+    # --- HTTP ---------------------------------------------------------------
+
+    def _atender(self, pedido):
+        if self.latencia:
+            time.sleep(self.latencia)
+        ruta = unquote(pedido.path.split('?')[0])
+        cuerpo = None
+
+        recurso = next((r for r in RECURSOS if ruta.startswith(r[0])), None)
+        if recurso:
+            _, tipo, tamano = recurso
+            datos = b'/' * tamano if tipo == 'application/javascript' else b'\0' * tamano
+            self._responder(pedido, 200, tipo, datos)
+            return
+
+        if ruta.startswith('/maps/search/'):
+            cuerpo = self.pagina_listado(ruta[len('/maps/search/'):].replace('+', ' '))
+        elif ruta.startswith('/maps/place/'):
+            cuerpo = self.pagina_ficha(ruta[len('/maps/place/'):].split('/')[0])
+        elif ruta.startswith('/web/'):
+            partes = ruta[len('/web/'):].strip('/').split('/')
+            cuerpo = self.pagina_web(partes[0], contacto=len(partes) > 1)
+
+        datos = (cuerpo if cuerpo is not None else 'No encontrado').encode('utf-8')
+        self._responder(pedido, 200 if cuerpo is not None else 404,
+                        'text/html; charset=utf-8', datos)
+
+    def _responder(self, pedido, estado, tipo, datos):
+        pedido.send_response(estado)
+        pedido.send_header('Content-Type', tipo)
+        pedido.send_header('Content-Length', str(len(datos)))
+        pedido.end_headers()
+        pedido.wfile.write(datos)
+        with self._lock:
+            self.pedidos += 1
+            self.bytes_servidos += len(datos)
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._httpd.serve_forever,
+                                      name='fixtures', daemon=True)
+        self._hilo.start()
+        return self
+
+    def cerrar(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sirve las fixtures de Maps en local')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0,
+                        help='Milisegundos agregados a cada respuesta')
+    parser.add_argument('--snapshots', help='Carpeta de capturas grabadas a servir tambien')
+    args = parser.parse_args()
+
+    servidor = ServidorFixtures(puerto=args.puerto, latencia=args.latencia / 1000,
+                                snapshots=args.snapshots).iniciar()
+    print(f"Listado: {servidor.url_maps}/search/estudio+contable")
+    print("Ctrl+C para terminar")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.cerrar()
+
+
+if __name__ == '__main__':
+    main()
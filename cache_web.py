@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""Cache en disco de las webs de negocios que se visitan para sacar emails.
+
+Las cadenas y franquicias aparecen en muchos distritos y cada campana volvia a
+bajar las mismas homes y las mismas /contacto. Esto guarda las respuestas en
+un SQLite (clave: URL normalizada), las sirve mientras esten frescas (TTL), las
+revalida con ETag / Last-Modified cuando vencen y mantiene el archivo debajo
+de un tamano maximo tirando lo menos usado (LRU).
+
+Tambien recuerda los hosts que hace poco dieron timeout o error: volver a
+esperarlos 8 s en cada sucursal es justo lo que se queria evitar.
+
+Un nivel mas arriba, `MemoEmailsDominio` recuerda directamente el resultado
+(los emails ya filtrados) por dominio: la sucursal 12 de una cadena ni
+siquiera llega a pedir la home.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+
+class HostNoDisponible(Exception):
+    """El host fallo hace poco y esta en la cache negativa: no se intenta."""
+
+
+class RespuestaCache:
+    """Lo minimo de requests.Response que usan los parsers de emails."""
+
+    def __init__(self, status_code, text, url, desde_cache=False):
+        self.status_code = status_code
+        self.text = text
+        self.url = url
+        self.desde_cache = desde_cache
+
+
+def normalizar_url(url):
+    """Misma pagina, misma clave: sin fragmento, host en minusculas, sin
+    puerto por defecto, sin parametros de tracking y con el query ordenado."""
+    partes = urlsplit(url.strip())
+    esquema = partes.scheme.lower() or 'http'
+    host = (partes.hostname or '').lower()
+    if partes.port and not ((esquema == 'http' and partes.port == 80)
+                            or (esquema == 'https' and partes.port == 443)):
+        host = f"{host}:{partes.port}"
+    ruta = partes.path or '/'
+    if len(ruta) > 1:
+        ruta = ruta.rstrip('/')
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(partes.query, keep_blank_values=True)
+                             if not k.lower().startswith(('utm_', 'fbclid', 'gclid'))))
+    return urlunsplit((esquema, host, ruta, query, ''))
+
+
+class CacheHTTP:
+    """Cache persistente de GETs a webs de negocios.
+
+    `ttl`: segundos que una respuesta se sirve sin preguntar. `max_mb`: tope
+    del cuerpo guardado; al pasarlo se borran las entradas menos usadas hasta
+    bajar a `RECORTE` del tope, para no recortar de nuevo en cada descarga.
+    `ttl_negativo`: cuanto se castiga a un host que dio timeout o error 5xx.
+    """
+
+    RECORTE = 0.9
+
+    def __init__(self, ruta='cache_web.sqlite', ttl=7 * 86400, max_mb=200,
+                 ttl_negativo=6 * 3600):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_negativo = ttl_negativo
+        self.aciertos = 0
+        self.revalidadas = 0
+        self.descargas = 0
+        self.evitadas = 0
+
+        # Lo usan el scraper y los hilos del enriquecedor a la vez
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.executescript('''
+            CREATE TABLE IF NOT EXISTS respuestas (
+                clave TEXT PRIMARY KEY,
+                url_final TEXT,
+                status INTEGER,
+                etag TEXT,
+                last_modified TEXT,
+                cuerpo BLOB,
+                bytes INTEGER,
+                guardada REAL,
+                usada REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_respuestas_usada ON respuestas(usada);
+            CREATE TABLE IF NOT EXISTS hosts_fallidos (
+                host TEXT PRIMARY KEY,
+                hasta REAL,
+                motivo TEXT
+            );
+        ''')
+        self._db.commit()
+        # Tamano guardado, llevado a mano: sumarlo en cada descarga recorre la tabla
+        self._bytes = self._db.execute('SELECT COALESCE(SUM(bytes), 0) FROM respuestas').fetchone()[0]
+
+    def _host_bloqueado(self, host):
+        fila = self._db.execute('SELECT hasta, motivo FROM hosts_fallidos WHERE host = ?',
+                                (host,)).fetchone()
+        return fila if fila and fila[0] > time.time() else None
+
+    def _marcar_host(self, host, motivo):
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO hosts_fallidos VALUES (?, ?, ?)',
+                             (host, time.time() + self.ttl_negativo, motivo))
+            self._db.commit()
+
+    def fresca(self, url):
+        """True si `url` se serviria de la cache sin tocar la red."""
+        with self._lock:
+            fila = self._db.execute('SELECT guardada FROM respuestas WHERE clave = ?',
+                                    (normalizar_url(url),)).fetchone()
+        return bool(fila) and time.time() - fila[0] < self.ttl
+
+    def obtener(self, sesion, url, headers=None, timeout=8):
+        """GET a traves de la cache. Lanza las mismas excepciones que requests,
+        mas HostNoDisponible si el host esta castigado."""
+        clave = normalizar_url(url)
+        host = urlsplit(clave).netloc
+        ahora = time.time()
+
+        with self._lock:
+            castigo = self._host_bloqueado(host)
+            fila = self._db.execute(
+                'SELECT url_final, status, etag, last_modified, cuerpo, guardada '
+                'FROM respuestas WHERE clave = ?', (clave,)).fetchone()
+            if fila and ahora - fila[5] < self.ttl:
+                self._db.execute('UPDATE respuestas SET usada = ? WHERE clave = ?', (ahora, clave))
+                self._db.commit()
+                self.aciertos += 1
+                return RespuestaCache(fila[1], zlib.decompress(fila[4]).decode('utf-8'),
+                                      fila[0], desde_cache=True)
+
+        if castigo:
+            with self._lock:
+                self.evitadas += 1
+            raise HostNoDisponible(f"{host} en cache negativa ({castigo[1]})")
+
+        headers = dict(headers or {})
+        if fila:
+            if fila[2]:
+                headers['If-None-Match'] = fila[2]
+            if fila[3]:
+                headers['If-Modified-Since'] = fila[3]
+
+        try:
+            r = sesion.get(url, headers=headers, timeout=timeout, verify=False)
+        except (requests.Timeout, requests.ConnectionError) as e:
+            self._marcar_host(host, type(e).__name__)
+            raise
+
+        if r.status_code == 304 and fila:
+            with self._lock:
+                self._db.execute('UPDATE respuestas SET guardada = ?, usada = ? WHERE clave = ?',
+                                 (ahora, ahora, clave))
+                self._db.commit()
+                self.revalidadas += 1
+            return RespuestaCache(fila[1], zlib.decompress(fila[4]).decode('utf-8'),
+                                  fila[0], desde_cache=True)
+
+        with self._lock:
+            self.descargas += 1
+        if r.status_code >= 500:
+            self._marcar_host(host, f"HTTP {r.status_code}")
+        elif r.status_code == 200:
+            self._guardar(clave, r, ahora)
+        return RespuestaCache(r.status_code, r.text, r.url)
+
+    def _guardar(self, clave, r, ahora):
+        cuerpo = zlib.compress(r.text.encode('utf-8'))
+        with self._lock:
+            previa = self._db.execute('SELECT bytes FROM respuestas WHERE clave = ?',
+                                      (clave,)).fetchone()
+            self._db.execute(
+                'INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (clave, r.url, r.status_code, r.headers.get('ETag'),
+                 r.headers.get('Last-Modified'), cuerpo, len(cuerpo), ahora, ahora))
+            self._bytes += len(cuerpo) - (previa[0] if previa else 0)
+            if self._bytes > self.max_bytes:
+                self._recortar()
+            self._db.commit()
+
+    def _recortar(self):
+        """Borra las entradas menos usadas hasta bajar a RECORTE del tope."""
+        objetivo = self.max_bytes * self.RECORTE
+        borrar = []
+        for clave, tam in self._db.execute('SELECT clave, bytes FROM respuestas ORDER BY usada'):
+            if self._bytes <= objetivo:
+                break
+            borrar.append((clave,))
+            self._bytes -= tam
+        self._db.executemany('DELETE FROM respuestas WHERE clave = ?', borrar)
+
+    def resumen(self):
+        pedidos = self.aciertos + self.revalidadas + self.descargas
+        return {'pedidos': pedidos, 'aciertos': self.aciertos, 'revalidadas': self.revalidadas,
+                'descargas': self.descargas, 'hosts_evitados': self.evitadas}
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
+
+
+# Sufijos de dos niveles: en "inmobiliaria.com.pe" el dominio del negocio es
+# el de tres etiquetas, no "com.pe"
+SUFIJOS_2_NIVEL = {
+    'com.pe', 'org.pe', 'net.pe', 'edu.pe', 'gob.pe', 'nom.pe', 'mil.pe', 'sld.pe',
+    'com.ar', 'com.mx', 'com.co', 'com.br', 'com.ec', 'com.bo', 'com.uy', 'com.ve',
+    'co.uk', 'com.es', 'com.au',
+}
+
+# Plataformas donde cada negocio es un subdominio o una ruta distinta: el
+# dominio no identifica al negocio, asi que la clave lleva el host y la ruta
+PLATAFORMAS_COMPARTIDAS = {
+    'wixsite.com', 'business.site', 'negocio.site', 'blogspot.com', 'wordpress.com',
+    'godaddysites.com', 'squarespace.com', 'webnode.page', 'webnode.es', 'site123.me',
+    'linktr.ee', 'facebook.com', 'instagram.com', 'google.com', 'tiktok.com',
+}
+
+
+def dominio_registrable(url):
+    """Clave del negocio para la memo: "sucursal.cadena.com.pe/x" -> "cadena.com.pe"."""
+    partes = urlsplit(url if '//' in url else f"http://{url}")
+    host = (partes.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+    etiquetas = host.split('.')
+    if all(e.isdigit() for e in etiquetas):
+        return host  # IP: no hay dominio que recortar
+    n = 3 if '.'.join(etiquetas[-2:]) in SUFIJOS_2_NIVEL else 2
+    dominio = '.'.join(etiquetas[-n:])
+    if dominio in PLATAFORMAS_COMPARTIDAS:
+        primera = (partes.path or '/').strip('/').split('/')[0].lower()
+        return f"{host}/{primera}" if primera else host
+    return dominio
+
+
+class MemoEmailsDominio:
+    """Emails ya filtrados por dominio, compartidos entre fichas y corridas.
+
+    En memoria es un LRU de `max_memoria` dominios; detras hay un SQLite que
+    sobrevive entre corridas. Un resultado vale `ttl` segundos: despues la web
+    se vuelve a visitar por si publicaron un correo nuevo.
+    """
+
+    def __init__(self, ruta='emails_dominio.sqlite', ttl=30 * 86400, max_memoria=5000):
+        self.ruta = ruta
+        self.ttl = ttl
+        self.max_memoria = max_memoria
+        self.consultas = 0
+        self.aciertos = 0
+
+        self._memoria = OrderedDict()    # dominio -> (emails, visitado)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS emails_dominio '
+                         '(dominio TEXT PRIMARY KEY, emails TEXT, visitado REAL)')
+        self._db.commit()
+
+    def _recordar(self, dominio, valor):
+        self._memoria[dominio] = valor
+        self._memoria.move_to_end(dominio)
+        while len(self._memoria) > self.max_memoria:
+            self._memoria.popitem(last=False)
+
+    def obtener(self, url):
+        """Emails del dominio de `url` si se visito hace poco, o None."""
+        dominio = dominio_registrable(url)
+        with self._lock:
+            self.consultas += 1
+            valor = self._memoria.get(dominio)
+            if valor is None:
+                fila = self._db.execute('SELECT emails, visitado FROM emails_dominio '
+                                        'WHERE dominio = ?', (dominio,)).fetchone()
+                if fila:
+                    valor = (json.loads(fila[0]), fila[1])
+            if valor is None or time.time() - valor[1] >= self.ttl:
+                return None
+            self._recordar(dominio, valor)
+            self.aciertos += 1
+            return list(valor[0])
+
+    def guardar(self, url, emails):
+        dominio = dominio_registrable(url)
+        valor = (list(emails), time.time())
+        with self._lock:
+            self._recordar(dominio, valor)
+            self._db.execute('INSERT OR REPLACE INTO emails_dominio VALUES (?, ?, ?)',
+                             (dominio, json.dumps(valor[0]), valor[1]))
+            self._db.commit()
+
+    def anotar_acierto(self):
+        """Cuenta como consulta acertada un resultado compartido con una
+        visita (o consulta) en curso del mismo dominio."""
+        with self._lock:
+            self.consultas += 1
+            self.aciertos += 1
+
+    def tasa_aciertos(self):
+        return self.aciertos / self.consultas if self.consultas else 0.0
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
@@ -9,15 +9,25 @@ Ejemplos:
         --distritos "San Isidro,Miraflores,Surco" --por-busqueda 10 --tope 100
 
     python3 correr_campana.py --estado          # ver progreso acumulado
+
+    python3 correr_campana.py --rubros inmobiliaria --distritos "Surco,San Borja,Lince" \\
+        --workers 3                              # 3 navegadores en paralelo
 """
 import argparse
-import json
 import os
 import sys
 import logging
 
-from gmb_scraper_lite import GMBScraper, BloqueoDetectado
-from progreso import RegistroProgreso, HistorialVistos
+from cache_web import CacheHTTP, MemoEmailsDominio
+from almacen import AlmacenLeads
+from diario import DiarioCampana
+from enriquecedor_web import EnriquecedorEmails
+from gmb_scraper_lite import GMBScraper
+from pool_campana import CupoCompartido, EscritorLotes, PoolCampana
+from progreso import RegistroProgreso, HistorialVistos, VistosSesion
+from salidas import PYARROW_AVAILABLE, exportar_json, leer_jsonl, leer_registros, migrar_json
+from ritmo import ControlAdaptivo, Ritmo
+from snapshots import ArchivoSnapshots
 
 logger = logging.getLogger('campana')
 
@@ -36,18 +46,88 @@ def parse_args():
                    help='tope duro de fichas para toda la sesion (recomendado 300-500/dia por IP)')
     p.add_argument('--pausa', default='20,40',
                    help='rango en segundos de pausa entre busquedas')
-    p.add_argument('--salida', default='campana_gmb')
+    p.add_argument('--salida', default='campana_gmb',
+                   help='prefijo de la salida: <salida>.csv y <salida>.jsonl por lote, '
+                        '<salida>.json al terminar')
+    p.add_argument('--sin-json', action='store_true',
+                   help='no exportar <salida>.json al final (queda el .jsonl)')
+    p.add_argument('--parquet', metavar='DIR',
+                   help='al final, agregar las fichas de esta sesion al dataset Parquet de DIR '
+                        '(particionado por departamento/distrito/rubro; requiere pyarrow)')
+    p.add_argument('--por-distrito', metavar='DIR',
+                   help='al final, agregar las fichas nuevas de esta sesion a DIR/gmb_<distrito>.csv '
+                        '(uno por distrito, ordenados por rubro y nombre)')
+    p.add_argument('--almacen', metavar='SQLITE',
+                   help='guardar cada lote tambien en el almacen de leads (negocios, '
+                        'observaciones, emails y campanas; ver almacen.py)')
     p.add_argument('--progreso', default='progreso.jsonl')
     p.add_argument('--headless', action='store_true', default=True)
     p.add_argument('--estado', action='store_true', help='solo mostrar el progreso y salir')
+    p.add_argument('--compactar', action='store_true',
+                   help='compactar el progreso (una marca por combinacion) y salir; '
+                        'tambien se hace solo cada 500 marcas')
     p.add_argument('--vistos', default='vistos.jsonl',
                    help='historial de negocios ya extraidos en TODAS las corridas; '
                         'se carga y actualiza solo, para no repetir de un dia a otro')
     p.add_argument('--sin-historial', action='store_true',
                    help='ignorar el historial y permitir re-scrapear lo ya visto')
     p.add_argument('--excluir', default='',
-                   help='JSON(s) de corridas previas, separados por coma: sus negocios se saltan '
+                   help='JSON/JSONL(s) de corridas previas, separados por coma: sus negocios se saltan '
                         'sin volver a abrirlos (para pedir "otros N" del mismo rubro y distrito)')
+    p.add_argument('--workers', type=int, default=1,
+                   help='navegadores en paralelo; todos salen por la misma IP, asi que el '
+                        '--tope sigue siendo el de la IP, no el de cada worker')
+    p.add_argument('--perfiles', default='',
+                   help='carpeta base para un perfil de Chrome por worker (perfiles/worker1, ...); '
+                        'vacio = perfil temporal nuevo en cada arranque')
+    p.add_argument('--chromedriver', default='',
+                   help='ruta fija del chromedriver; por defecto se usa el ya bajado (o el del '
+                        'PATH) sin consultar la red')
+    p.add_argument('--persistente', type=int, metavar='PUERTO',
+                   help='dejar Chrome abierto entre corridas y reconectarse por depuracion remota '
+                        '(worker N usa PUERTO+N-1); perfil en --perfiles o perfiles/')
+    p.add_argument('--reciclar-fichas', type=int, default=300,
+                   help='relanzar cada navegador (mismo perfil) tras N fichas: Chrome crece con '
+                        'cada pagina (0 = nunca)')
+    p.add_argument('--reciclar-mb', type=int, default=0,
+                   help='relanzar cada navegador cuando sus procesos pasen estos MB de RSS '
+                        '(0 = no medir)')
+    p.add_argument('--ligero', action='store_true',
+                   help='no bajar teselas del mapa, fotos, fuentes, video ni trackers (la ficha '
+                        'se lee del DOM y no los usa); ver navegador.BLOQUEO_LIGERO')
+    p.add_argument('--pestanas', type=int, default=1,
+                   help='fichas abiertas a la vez en pestanas de cada navegador; solapa las '
+                        'esperas de carga sin sumar procesos ni IPs (probar con 3)')
+    p.add_argument('--web-concurrencia', type=int, default=8,
+                   help='webs de negocios visitadas a la vez, en segundo plano, para sacar emails')
+    p.add_argument('--web-sincrona', action='store_true',
+                   help='visitar la web de cada negocio dentro de la ficha, con el navegador '
+                        'esperando (comportamiento anterior)')
+    p.add_argument('--cache-web', default='cache_web.sqlite',
+                   help='cache en disco de las webs de negocios (se reusa entre corridas)')
+    p.add_argument('--sin-cache-web', action='store_true',
+                   help='bajar siempre las webs de negocios, sin cache')
+    p.add_argument('--memo-emails', default='emails_dominio.sqlite',
+                   help='emails ya sacados por dominio: las sucursales de una cadena no '
+                        'vuelven a visitar la misma web (se reusa entre corridas)')
+    p.add_argument('--motor-ficha', choices=['js', 'selenium', 'red'], default='js',
+                   help="'js' lee cada ficha con un solo script; 'selenium' campo por campo; "
+                        "'red' de las respuestas de Maps capturadas por CDP (si faltan, del DOM)")
+    p.add_argument('--listado-red', metavar='JSONL',
+                   help="con --motor-ficha red, guardar aca los negocios del listado que no se "
+                        "abrieron (datos de la tarjeta y coordenadas, sin emails)")
+    p.add_argument('--snapshots', default='',
+                   help='carpeta donde archivar el HTML comprimido de cada ficha, para '
+                        're-extraer despues con reparsear_snapshots.py sin volver a Google')
+    p.add_argument('--por-minuto', type=int, default=8,
+                   help='tope de paginas de Google por minuto para toda la IP (0 = sin tope)')
+    p.add_argument('--por-hora', type=int, default=300,
+                   help='tope de paginas de Google por hora para toda la IP (0 = sin tope)')
+    p.add_argument('--ritmo-escala', type=float, default=1.0,
+                   help='multiplica las pausas tras cada carga (1.5 = mas lento, 0 = sin pausas)')
+    p.add_argument('--sin-adaptativo', action='store_true',
+                   help='no ajustar el ritmo segun las senales de riesgo (cargas lentas, '
+                        'listados vacios, muros de consentimiento)')
     return p.parse_args()
 
 
@@ -58,29 +138,40 @@ def cargar_excluidos(rutas):
         if not os.path.exists(ruta):
             print(f"Aviso: no existe {ruta}, se ignora")
             continue
+        n = 0
         try:
-            with open(ruta, encoding='utf-8') as f:
-                datos = json.load(f)
+            for reg in leer_registros(ruta):
+                if reg.get('place_id'):
+                    claves.add(reg['place_id'])
+                claves.add(f"{reg.get('name','')}|{reg.get('address','')}".lower())
+                n += 1
         except Exception as e:
             print(f"Aviso: no se pudo leer {ruta} ({e})")
             continue
-        for reg in datos:
-            if reg.get('place_id'):
-                claves.add(reg['place_id'])
-            claves.add(f"{reg.get('name','')}|{reg.get('address','')}".lower())
-        print(f"{ruta}: {len(datos)} negocios previos que no se volveran a abrir")
+        print(f"{ruta}: {n} negocios previos que no se volveran a abrir")
     return claves
 
 
 def main():
     args = parse_args()
+    if args.parquet and not PYARROW_AVAILABLE:
+        # Mejor saberlo antes de scrapear que al final
+        print("--parquet requiere pyarrow: pip install pyarrow")
+        return 1
     registro = RegistroProgreso(args.progreso)
 
+    if args.compactar:
+        absorbidas = registro.compactar()
+        print(f"Progreso compactado: {absorbidas} marcas absorbidas, "
+              f"{len(registro.hechas)} combinaciones en {registro.ruta_snapshot}")
+        return 0
+
     if args.estado:
         r = registro.resumen()
         print(f"Combinaciones hechas: {r['combinaciones']}")
         print(f"Fichas acumuladas:    {r['fichas']}")
         print(f"Sin resultados:       {r['sin_resultados']}")
+        print(f"Navegador caido:      {r['caidas']} (se reintentan)")
         return 0
 
     rubros = [x.strip() for x in args.rubros.split(',') if x.strip()]
@@ -98,78 +189,173 @@ def main():
         return 0
 
     print(f"Tope de sesion: {args.tope} fichas · {args.por_busqueda} por busqueda "
-          f"· pausa {pausa_min}-{pausa_max}s\n")
-
-    s = GMBScraper(headless=args.headless)
-    s.max_results_per_location = args.por_busqueda
-    s.max_fichas_sesion = args.tope
-    s.pausa_entre_busquedas = (pausa_min, pausa_max)
+          f"· pausa {pausa_min}-{pausa_max}s · hasta {args.por_minuto}/min y "
+          f"{args.por_hora}/hora\n")
 
     # Historial acumulado: la unica garantia de que una corrida de otro dia
     # no vuelva a extraer los mismos negocios.
     historial = HistorialVistos(args.vistos)
     if args.sin_historial:
         print("Historial DESACTIVADO: se puede re-scrapear lo ya visto")
-        historial.claves = set()
     elif historial.negocios:
         print(f"Historial: {historial.negocios} negocios ya extraidos que no se volveran a abrir")
 
-    s.vistos = set(historial.claves)
+    # Un solo conjunto para todos los workers: lo que abre uno, los demas lo
+    # saltan. El historial se consulta en su indice, sin copiarlo a memoria.
+    vistos = VistosSesion(None if args.sin_historial else historial)
     if args.excluir:
-        s.vistos |= cargar_excluidos(args.excluir)
+        vistos.update(cargar_excluidos(args.excluir))
+
+    cupo = CupoCompartido(args.tope)
+    archivo_snapshots = ArchivoSnapshots(args.snapshots) if args.snapshots else None
+    # Uno solo para todos los workers: el tope de paginas es el de la IP
+    ritmo = Ritmo(escala=args.ritmo_escala, por_minuto=args.por_minuto, por_hora=args.por_hora,
+                  control=None if args.sin_adaptativo else ControlAdaptivo())
+
+    def crear_scraper(n):
+        perfiles = args.perfiles or ('perfiles' if args.persistente else '')
+        perfil = os.path.join(perfiles, f'worker{n}') if perfiles else None
+        s = GMBScraper(headless=args.headless, perfil=perfil)
+        s.chromedriver = args.chromedriver or None
+        s.ligero = args.ligero
+        s.reciclar_fichas = args.reciclar_fichas or None
+        s.reciclar_mb = args.reciclar_mb or None
+        if args.persistente:
+            s.puerto_depuracion = args.persistente + n - 1
+        s.max_results_per_location = args.por_busqueda
+        s.pausa_entre_busquedas = (pausa_min, pausa_max)
+        s.ritmo = ritmo
+        s.pestanas = max(1, args.pestanas)
+        s.motor_ficha = args.motor_ficha
+        s.archivo_listado = args.listado_red
+        s.archivo_snapshots = archivo_snapshots
+        s.vistos = vistos
+        s.cupo = cupo
+        s.enriquecedor = enriquecedor
+        s.cache_web = cache_web
+        s.memo_emails = memo_emails
+        return s
+
+    # Solo para guardar: nunca abre Chrome
+    salida = GMBScraper(headless=True)
+
+    # Las cadenas repiten web en cada distrito: lo ya bajado se sirve de disco
+    cache_web = None if args.sin_cache_web else CacheHTTP(args.cache_web)
+    memo_emails = MemoEmailsDominio(args.memo_emails)
+
+    # Las webs de los negocios se visitan aparte: el navegador no las espera
+    enriquecedor = None
+    if not args.web_sincrona:
+        enriquecedor = EnriquecedorEmails(salida, concurrencia=args.web_concurrencia,
+                                          cache=cache_web, memo=memo_emails)
 
+    # Campana empezada antes del JSONL: se sigue agregando sobre lo que ya tenia
+    migrar_json(args.salida)
+
+    # Resultados, historial y progreso de cada lote se confirman juntos; si la
+    # corrida anterior se corto, aca se terminan de aplicar sus lotes
+    almacen, campana = None, None
+    if args.almacen:
+        almacen = AlmacenLeads(args.almacen)
+        campana = almacen.abrir_campana(args.salida, rubros=rubros, distritos=distritos,
+                                        departamento=args.departamento,
+                                        provincia=args.provincia, tope=args.tope,
+                                        por_busqueda=args.por_busqueda)
+    diario = DiarioCampana(salida, args.salida, registro,
+                           historial=None if args.sin_historial else historial,
+                           almacen=almacen, campana=campana)
+    if diario.recuperados:
+        print(f"Recuperados {diario.recuperados} lotes confirmados de la corrida anterior")
+    # Lo de esta sesion empieza aca en el jsonl: es lo que va al Parquet
+    ruta_jsonl = f'{args.salida}.jsonl'
+    inicio_sesion = os.path.getsize(ruta_jsonl) if os.path.exists(ruta_jsonl) else 0
+
+    def guardar(rubro, distrito, lote, estado):
+        if lote and enriquecedor is not None:
+            enriquecedor.esperar(lote)
+        # El historial entra al indice al confirmar: vistos ya lo ve
+        diario.confirmar(rubro, args.departamento, args.provincia, distrito, lote, estado)
+        aviso = {'parcial': ' (parcial, se reintentara)',
+                 'caida': ' (navegador caido, se reintentara)'}.get(estado, '')
+        print(f"    -> {rubro} en {distrito}: {len(lote)} fichas{aviso}")
+
+    if args.workers > 1:
+        print(f"{args.workers} navegadores en paralelo (tope compartido de {args.tope})")
+
+    pool = PoolCampana(pendientes, crear_scraper, EscritorLotes(guardar), cupo,
+                       args.departamento, args.provincia, args.por_busqueda,
+                       workers=args.workers)
     codigo = 0
     try:
-        s.init_driver()
-
-        for i, (rubro, distrito) in enumerate(pendientes, 1):
-            if s.fichas_extraidas >= args.tope:
-                print(f"\nTope de sesion alcanzado ({args.tope} fichas). "
-                      f"Relanza manana para continuar.")
-                break
-
-            print(f"[{i}/{len(pendientes)}] {rubro} en {distrito} "
-                  f"(acumulado: {s.fichas_extraidas}/{args.tope})")
-
-            lote = s.search_location(rubro, args.departamento, args.provincia, distrito,
-                                     max_results=args.por_busqueda)
-
-            if lote:
-                s.save_results_incremental(lote, args.salida, format='both', append=True)
-                if not args.sin_historial:
-                    historial.agregar(lote)
-                    s.vistos = set(historial.claves)
-
-            # Si el tope corto la busqueda a la mitad, queda 'parcial' para
-            # reintentarla completa en la proxima corrida.
-            cortada = (s.fichas_extraidas >= args.tope and len(lote) < args.por_busqueda)
-            estado = 'parcial' if cortada else 'ok'
-            registro.marcar(rubro, args.departamento, args.provincia, distrito, len(lote), estado)
-            print(f"    -> {len(lote)} fichas{' (parcial, se reintentara)' if cortada else ''}")
-
-    except BloqueoDetectado as e:
-        # Lo importante: cortar y decirlo fuerte. Lo ya guardado sigue siendo valido.
-        print(f"\n{'='*60}")
-        print(f"CORRIDA ABORTADA: Google nos bloqueo ({e})")
-        print(f"Fichas rescatadas antes del corte: {s.fichas_extraidas}")
-        print("Espera unas horas o cambia de IP antes de reintentar.")
-        print("El progreso quedo guardado: al relanzar retoma donde iba.")
-        print('='*60)
-        codigo = 3
+        bloqueo = pool.correr()
+        if bloqueo:
+            # Lo importante: cortar y decirlo fuerte. Lo ya guardado sigue siendo valido.
+            print(f"\n{'='*60}")
+            print(f"CORRIDA ABORTADA: Google nos bloqueo ({bloqueo})")
+            print(f"Fichas rescatadas antes del corte: {cupo.usadas}")
+            print("Espera unas horas o cambia de IP antes de reintentar.")
+            print("El progreso quedo guardado: al relanzar retoma donde iba.")
+            print('='*60)
+            codigo = 3
+        elif pool.escritor.error is not None:
+            # Sin codigo de error, cron y los wrappers la darian por buena
+            print(f"\nCORRIDA FALLIDA: no se pudo guardar un lote ({pool.escritor.error}). "
+                  f"Lo anterior quedo guardado.")
+            codigo = 1
+        elif pool.arrancados == 0:
+            print("\nCORRIDA FALLIDA: ningun navegador pudo arrancar (ver el log).")
+            codigo = 1
+        elif pool.tope_alcanzado:
+            print(f"\nTope de sesion alcanzado ({args.tope} fichas). "
+                  f"Relanza manana para continuar.")
     except KeyboardInterrupt:
-        print(f"\nInterrumpido. {s.fichas_extraidas} fichas guardadas, progreso registrado.")
+        print(f"\nInterrumpido. {cupo.usadas} fichas guardadas, progreso registrado.")
         codigo = 130
     finally:
-        try:
-            s.close()
-        except Exception:
-            pass
+        if enriquecedor is not None:
+            enriquecedor.cerrar()
+        diario.cerrar()
+        if almacen is not None:
+            almacen.cerrar_campana(campana)
+
+    if not args.sin_json and os.path.exists(ruta_jsonl):
+        total = exportar_json(ruta_jsonl, f'{args.salida}.json')
+        print(f"{args.salida}.json exportado ({total} negocios)")
+    if args.parquet and os.path.exists(ruta_jsonl):
+        total = salida.save_results_parquet(args.parquet,
+                                            results=leer_jsonl(ruta_jsonl, inicio_sesion))
+        print(f"{total} fichas de la sesion agregadas a {args.parquet}/")
+    if args.por_distrito and os.path.exists(ruta_jsonl):
+        salida.save_results_by_district(directory=args.por_distrito,
+                                        results=list(leer_jsonl(ruta_jsonl, inicio_sesion)))
+        salida.finalize_results_by_district(args.por_distrito)
+
+    print(f"Ritmo: {ritmo.resumen()}")
+
+    if memo_emails.consultas:
+        print(f"Memo de emails por dominio: {memo_emails.aciertos}/{memo_emails.consultas} "
+              f"webs resueltas sin visitarlas ({memo_emails.tasa_aciertos():.0%})")
+    memo_emails.cerrar()
+
+    if cache_web is not None:
+        c = cache_web.resumen()
+        if c['pedidos']:
+            print(f"Cache web: {c['aciertos'] + c['revalidadas']}/{c['pedidos']} pedidos sin bajar "
+                  f"la pagina ({c['revalidadas']} revalidadas), "
+                  f"{c['hosts_evitados']} a hosts caidos evitados")
+        cache_web.cerrar()
 
     r = registro.resumen()
-    print(f"\nSesion: {s.fichas_extraidas} fichas nuevas en {args.salida}.csv")
+    print(f"\nSesion: {cupo.usadas} fichas nuevas en {args.salida}.csv")
     print(f"Acumulado historico: {r['fichas']} fichas en {r['combinaciones']} combinaciones")
     if not args.sin_historial:
         print(f"Historial de negocios unicos: {historial.negocios} (en {args.vistos})")
+    historial.cerrar()
+    if almacen is not None:
+        a = almacen.resumen()
+        print(f"Almacen {args.almacen}: {a['negocios']} negocios ({a['con_email']} con email), "
+              f"{a['campanas']} campanas")
+        almacen.cerrar()
     return codigo
 
 
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Diario de lotes: resultados, historial y progreso en una sola transaccion.
+
+Antes cada lote tocaba tres archivos por separado (CSV/JSONL de salida,
+vistos.jsonl, progreso.jsonl), cada uno con su open y su fsync. Un corte entre
+medio podia dejar el historial diciendo "ya visto" con el resultado sin
+guardar (ese negocio no se volvia a abrir nunca) o el progreso en 'ok' sin sus
+fichas.
+
+Ahora el lote completo se escribe primero en el diario (`<salida>.diario`) con
+UN fsync: ese es el momento en que queda confirmado. Despues se aplica a los
+tres archivos sin fsync propio. Cada `checkpoint_cada` lotes (y al cerrar) se
+sincronizan todos juntos y el diario se vacia.
+
+Si el proceso muere antes del checkpoint, al abrir se vuelve la salida al
+tamano que tenia en el ultimo checkpoint y se reaplican los lotes del diario.
+Historial y progreso son idempotentes (el historial ignora claves ya vistas,
+el progreso se queda con la ultima marca), asi que se reaplican tal cual.
+"""
+import json
+import logging
+import os
+
+logger = logging.getLogger('campana')
+
+
+def _sincronizar(ruta):
+    if os.path.exists(ruta):
+        with open(ruta, 'rb+') as f:
+            os.fsync(f.fileno())
+
+
+class DiarioCampana:
+    """Escritura transaccional de los lotes de correr_campana.py.
+
+    `salida` es un GMBScraper (solo se usa `save_results_incremental`),
+    `prefijo` el nombre de los archivos de salida sin extension; `historial`
+    puede ser None (--sin-historial). Con `almacen` (AlmacenLeads) cada lote
+    tambien va al SQLite de leads, a nombre de la campana `campana`.
+    """
+
+    def __init__(self, salida, prefijo, registro, historial=None, almacen=None, campana=None,
+                 ruta=None, checkpoint_cada=20):
+        self.salida = salida
+        self.prefijo = prefijo
+        self.registro = registro
+        self.historial = historial
+        self.almacen = almacen
+        self.campana = campana
+        self.ruta = ruta or f'{prefijo}.diario'
+        self.checkpoint_cada = checkpoint_cada
+        self.ruta_csv = f'{prefijo}.csv'
+        self.ruta_jsonl = f'{prefijo}.jsonl'
+        self.pendientes = 0          # lotes confirmados desde el ultimo checkpoint
+        self.recuperados = self._recuperar()
+        if self.recuperados or not os.path.exists(self.ruta):
+            self.checkpoint()
+
+    # --- estado de la salida ------------------------------------------------
+
+    def _base(self):
+        tamano = lambda ruta: os.path.getsize(ruta) if os.path.exists(ruta) else 0
+        return {'tipo': 'base', 'csv': tamano(self.ruta_csv), 'jsonl': tamano(self.ruta_jsonl)}
+
+    def _volver_a_base(self, base):
+        """Deja CSV y JSONL como estaban en el checkpoint: los dos solo crecen,
+        asi que alcanza con cortarlos al tamano de entonces."""
+        for clave, ruta in (('csv', self.ruta_csv), ('jsonl', self.ruta_jsonl)):
+            if clave not in base or not os.path.exists(ruta):
+                continue
+            if base[clave]:
+                if os.path.getsize(ruta) > base[clave]:
+                    with open(ruta, 'rb+') as f:
+                        f.truncate(base[clave])
+            else:
+                os.remove(ruta)  # el CSV se recrea con su encabezado
+
+    # --- diario -------------------------------------------------------------
+
+    def _leer(self):
+        base, lotes = None, []
+        if not os.path.exists(self.ruta):
+            return base, lotes
+        with open(self.ruta, encoding='utf-8') as f:
+            for linea in f:
+                if not linea.endswith('\n'):
+                    break  # confirmacion a medias: ese lote no llego a confirmarse
+                try:
+                    reg = json.loads(linea)
+                except json.JSONDecodeError:
+                    break
+                if reg.get('tipo') == 'base':
+                    base = reg
+                elif reg.get('tipo') == 'lote':
+                    lotes.append(reg)
+        return base, lotes
+
+    def _recuperar(self):
+        base, lotes = self._leer()
+        if not lotes:
+            return 0
+        logger.warning(f"Corrida anterior cortada: se reaplican {len(lotes)} lotes de {self.ruta}")
+        if base is not None:
+            self._volver_a_base(base)
+        for lote in lotes:
+            self._aplicar(lote)
+        return len(lotes)
+
+    def _aplicar(self, reg):
+        if reg['registros']:
+            self.salida.save_results_incremental(reg['registros'], self.prefijo,
+                                                 format='csv+jsonl', append=True)
+            if self.historial is not None:
+                self.historial.agregar(reg['registros'], sincronizar=False)
+            if self.almacen is not None:
+                # Idempotente: reaplicar el lote no duplica observaciones
+                self.almacen.guardar(reg['registros'], campana=reg.get('campana'))
+        self.registro.marcar(reg['rubro'], reg['departamento'], reg['provincia'], reg['distrito'],
+                             len(reg['registros']), reg['estado'], sincronizar=False)
+
+    def confirmar(self, rubro, departamento, provincia, distrito, lote, estado):
+        """Confirma el lote (un fsync) y lo aplica a salida, historial y progreso."""
+        reg = {'tipo': 'lote', 'rubro': rubro, 'departamento': departamento,
+               'provincia': provincia, 'distrito': distrito, 'estado': estado,
+               'campana': self.campana, 'registros': lote}
+        with open(self.ruta, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(reg, ensure_ascii=False, default=str) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._aplicar(reg)
+        self.pendientes += 1
+        if self.pendientes >= self.checkpoint_cada:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Sincroniza los archivos aplicados y vacia el diario."""
+        for ruta in (self.ruta_csv, self.ruta_jsonl, self.registro.ruta,
+                     self.historial.ruta if self.historial is not None else None):
+            if ruta:
+                _sincronizar(ruta)
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(self._base()) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+        self.pendientes = 0
+
+    def cerrar(self):
+        if self.pendientes:
+            self.checkpoint()
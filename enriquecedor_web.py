@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Busca los emails en las webs de los negocios, en segundo plano.
+
+Antes, cada ficha con web esperaba dentro de `_extraer_datos_ficha` a que
+respondiera la web del negocio (8 s de timeout, mas hasta 2 paginas de
+contacto) con el navegador parado. Ahora el scraper solo encola
+(place_id, web, ficha) y sigue; este modulo visita las webs en un loop asyncio
+propio, con concurrencia acotada, una pausa minima por host para no martillar
+al mismo servidor y un pool de conexiones compartido. Al terminar completa
+`emails` / `email` en la misma ficha. Todo lo que bloquea (la red, el parseo
+del HTML, la cache y la memo en SQLite) corre en hilos: el loop solo orquesta.
+
+Quien guarda el lote llama a `esperar(lote)` antes de escribirlo: para
+entonces lo normal es que las webs ya esten resueltas.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import random
+import threading
+import time
+from functools import partial
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cache_web import dominio_registrable
+
+logger = logging.getLogger(__name__)
+
+
+class EnriquecedorEmails:
+    """Etapa asincrona de emails desde la web del negocio.
+
+    `scraper` es un GMBScraper: se reusan sus parsers (`_emails_from_html`,
+    `_find_contact_urls`, `filtrar_emails`) para que los dos caminos den
+    exactamente los mismos emails.
+    """
+
+    def __init__(self, scraper, concurrencia=8, pausa_host=(1.0, 2.0), timeout=8,
+                 seguir_contacto=True, cache=None, memo=None):
+        self.scraper = scraper
+        self.cache = cache            # CacheHTTP opcional, compartida con el scraper
+        self.memo = memo              # MemoEmailsDominio opcional
+        self.concurrencia = concurrencia
+        self.pausa_host = pausa_host
+        self.timeout = timeout
+        self.seguir_contacto = seguir_contacto
+
+        # Una sola sesion: reusa conexiones keep-alive entre fichas del mismo host
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=concurrencia, pool_maxsize=concurrencia)
+        self.sesion.mount('http://', adaptador)
+        self.sesion.mount('https://', adaptador)
+
+        # requests es bloqueante: corre en hilos, el loop solo orquesta
+        self._hilos_red = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrencia, thread_name_prefix='web')
+
+        self._loop = asyncio.new_event_loop()
+        self._cola = None
+        self._hosts = {}          # host -> [asyncio.Lock, ultimo acceso]
+        self._en_curso = {}       # dominio -> Future con sus emails
+        # id(ficha) -> (Future, estado, ficha) de las webs aun sin resolver; la
+        # ficha queda referenciada para que su id no se reuse mientras tanto
+        self._pendientes = {}
+        self._lock = threading.Lock()  # entre el loop y quien guarda el lote
+        self.procesadas = 0
+        self.con_email = 0
+
+        listo = threading.Event()
+        self._hilo = threading.Thread(target=self._correr_loop, args=(listo,),
+                                      name='enriquecedor', daemon=True)
+        self._hilo.start()
+        listo.wait()
+
+    def _correr_loop(self, listo):
+        asyncio.set_event_loop(self._loop)
+        self._cola = asyncio.Queue()
+        self._consumidores = [self._loop.create_task(self._consumidor())
+                              for _ in range(self.concurrencia)]
+        listo.set()
+        self._loop.run_forever()
+
+        # cerrar() paro el loop: se cancela lo que quedaba y se cierra
+        tareas = asyncio.all_tasks(self._loop)
+        for tarea in tareas:
+            tarea.cancel()
+        self._loop.run_until_complete(asyncio.gather(*tareas, return_exceptions=True))
+        self._loop.close()
+
+    def encolar(self, place_id, website, ficha):
+        """Agenda la visita a `website` y devuelve sin esperar."""
+        futuro = concurrent.futures.Future()
+        estado = {'abandonada': False}
+        with self._lock:
+            self._pendientes[id(ficha)] = (futuro, estado, ficha)
+        self._loop.call_soon_threadsafe(
+            self._cola.put_nowait, (place_id, website, ficha, futuro, estado))
+
+    async def _consumidor(self):
+        while True:
+            place_id, website, ficha, futuro, estado = await self._cola.get()
+            emails = []
+            try:
+                emails = await self._emails_de_web(website)
+            except Exception as e:
+                logger.debug(f"Error enriqueciendo {place_id} ({website}): {e}")
+            finally:
+                # Mismo lock con el que esperar() abandona la ficha: o se
+                # completa y se resuelve entera antes, o ya no se toca (quien
+                # guarda se canso de esperar y la ficha esta escrita)
+                with self._lock:
+                    if emails and not estado['abandonada']:
+                        try:
+                            self.scraper.asignar_emails(
+                                ficha, list(ficha.get('emails') or []) + emails)
+                            self.con_email += 1
+                        except Exception as e:
+                            logger.debug(f"Error asignando los emails de {place_id}: {e}")
+                    self.procesadas += 1
+                    # Resuelta: esperar() ya no tiene nada que esperar de ella, y
+                    # una ficha que nunca llega a esperar() no queda colgada aca
+                    if self._pendientes.get(id(ficha), (None,))[0] is futuro:
+                        del self._pendientes[id(ficha)]
+                    futuro.set_result(None)
+                self._cola.task_done()
+
+    async def _en_hilo(self, funcion, *args):
+        return await self._loop.run_in_executor(self._hilos_red, partial(funcion, *args))
+
+    def _get_bloqueante(self, url, headers):
+        if self.cache is not None:
+            return self.cache.obtener(self.sesion, url, headers=headers, timeout=self.timeout)
+        return self.sesion.get(url, headers=headers, timeout=self.timeout, verify=False)
+
+    async def _get(self, url):
+        """GET respetando la pausa minima entre pedidos al mismo host."""
+        headers = {'User-Agent': random.choice(self.scraper.user_agents)}
+        # Lo que sale de la cache no toca el servidor: no hace falta la pausa
+        if self.cache is not None and await self._en_hilo(self.cache.fresca, url):
+            return await self._en_hilo(self._get_bloqueante, url, headers)
+
+        host = urlparse(url).netloc.lower()
+        if host not in self._hosts:
+            self._hosts[host] = [asyncio.Lock(), 0.0]
+        candado = self._hosts[host][0]
+
+        async with candado:
+            espera = self._hosts[host][1] + random.uniform(*self.pausa_host) - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+            try:
+                return await self._en_hilo(self._get_bloqueante, url, headers)
+            finally:
+                self._hosts[host][1] = time.monotonic()
+
+    async def _emails_de_web(self, url):
+        """Emails de la web, pasando antes por la memo por dominio.
+
+        Si otra sucursal de la misma cadena ya esta en camino, se espera su
+        resultado en vez de pedir la misma web dos veces a la vez.
+        """
+        if self.memo is None:
+            emails, _ = await self._visitar_web(url)
+            return emails
+
+        dominio = dominio_registrable(url)
+        if dominio in self._en_curso:
+            emails = await asyncio.shield(self._en_curso[dominio])
+            await self._en_hilo(self.memo.anotar_acierto)
+            return list(emails)
+
+        # Mientras se consulta la memo (en un hilo) se reserva el dominio: otra
+        # sucursal que llegue ahora espera esta consulta en vez de repetirla
+        futuro = self._loop.create_future()
+        self._en_curso[dominio] = futuro
+        emails = []
+        try:
+            memo = await self._en_hilo(self.memo.obtener, url)
+            if memo is not None:
+                emails = memo
+                return emails
+            emails, visitada = await self._visitar_web(url)
+            # Solo se recuerda lo que se pudo leer: un timeout no es "no tiene email"
+            if visitada:
+                await self._en_hilo(self.memo.guardar, url, emails)
+        finally:
+            del self._en_curso[dominio]
+            futuro.set_result(emails)
+        return emails
+
+    async def _visitar_web(self, url):
+        """Mismo recorrido que GMBScraper.extract_emails_from_website.
+
+        Devuelve (emails filtrados, si la home se pudo leer).
+        """
+        emails = []
+        visitada = False
+        try:
+            response = await self._get(url)
+            if response.status_code == 200:
+                visitada = True
+                encontrados, soup = await self._en_hilo(self.scraper._emails_from_html,
+                                                        response.text)
+                emails.extend(encontrados)
+
+                # Si la home no dio email, probar las paginas de contacto
+                if self.seguir_contacto and not encontrados:
+                    contactos = await self._en_hilo(self.scraper._find_contact_urls,
+                                                    soup, response.url)
+                    for contacto in contactos:
+                        try:
+                            r2 = await self._get(contacto)
+                            if r2.status_code == 200:
+                                mas, _ = await self._en_hilo(self.scraper._emails_from_html,
+                                                             r2.text)
+                                if mas:
+                                    logger.info(f"Emails encontrados en {contacto}")
+                                    emails.extend(mas)
+                                    break
+                        except Exception as e:
+                            logger.debug(f"Error en pagina de contacto {contacto}: {e}")
+        except Exception as e:
+            logger.debug(f"Error extracting emails from website {url}: {e}")
+
+        return await self._en_hilo(self.scraper.filtrar_emails, emails), visitada
+
+    def esperar(self, fichas, timeout=60):
+        """Espera a que terminen las webs de `fichas` (hasta `timeout` en total).
+
+        Devuelve cuantas quedaron sin resolver; esas se guardan con los emails
+        que ya tenian de la ficha de Google.
+        """
+        limite = time.monotonic() + timeout
+        sin_resolver = 0
+        for ficha in fichas:
+            with self._lock:
+                item = self._pendientes.pop(id(ficha), None)
+            if item is None:
+                continue
+            futuro, estado, _ = item
+            try:
+                futuro.result(timeout=max(0, limite - time.monotonic()))
+            except concurrent.futures.TimeoutError:
+                with self._lock:
+                    # Justo pudo terminar: entonces la ficha ya esta completa
+                    if not futuro.done():
+                        estado['abandonada'] = True
+                        sin_resolver += 1
+        if sin_resolver:
+            logger.warning(f"{sin_resolver} webs no respondieron a tiempo, "
+                           f"se guardan sin su email")
+        return sin_resolver
+
+    def cerrar(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._hilo.join(timeout=5)
+        self._hilos_red.shutdown(wait=False, cancel_futures=True)
+        self.sesion.close()
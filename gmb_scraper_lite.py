@@ -6,15 +6,15 @@ from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.common.action_chains import ActionChains
-from webdriver_manager.chrome import ChromeDriverManager
 import time
 import json
-import re
+import base64
 import random
 from datetime import datetime, timedelta
 from dateutil import parser
 from collections import defaultdict
 import os
+import threading
 try:
     import pandas as pd
     PANDAS_AVAILABLE = True
@@ -27,6 +27,12 @@ import requests
 from bs4 import BeautifulSoup
 import urllib3
 
+import navegador
+import parseo
+import red_maps
+import salidas
+from ritmo import Ritmo
+
 # Suppress SSL warnings for website scraping
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -34,6 +40,10 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 
+# archivo_listado es uno para todos los workers
+_ESCRITURA_LISTADO = threading.Lock()
+
+
 class BloqueoDetectado(Exception):
     """Google sirvio captcha / consentimiento / pagina vacia sospechosa.
 
@@ -46,10 +56,38 @@ class LimiteSesionAlcanzado(Exception):
     """Se llego al tope de fichas configurado para la sesion."""
 
 
+class DriverCaido(Exception):
+    """El navegador murio o dejo de responder a mitad de una busqueda.
+
+    Antes se tragaba como cualquier error y la busqueda devolvia [], que la
+    campana marcaba 'ok' para siempre. `parciales` trae las fichas que se
+    alcanzaron a extraer: ya estan en vistos, asi que no se pueden perder.
+    """
+
+    def __init__(self, motivo, parciales=None):
+        super().__init__(motivo)
+        self.parciales = parciales or []
+
+
 class GMBScraper:
-    def __init__(self, headless=False):
+    def __init__(self, headless=False, perfil=None):
         self.driver = None
         self.headless = headless
+        self.perfil = perfil                # user-data-dir propio (un perfil por worker)
+        self.chromedriver = None            # ruta fija del chromedriver (None = resolver sin red)
+        self.puerto_depuracion = None       # Chrome persistente: conectarse a este puerto
+        self.segundos_arranque = None       # lo que tardo el ultimo init_driver
+        self.ligero = False                 # no bajar teselas, fotos, fuentes, media ni trackers
+        self.bloqueo_extra = []             # patrones de URL a bloquear ademas de BLOQUEO_LIGERO
+        self.patrones_bloqueo = []          # los que quedaron activos en el driver
+        self.reinicios = 0                  # veces que se relanzo el navegador en la sesion
+        # Chrome crece con cada driver.get: pasado un umbral se relanza entre fichas
+        self.reciclar_fichas = None         # fichas por navegador antes de relanzarlo
+        self.reciclar_mb = None             # RSS de Chrome (MB) que dispara el relanzamiento
+        self.fichas_driver = 0              # fichas abiertas desde el ultimo init_driver
+        self.busquedas_driver = 0           # busquedas desde el ultimo init_driver
+        self.reciclajes = 0
+        self.busqueda_incompleta = False    # la ultima busqueda se corto por un error
         self.results = []
         self.max_results_per_location = 10  # Limit to 10 results
 
@@ -59,6 +97,21 @@ class GMBScraper:
         self.max_fichas_sesion = None       # tope duro de fichas por corrida
         self.fichas_extraidas = 0           # contador de la sesion
         self.pausa_entre_busquedas = (20, 40)  # segundos entre una busqueda y otra
+        self.cupo = None                    # CupoCompartido cuando hay varios workers
+        self.detener = None                 # threading.Event: otro worker pidio cortar
+        self.pestanas = 1                   # fichas abiertas a la vez en pestanas del driver
+        self.espera_pestanas = 20           # segundos maximos para que cargue un grupo
+        self.enriquecedor = None            # EnriquecedorEmails: webs en segundo plano
+        self.cache_web = None               # CacheHTTP: webs de negocios ya bajadas
+        self.memo_emails = None             # MemoEmailsDominio: emails ya sacados por dominio
+        self.motor_ficha = 'js'             # 'js': un execute_script por ficha; 'selenium'
+                                            # campo por campo; 'red': respuestas de Maps (red_maps)
+        self.listado_red = {}               # place_id -> campos del listado en curso, leidos por red
+        self.archivo_listado = None         # JSONL para los negocios del listado que no se abrieron
+        self._ficha_red = None              # campos por red de la ficha recien cargada
+        self.archivo_snapshots = None       # ArchivoSnapshots: HTML del panel por place_id
+        self.consulta_actual = ''           # rubro de la busqueda en curso (va en el snapshot)
+        self.ritmo = Ritmo()                # pausas y tope de navegaciones (uno por IP)
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
@@ -68,39 +121,243 @@ class GMBScraper:
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36 Edg/119.0.0.0',
         ]
         
-    def init_driver(self):
-        options = Options()
-        if self.headless:
-            options.add_argument('--headless')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--disable-blink-features=AutomationControlled')
-        
+    def _argumentos_chrome(self):
+        """Flags de Chrome comunes al driver propio y al navegador persistente."""
+        argumentos = ['--no-sandbox', '--disable-dev-shm-usage',
+                      '--disable-blink-features=AutomationControlled',
+                      '--disable-features=AutomationControlled']
+
         # Random user agent
         user_agent = random.choice(self.user_agents)
-        options.add_argument(f'--user-agent={user_agent}')
+        argumentos.append(f'--user-agent={user_agent}')
         logger.info(f"Using User-Agent: {user_agent[:50]}...")
-        
+
         # Random window size
         width = random.randint(1200, 1920)
         height = random.randint(800, 1080)
-        options.add_argument(f'--window-size={width},{height}')
-        
-        options.add_experimental_option("excludeSwitches", ["enable-automation"])
-        options.add_experimental_option('useAutomationExtension', False)
-        
-        # Additional anti-detection
-        options.add_argument('--disable-features=AutomationControlled')
-        
-        service = Service(ChromeDriverManager().install())
-        self.driver = webdriver.Chrome(service=service, options=options)
-        
+        argumentos.append(f'--window-size={width},{height}')
+        return argumentos
+
+    def init_driver(self):
+        inicio = time.monotonic()
+        if self.puerto_depuracion:
+            modo = self._conectar_persistente()
+        else:
+            options = Options()
+            if self.headless:
+                options.add_argument('--headless')
+            for argumento in self._argumentos_chrome():
+                options.add_argument(argumento)
+            options.add_experimental_option("excludeSwitches", ["enable-automation"])
+            options.add_experimental_option('useAutomationExtension', False)
+            if self.perfil:
+                options.add_argument(f'--user-data-dir={os.path.abspath(self.perfil)}')
+            if self.ligero:
+                options.add_experimental_option('prefs', navegador.PREFERENCIAS_LIGERO)
+            modo = self._crear_driver(options)
+
+        self.patrones_bloqueo = []
+        if self.ligero:
+            patrones = navegador.patrones_bloqueo(self.bloqueo_extra)
+            try:
+                navegador.bloquear_recursos(self.driver, patrones)
+                self.patrones_bloqueo = patrones
+                modo += f", ligero: {len(patrones)} patrones bloqueados"
+            except Exception as e:
+                logger.warning(f"No se pudo activar el bloqueo de recursos: {e}")
+
         # Execute script to remove webdriver property
         self.driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
-        
+
         self.wait = WebDriverWait(self.driver, 20)
         self.actions = ActionChains(self.driver)
-        
+        self.fichas_driver = 0
+        self.busquedas_driver = 0
+        self.segundos_arranque = time.monotonic() - inicio
+        logger.info(f"Driver listo en {self.segundos_arranque:.1f}s ({modo})")
+
+    def _crear_driver(self, options):
+        """Abre el driver con el chromedriver resuelto sin red; si el anotado
+        ya no sirve (Chrome se actualizo), lo olvida y prueba con uno nuevo."""
+        if self.motor_ficha == 'red':
+            # Log de performance: trae los eventos de red para pedir cada cuerpo por CDP
+            options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        ruta, origen = navegador.resolver_chromedriver(self.chromedriver)
+        try:
+            self.driver = webdriver.Chrome(service=Service(ruta), options=options)
+        except Exception as e:
+            if origen not in ('cache', 'path'):
+                raise
+            logger.warning(f"El chromedriver {ruta} no arranco ({e}); se baja otro")
+            navegador.olvidar_chromedriver()
+            if origen == 'path':
+                # El del PATH no se puede olvidar: se pide la descarga directamente
+                from webdriver_manager.chrome import ChromeDriverManager
+                ruta, origen = ChromeDriverManager().install(), 'descarga'
+            else:
+                ruta, origen = navegador.resolver_chromedriver()
+            self.driver = webdriver.Chrome(service=Service(ruta), options=options)
+        return f"chromedriver {origen}"
+
+    def _conectar_persistente(self):
+        """Se conecta al Chrome que escucha en puerto_depuracion; si no hay
+        ninguno lo arranca, y queda abierto para la proxima corrida."""
+        puerto = self.puerto_depuracion
+        modo = 'reconectado'
+        if not navegador.puerto_abierto(puerto):
+            perfil = self.perfil or os.path.join('perfiles', f'puerto{puerto}')
+            argumentos = self._argumentos_chrome()
+            if self.headless:
+                argumentos.insert(0, '--headless=new')
+            if self.ligero:
+                # Las preferencias no se pueden pasar al conectarse: flag de arranque
+                argumentos.append('--blink-settings=imagesEnabled=false')
+            navegador.arrancar_chrome(puerto, perfil, argumentos)
+            modo = 'arrancado'
+        # Con debuggerAddress chromedriver rechaza excludeSwitches y los flags:
+        # el navegador ya esta configurado desde que se lanzo
+        options = Options()
+        options.debugger_address = f'127.0.0.1:{puerto}'
+        self._crear_driver(options)
+
+        # Pestanas que quedaron de una corrida cortada: se trabaja en una sola
+        ventanas = self.driver.window_handles
+        for ventana in ventanas[1:]:
+            try:
+                self.driver.switch_to.window(ventana)
+                self.driver.close()
+            except Exception:
+                pass
+        self.driver.switch_to.window(ventanas[0])
+        return f"Chrome persistente {modo} en :{puerto}"
+
+    def driver_responde(self, espera=10):
+        """Ping barato: un execute_script trivial con tiempo limite.
+
+        False si chromedriver murio, Chrome se cerro o el renderer esta colgado
+        (en ese caso el script no vuelve nunca: por eso va en un hilo aparte).
+        """
+        if self.driver is None:
+            return False
+        respuesta = []
+
+        def ping():
+            try:
+                respuesta.append(self.driver.execute_script('return 1') == 1)
+            except Exception:
+                respuesta.append(False)
+
+        hilo = threading.Thread(target=ping, name='ping-driver', daemon=True)
+        hilo.start()
+        hilo.join(espera)
+        return bool(respuesta and respuesta[0])
+
+    def _procesos_navegador(self):
+        servicio = getattr(self.driver, 'service', None)
+        proceso = getattr(servicio, 'process', None)
+        marcas = []
+        if self.perfil:
+            marcas.append(f'--user-data-dir={os.path.abspath(self.perfil)}')
+        if self.puerto_depuracion:
+            marcas.append(f'--remote-debugging-port={self.puerto_depuracion}')
+        return navegador.procesos_navegador(getattr(proceso, 'pid', None), marcas)
+
+    def reiniciar_driver(self, espera=15):
+        """Cierra el navegador (vivo, muerto o colgado) y abre otro con el
+        mismo perfil, chromedriver y modo; el resto del scraper no cambia."""
+        procesos = (navegador.identificar_procesos(self._procesos_navegador())
+                    if self.driver is not None else {})
+        if self.driver is not None:
+            cierre = threading.Thread(target=self.close, name='cierre-driver', daemon=True)
+            cierre.start()
+            cierre.join(espera)
+        # Lo que quedo colgado retiene el perfil y Chrome no lo volveria a abrir
+        restos = navegador.matar_procesos(procesos)
+        if restos:
+            logger.info(f"{restos} procesos de Chrome que quedaban, eliminados")
+            time.sleep(1)
+        self.driver = None
+        self.init_driver()
+        self.reinicios += 1
+
+    def memoria_navegador(self):
+        """(MB de RSS, procesos) de este navegador: chromedriver, Chrome y renderers."""
+        pids = self._procesos_navegador()
+        return navegador.memoria_procesos(pids) / 2**20, len(pids)
+
+    def _motivo_reciclaje(self):
+        """Por que toca relanzar el navegador ahora, o None."""
+        if self.reciclar_fichas and self.fichas_driver >= self.reciclar_fichas:
+            return f"{self.fichas_driver} fichas"
+        if self.reciclar_mb:
+            mb, _ = self.memoria_navegador()
+            if mb >= self.reciclar_mb:
+                return f"{mb:.0f} MB"
+        return None
+
+    def reciclar_driver(self, motivo=''):
+        """Relanza el navegador entre fichas, con el mismo perfil.
+
+        Lo que importa de la sesion vive en Python (vistos, candidatos de la
+        busqueda en curso, cupo, progreso), asi que la busqueda sigue con el
+        candidato siguiente como si nada. La memoria de cada ciclo queda en el
+        log para dimensionar cuantos workers entran en una maquina.
+        """
+        antes, procesos = self.memoria_navegador()
+        fichas = self.fichas_driver
+        inicio = time.monotonic()
+        self.reiniciar_driver()
+        despues, _ = self.memoria_navegador()
+        self.reciclajes += 1
+        logger.info(f"Reciclaje {self.reciclajes} del navegador ({motivo}): {antes:.0f} MB en "
+                    f"{procesos} procesos tras {fichas} fichas -> {despues:.0f} MB, "
+                    f"{time.monotonic() - inicio:.1f}s")
+
+    def _vaciar_red(self):
+        """Descarta el log de red acumulado: lo que se lea despues es de la pagina nueva."""
+        if self.motor_ficha == 'red':
+            try:
+                self.driver.get_log('performance')
+            except Exception:
+                pass
+
+    def _lugares_red(self):
+        """{place_id: campos} de las respuestas de Maps llegadas desde la ultima
+        lectura del log (el documento y los XHR de ficha y listado)."""
+        if self.motor_ficha != 'red':
+            return {}
+        try:
+            entradas = self.driver.get_log('performance')
+        except Exception as e:
+            logger.warning(f"Sin log de red ({e}); se sigue leyendo las fichas del DOM")
+            self.motor_ficha = 'js'
+            return {}
+
+        pedidos = []
+        for entrada in entradas:
+            try:
+                mensaje = json.loads(entrada['message'])['message']
+            except (KeyError, TypeError, ValueError):
+                continue
+            if mensaje.get('method') != 'Network.responseReceived':
+                continue
+            params = mensaje.get('params') or {}
+            url = (params.get('response') or {}).get('url', '')
+            if any(u in url for u in red_maps.URLS_DATOS):
+                pedidos.append(params.get('requestId'))
+
+        lugares = {}
+        for pedido in pedidos:
+            try:
+                cuerpo = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': pedido})
+            except Exception:
+                continue  # sin terminar o ya fuera del buffer del navegador
+            texto = cuerpo.get('body') or ''
+            if cuerpo.get('base64Encoded'):
+                texto = base64.b64decode(texto).decode('utf-8', 'replace')
+            lugares.update(red_maps.lugares_de_respuesta(texto))
+        return lugares
+
     def get_detail_panel(self):
         """Devuelve el panel de detalle del negocio abierto.
 
@@ -133,6 +390,9 @@ class GMBScraper:
         'acepto', 'aceptar todo', 'accept all',
     ]
 
+    # Base de las busquedas; los benchmarks la apuntan al servidor de fixtures
+    URL_MAPS = 'https://www.google.com/maps'
+
     # Etiquetas con que Google marca un resultado pagado
     MARCAS_ANUNCIO = ['patrocinad', 'sponsored', 'anuncio', 'publicidad', 'ad ·']
 
@@ -149,35 +409,56 @@ class GMBScraper:
                     By.XPATH, './ancestor::div[contains(@class,"Nv2PK")][1]')
             except Exception:
                 pass
-
-            texto = (contenedor.text or '').lower()
-            if any(marca in texto for marca in self.MARCAS_ANUNCIO):
-                return True
-
-            aria = (tarjeta.get_attribute('aria-label') or '').lower()
-            if any(marca in aria for marca in self.MARCAS_ANUNCIO):
-                return True
+            return self.es_anuncio(contenedor.text, tarjeta.get_attribute('aria-label'))
 
         except Exception as e:
             logger.debug(f"No se pudo comprobar si es anuncio: {e}")
 
         return False
 
+    @classmethod
+    def es_anuncio(cls, texto, aria):
+        """Lo mismo que es_patrocinado, sobre el texto ya leido de la tarjeta."""
+        texto, aria = (texto or '').lower(), (aria or '').lower()
+        return any(marca in texto or marca in aria for marca in cls.MARCAS_ANUNCIO)
+
+    # Lee de una vez las tarjetas del listado a partir de la numero `desde`:
+    # href, aria-label y texto de la tarjeta contenedora (para los anuncios).
+    # Antes eran find_elements + 4 o 5 comandos por tarjeta, repetidos sobre
+    # todas las ya vistas despues de cada scroll.
+    JS_LISTADO = """
+        const desde = arguments[0];
+        const tarjetas = document.querySelectorAll('a[href*="/maps/place/"]');
+        // Si el listado se rearmo (tiene menos que antes), se relee entero
+        const inicio = tarjetas.length < desde ? 0 : desde;
+        const nuevas = [];
+        for (let i = inicio; i < tarjetas.length; i++) {
+            const a = tarjetas[i];
+            const contenedor = a.closest('div.Nv2PK') || a;
+            nuevas.push({href: a.href, aria: a.getAttribute('aria-label') || '',
+                         texto: contenedor.innerText || ''});
+        }
+        return {total: tarjetas.length, nuevas: nuevas};
+    """
+
+    JS_SCROLL_LISTADO = """
+        const feed = document.querySelector('div[role="feed"]');
+        if (!feed) return false;
+        feed.scrollTop = feed.scrollHeight;
+        return true;
+    """
+
+    JS_CONTAR_TARJETAS = "return document.querySelectorAll('a[href*=\"/maps/place/\"]').length;"
+
     @staticmethod
     def extraer_place_id(href):
         """Saca el identificador estable del negocio desde el href de la tarjeta.
 
         El href trae .../data=!4m7!3m6!1s0x9105b873f28de1c7:0x6...!8m2...
-        donde el token tras !1s identifica al lugar.
+        donde el token tras !1s identifica al lugar; si no esta, el nombre
+        dentro de la URL.
         """
-        if not href:
-            return ''
-        m = re.search(r'!1s([^!]+)', href)
-        if m:
-            return m.group(1)
-        # Fallback: el nombre dentro de la URL
-        m = re.search(r'/maps/place/([^/@]+)', href)
-        return m.group(1) if m else ''
+        return parseo.place_id_de_href(href)
 
     def detectar_bloqueo(self):
         """Distingue 'no hay resultados' de 'Google nos corto'.
@@ -230,7 +511,7 @@ class GMBScraper:
             x = random.randint(100, 800)
             y = random.randint(100, 600)
             self.actions.move_by_offset(x, y).perform()
-            self.random_delay(0.1, 0.3)
+            self.ritmo.pausa('gesto')
             # Reset mouse position
             self.actions.move_by_offset(-x, -y).perform()
         except:
@@ -267,31 +548,47 @@ class GMBScraper:
             logger.debug(f"Error during scroll: {e}")
         
     def search_business(self, query, location):
+        businesses = []
+        sin_registrar = 0   # lugares del cupo reservados para fichas aun no registradas
+        self.busqueda_incompleta = False
         try:
+            self.consulta_actual = query
             search_query = f"{query} en {location}, Perú"
-            url = f"https://www.google.com/maps/search/{search_query.replace(' ', '+')}"
+            url = f"{self.URL_MAPS}/search/{search_query.replace(' ', '+')}"
             
             logger.info(f"Loading URL: {url}")
+            self.listado_red = {}
+            if not self.ritmo.turno(self.detener):
+                logger.warning("Corte pedido por otro worker, no se abre la busqueda")
+                return businesses
+            self._vaciar_red()
+            inicio = time.monotonic()
             self.driver.get(url)
+            self.busquedas_driver += 1
             
-            # Random delay after page load
-            self.random_delay(3, 6)
+            # Esperar a que aparezca el listado y completar la pausa hasta el
+            # presupuesto; si tardo en cargar, no se duerme encima
+            self.ritmo.esperar_listo(self._listado_cargado, 'listado', inicio)
             
             # Random mouse movement
             self.random_mouse_movement()
             
             # Check if we need to accept cookies
             try:
+                redirigido = 'consent.google' in self.driver.current_url
                 accept_button = self.driver.find_element(By.XPATH, "//button[contains(text(), 'Accept') or contains(text(), 'Aceptar')]")
-                self.random_delay(0.5, 1)
+                # Un perfil nuevo (o recien reciclado) muestra el muro de cookies
+                # en su primera busqueda, y eso es lo normal. A mitad de la
+                # sesion, o como redireccion a consent.google.com, suele
+                # anteceder al bloqueo.
+                if redirigido or self.busquedas_driver > 1:
+                    self.ritmo.observar_busqueda('consentimiento')
+                self.ritmo.pausa('clic')
                 accept_button.click()
-                self.random_delay(1, 2)
+                self.ritmo.pausa('clic')
             except:
                 pass
             
-            # Wait for results with random delay
-            self.random_delay(2, 4)
-            
             # Find business elements using the selectors that work
             business_elements = []
             
@@ -326,12 +623,23 @@ class GMBScraper:
                         pass
                     raise BloqueoDetectado(motivo)
                 logger.warning("No business elements found (la pagina cargo bien: rubro sin resultados)")
+                self.ritmo.observar_busqueda('vacio')
                 return []
+
+            self.ritmo.observar_busqueda('ok')
             
             # 1) Recolectar las URLs del listado, bajando hasta juntar
             #    suficientes candidatos (los anuncios y repetidos se descartan).
             candidatos = self.recolectar_candidatos()
 
+            # Lo que Maps mando del listado (documento + XHR del scroll): datos
+            # de las tarjetas que no se van a abrir. Los anuncios ya no estan
+            # en candidatos, asi que tampoco aca.
+            if self.motor_ficha == 'red':
+                ids = {place_id for place_id, _, _ in candidatos}
+                self.listado_red = {k: v for k, v in self._lugares_red().items() if k in ids}
+                logger.info(f"{len(self.listado_red)} negocios del listado leidos por red")
+
             if not candidatos:
                 logger.warning("Ninguna tarjeta utilizable en el listado")
                 return []
@@ -342,40 +650,67 @@ class GMBScraper:
             # 2) Abrir cada ficha por su URL. Nada de clics: Maps reordena el
             #    listado despues de cada uno y eso repetia unos negocios y se
             #    saltaba otros.
-            businesses = []
-            for idx, (place_id, href, nombre) in enumerate(candidatos, 1):
-                if len(businesses) >= self.max_results_per_location:
-                    break
-
-                if place_id in self.vistos:
-                    logger.info(f"{idx}. {nombre}: ya extraido, se salta")
-                    continue
-
-                logger.info(f"{idx}. ficha {len(businesses)+1}/"
-                            f"{self.max_results_per_location}: {nombre}")
+            #    Con self.pestanas > 1 se abren de a K en pestanas del mismo
+            #    driver, para que las cargas se solapen en vez de esperarse.
+            idx = 0
+            while idx < len(candidatos) and len(businesses) < self.max_results_per_location:
+                if self.detener is not None and self.detener.is_set():
+                    logger.warning("Corte pedido por otro worker, se deja la busqueda aqui")
+                    return businesses
 
-                self.random_delay(1, 3)
-                business_data = self.extraer_desde_url(href, location)
+                faltan = self.max_results_per_location - len(businesses)
+                if self.max_fichas_sesion is not None:
+                    faltan = min(faltan, self.max_fichas_sesion - self.fichas_extraidas)
+                tamano = max(1, min(self.ritmo.concurrencia(self.pestanas), faltan))
+
+                grupo = []
+                while idx < len(candidatos) and len(grupo) < tamano:
+                    place_id, href, nombre = candidatos[idx]
+                    idx += 1
+                    if place_id in self.vistos:
+                        logger.info(f"{idx}. {nombre}: ya extraido, se salta")
+                        continue
+                    logger.info(f"{idx}. ficha {len(businesses) + len(grupo) + 1}/"
+                                f"{self.max_results_per_location}: {nombre}")
+                    grupo.append((place_id, href, nombre))
 
-                if not business_data:
-                    continue
+                if not grupo:
+                    break
 
-                business_data['place_id'] = place_id
-                clave = place_id or (f"{business_data.get('name','')}|"
-                                     f"{business_data.get('address','')}").lower()
-                if clave in self.vistos:
-                    logger.info(f"Repetido tras abrir la ficha: {business_data.get('name')}")
-                    continue
+                # Entre fichas, nunca a mitad de una: lo pendiente sigue en `candidatos`
+                motivo = self._motivo_reciclaje()
+                if motivo:
+                    self.reciclar_driver(motivo)
+
+                # Con varios workers el tope es de todos: se reserva el lugar
+                # ANTES de abrir la ficha, si no se pasarian de largo a la vez
+                if self.cupo is not None:
+                    reservados = 0
+                    while reservados < len(grupo) and self.cupo.reservar():
+                        reservados += 1
+                    if not reservados:
+                        logger.warning("Cupo de la sesion agotado (compartido), cortando aqui")
+                        return businesses
+                    grupo = grupo[:reservados]
+
+                sin_registrar = len(grupo)
+                if len(grupo) == 1:
+                    datos = [self.extraer_desde_url(grupo[0][1], location)]
+                else:
+                    datos = self.extraer_en_pestanas([href for _, href, _ in grupo], location)
+                self.fichas_driver += len(grupo)
 
-                self.vistos.add(clave)
-                businesses.append(business_data)
-                self.fichas_extraidas += 1
+                for (place_id, href, _), business_data in zip(grupo, datos):
+                    sin_registrar -= 1
+                    if not self._registrar_ficha(place_id, business_data, businesses, href):
+                        continue
 
-                if (self.max_fichas_sesion is not None
-                        and self.fichas_extraidas >= self.max_fichas_sesion):
-                    logger.warning(
-                        f"Tope de sesion alcanzado ({self.max_fichas_sesion} fichas), cortando aqui")
-                    return businesses
+                    if (self.max_fichas_sesion is not None
+                            and self.fichas_extraidas >= self.max_fichas_sesion):
+                        logger.warning(
+                            f"Tope de sesion alcanzado ({self.max_fichas_sesion} fichas), cortando aqui")
+                        self._liberar_cupo(sin_registrar)
+                        return businesses
 
             if len(businesses) < self.max_results_per_location:
                 logger.info(f"Se agotaron los candidatos: {len(businesses)} fichas "
@@ -384,10 +719,72 @@ class GMBScraper:
             return businesses
 
         except (BloqueoDetectado, LimiteSesionAlcanzado):
+            self._liberar_cupo(sin_registrar)
             raise  # nunca tragarse un bloqueo: debe abortar la corrida
+        except DriverCaido as e:
+            self._liberar_cupo(sin_registrar)
+            e.parciales = businesses
+            raise
         except Exception as e:
+            self._liberar_cupo(sin_registrar)
+            # Un driver muerto no es "rubro sin resultados": que se reintente
+            if not self.driver_responde():
+                raise DriverCaido(f"{type(e).__name__}: {e}", businesses) from e
+            # Las fichas ya registradas estan en vistos: si se tiraran aca no
+            # se volverian a sacar nunca. La busqueda queda incompleta.
             logger.error(f"Error searching businesses: {e}")
-            return []
+            self.busqueda_incompleta = True
+            return businesses
+
+    def _registrar_ficha(self, place_id, business_data, businesses, href=''):
+        """Agrega la ficha a `businesses` si sirve y no es repetida."""
+        snapshot = business_data.pop('_snapshot', None) if business_data else None
+        if not business_data:
+            self._liberar_cupo()
+            return False
+
+        business_data['place_id'] = place_id
+        clave = place_id or (f"{business_data.get('name','')}|"
+                             f"{business_data.get('address','')}").lower()
+        if not self._marcar_visto(clave):
+            logger.info(f"Repetido tras abrir la ficha: {business_data.get('name')}")
+            self._liberar_cupo()
+            return False
+
+        businesses.append(business_data)
+        self.fichas_extraidas += 1
+
+        if snapshot and self.archivo_snapshots is not None:
+            try:
+                self.archivo_snapshots.guardar(place_id, snapshot, {
+                    'href': href,
+                    'location': business_data.get('location', ''),
+                    'query': self.consulta_actual,
+                    'timestamp': business_data.get('timestamp', ''),
+                })
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el snapshot de {place_id}: {e}")
+
+        if self.enriquecedor is not None and business_data.get('website', 'N/A') != 'N/A':
+            self.enriquecedor.encolar(place_id, business_data['website'], business_data)
+        return True
+
+    def _marcar_visto(self, clave):
+        """Agrega `clave` a vistos; False si ya estaba. Con el VistosSesion que
+        comparten los workers el chequeo y el alta van juntos bajo su lock."""
+        agregar = getattr(self.vistos, 'agregar_si_nuevo', None)
+        if agregar is not None:
+            return agregar(clave)
+        if clave in self.vistos:
+            return False
+        self.vistos.add(clave)
+        return True
+
+    def _liberar_cupo(self, fichas=1):
+        """Devuelve los lugares reservados de fichas que al final no se guardaron."""
+        if self.cupo is not None:
+            for _ in range(fichas):
+                self.cupo.liberar()
     
     def _extraer_datos_ficha(self, location):
         """Extrae los datos de la ficha YA abierta (por clic o por URL)."""
@@ -396,26 +793,154 @@ class GMBScraper:
             'timestamp': datetime.now().isoformat()
         }
 
+        # Motor 'red': los campos de la respuesta de Maps ya capturada. Motor
+        # 'js': todo el panel en un solo execute_script. Si no hay datos de red,
+        # el script falla (o se pidio 'selenium'), el camino de siempre,
+        # elemento por elemento.
+        red, self._ficha_red = self._ficha_red, None
+        leido = self._leer_ficha_red(red) if red else None
+        if leido is None and self.motor_ficha in ('js', 'red'):
+            leido = self._leer_ficha_js()
+        if leido is None:
+            leido = self._leer_ficha_selenium()
+        campos, emails = leido
+        business_info.update(campos)
+
+        # HTML del panel para poder re-extraer sin Google; se guarda al
+        # registrar la ficha, que es cuando se conoce su place_id
+        if self.archivo_snapshots is not None:
+            business_info['_snapshot'] = self._html_panel()
+
+        if business_info['name'] == 'N/A':
+            logger.warning("Could not find business name")
+
+        # Si el negocio tiene web, siempre buscar el email ahi (antes se
+        # saltaba el 50% de las veces y se perdian leads en silencio).
+        # Con enriquecedor, la web se visita en segundo plano al registrar la
+        # ficha y el navegador no se queda esperando.
+        if business_info['website'] != 'N/A' and self.enriquecedor is None:
+            self.ritmo.pausa('web')
+            website_emails = self.extract_emails_from_website(business_info['website'])
+            emails.extend(website_emails)
+
+        self.asignar_emails(business_info, emails)
+        
+        # Log what we extracted
+        logger.info(f"Extracted: {business_info.get('name', 'N/A')} - Rating: {business_info.get('rating', 0)} - Reviews: {business_info.get('review_count', 0)}")
+        
+        return business_info
+
+    # Lee de una sola vez todo lo que _leer_ficha_selenium pide por separado.
+    # Mismas reglas: panel = ultimo div[role="main"] con aria-label de negocio,
+    # nombre buscado en todo el documento, el resto solo dentro del panel.
+    JS_FICHA = """
+        const selNombre = arguments[0], selHorarioAria = arguments[1], selHorarioTexto = arguments[2];
+        const txt = e => e ? (e.innerText || '').trim() : '';
+        const aria = e => e ? e.getAttribute('aria-label') : null;
+        let panel = null;
+        for (const m of document.querySelectorAll('div[role="main"]')) {
+            if (!['', 'Resultados', 'Results'].includes(m.getAttribute('aria-label') || '')) panel = m;
+        }
+        const alcance = panel || document;
+        const uno = sel => alcance.querySelector(sel);
+        const todos = sel => Array.from(alcance.querySelectorAll(sel));
+        const categoria = uno('button[jsaction*="category"]');
+        const web = uno('a[data-item-id="authority"]');
+        return {
+            panel: !!panel,
+            nombres: selNombre.map(sel => sel === 'h1'
+                ? Array.from(document.querySelectorAll('h1')).map(txt)
+                : [txt(document.querySelector(sel))]),
+            f7nice: todos('div.F7nice').map(txt),
+            estrellas: todos('span[role="img"][aria-label]').map(aria),
+            arias: todos('[aria-label]').map(aria),
+            direccion: aria(uno('button[data-item-id="address"]')),
+            telefono: aria(uno('button[data-item-id*="phone"]')),
+            web: web ? web.href : null,
+            categoria: categoria ? txt(categoria) : null,
+            horarios_aria: selHorarioAria.map(sel => todos(sel).map(aria)),
+            horarios_texto: selHorarioTexto.map(sel => todos(sel).map(txt)),
+            texto_panel: panel ? panel.innerText : (document.body ? document.body.innerText : ''),
+            mailtos: todos('a[href^="mailto:"]').map(a => a.href)
+        };
+    """
+
+    JS_PANEL_HTML = """
+        let panel = null;
+        for (const m of document.querySelectorAll('div[role="main"]')) {
+            if (!['', 'Resultados', 'Results'].includes(m.getAttribute('aria-label') || '')) panel = m;
+        }
+        return (panel || document.body).outerHTML;
+    """
+
+    def _html_panel(self):
+        try:
+            return self.driver.execute_script(self.JS_PANEL_HTML)
+        except Exception as e:
+            logger.debug(f"No se pudo capturar el HTML del panel: {e}")
+            return None
+
+    def _leer_ficha_js(self):
+        """Campos de la ficha con UN viaje a chromedriver. None si no se pudo."""
+        try:
+            crudos = self.driver.execute_script(
+                self.JS_FICHA, parseo.SELECTORES_NOMBRE,
+                parseo.SELECTORES_HORARIO_ARIA, parseo.SELECTORES_HORARIO_TEXTO)
+        except Exception as e:
+            logger.debug(f"Extraccion por script fallo, se usa Selenium: {e}")
+            return None
+        if not isinstance(crudos, dict):
+            return None
+        if not crudos.get('panel'):
+            logger.warning("Panel de detalle no encontrado, usando el documento completo")
+        return parseo.campos_desde_crudos(crudos)
+
+    # Lo que devuelve Maps en su estado inicial: lo trae toda ficha abierta
+    # por URL, tambien en una pestana, donde el log de red no llega
+    JS_ESTADO_INICIAL = "return JSON.stringify(window.APP_INITIALIZATION_STATE || null);"
+
+    def _ficha_red_de_pagina(self, href):
+        """Campos por red de la ficha abierta en la pestana actual, leidos de
+        su estado inicial. None si la pagina no lo trae."""
+        try:
+            estado = self.driver.execute_script(self.JS_ESTADO_INICIAL)
+        except Exception as e:
+            logger.debug(f"Estado inicial de la ficha ilegible: {e}")
+            return None
+        lugares = red_maps.lugares_de_respuesta(estado)
+        return lugares.get(self.extraer_place_id(href)) or (
+            next(iter(lugares.values())) if len(lugares) == 1 else None)
+
+    def _leer_ficha_red(self, red):
+        """Campos de la respuesta de red; lo que no traiga sale del DOM, con
+        el mismo script del motor 'js'. None si la respuesta no trae ni el
+        nombre (se usa el DOM entero)."""
+        if not red or red.get('name') in (None, '', 'N/A'):
+            return None
+        # El DOM da ademas los emails del panel, que la respuesta no trae
+        dom, emails = self._leer_ficha_js() or ({}, [])
+        campos = {c: red[c] for c in red_maps.CAMPOS}
+        for campo, valor in campos.items():
+            if valor in ('N/A', 0, 0.0) and dom.get(campo) not in (None, 'N/A'):
+                campos[campo] = dom[campo]
+        return campos, emails
+
+    def _leer_ficha_selenium(self):
+        """Campos de la ficha elemento por elemento (un viaje por consulta)."""
+        business_info = {}
+
         # Aislar la ficha abierta: sin esto rating/reviews salen del listado
         panel = self.get_detail_panel()
 
         # Extract name - try multiple selectors
         name_found = False
-        name_selectors = [
-            'h1.DUwDvf',
-            'h1[class*="fontHeadline"]',
-            'h1[class*="fontTitle"]',
-            'div[class*="fontTitle"] span',
-            'h1'
-        ]
-        
-        for selector in name_selectors:
+        for selector in parseo.SELECTORES_NOMBRE:
             try:
                 if selector == 'h1':
                     # For generic h1, get all and filter
                     h1_elements = self.driver.find_elements(By.TAG_NAME, 'h1')
                     for h1 in h1_elements:
-                        if h1.text and h1.text not in ["Resultados", "Results", ""]:
+                        if h1.text and h1.text not in parseo.TITULOS_LISTADO:
                             business_info['name'] = h1.text
                             name_found = True
                             logger.info(f"Found name with h1: {business_info['name']}")
@@ -432,7 +957,6 @@ class GMBScraper:
         
         if not name_found:
             business_info['name'] = 'N/A'
-            logger.warning("Could not find business name")
         
         # Extract rating y review count (ambos viven en div.F7nice de la ficha)
         business_info['rating'] = 0.0  # Default
@@ -440,43 +964,27 @@ class GMBScraper:
         try:
             # Method 1: bloque de rating de la ficha: "4.9" + "(1,599)"
             for block in panel.find_elements(By.CSS_SELECTOR, 'div.F7nice'):
-                texto = (block.text or '').replace('\xa0', ' ')
-
-                m = re.search(r'(\d+[.,]\d+)', texto)
-                if m:
-                    valor = float(m.group(1).replace(',', '.'))
-                    if 0 < valor <= 5:
-                        business_info['rating'] = valor
-
-                m = re.search(r'\(([\d.,\s]+)\)', texto)
-                if m:
-                    digitos = re.sub(r'\D', '', m.group(1))
-                    if digitos:
-                        business_info['review_count'] = int(digitos)
-
+                texto = block.text or ''
+                business_info['rating'] = parseo.rating_de_texto(texto) or business_info['rating']
+                business_info['review_count'] = (parseo.reviews_de_texto(texto)
+                                                 or business_info['review_count'])
                 if business_info['rating'] or business_info['review_count']:
                     break
 
             # Method 2: aria-label de las estrellas y de las opiniones
             if business_info['rating'] == 0.0:
                 for span in panel.find_elements(By.CSS_SELECTOR, 'span[role="img"][aria-label]'):
-                    aria = span.get_attribute('aria-label') or ''
-                    m = re.search(r'([\d.,]+)\s*(?:star|estrella)', aria.lower())
-                    if m:
-                        valor = float(m.group(1).replace(',', '.'))
-                        if 0 < valor <= 5:
-                            business_info['rating'] = valor
-                            break
+                    valor = parseo.rating_de_aria(span.get_attribute('aria-label'))
+                    if valor:
+                        business_info['rating'] = valor
+                        break
 
             if business_info['review_count'] == 0:
                 for elem in panel.find_elements(By.CSS_SELECTOR, '[aria-label]'):
-                    aria = (elem.get_attribute('aria-label') or '').replace('\xa0', ' ')
-                    m = re.search(r'([\d.,]+)\s*(?:opinion|opiniones|reseña|reseñas|review|reviews)', aria.lower())
-                    if m:
-                        digitos = re.sub(r'\D', '', m.group(1))
-                        if digitos:
-                            business_info['review_count'] = int(digitos)
-                            break
+                    digitos = parseo.reviews_de_aria(elem.get_attribute('aria-label'))
+                    if digitos:
+                        business_info['review_count'] = digitos
+                        break
 
         except Exception as e:
             logger.debug(f"Could not extract rating/reviews: {e}")
@@ -484,15 +992,14 @@ class GMBScraper:
         # Extract address
         try:
             address_button = panel.find_element(By.CSS_SELECTOR, 'button[data-item-id="address"]')
-            business_info['address'] = address_button.get_attribute('aria-label').replace('Address: ', '').replace('Dirección: ', '')
+            business_info['address'] = parseo.limpiar_direccion(address_button.get_attribute('aria-label'))
         except:
             business_info['address'] = 'N/A'
 
         # Extract phone
         try:
             phone_button = panel.find_element(By.CSS_SELECTOR, 'button[data-item-id*="phone"]')
-            phone_text = phone_button.get_attribute('aria-label')
-            business_info['phone'] = phone_text.replace('Phone: ', '').replace('Teléfono: ', '')
+            business_info['phone'] = parseo.limpiar_telefono(phone_button.get_attribute('aria-label'))
         except:
             business_info['phone'] = 'N/A'
 
@@ -516,22 +1023,8 @@ class GMBScraper:
         # Extract emails
         emails = self.extract_emails_from_gmb(panel)
 
-        # Si el negocio tiene web, siempre buscar el email ahi (antes se
-        # saltaba el 50% de las veces y se perdian leads en silencio)
-        if business_info['website'] != 'N/A':
-            self.random_delay(1, 2)
-            website_emails = self.extract_emails_from_website(business_info['website'])
-            emails.extend(website_emails)
-        
-        # Remove duplicates and validate emails
-        emails = list(set([email for email in emails if self.validate_email(email)]))
-        business_info['emails'] = emails if emails else []
-        business_info['email'] = emails[0] if emails else 'N/A'
-        
-        # Log what we extracted
-        logger.info(f"Extracted: {business_info.get('name', 'N/A')} - Rating: {business_info.get('rating', 0)} - Reviews: {business_info.get('review_count', 0)}")
-        
-        return business_info
+        return business_info, emails
+
     def recolectar_candidatos(self, max_scrolls=6):
         """Recorre el listado y devuelve [(place_id, href, nombre)] sin repetidos.
 
@@ -541,54 +1034,86 @@ class GMBScraper:
         candidatos = []
         ids_vistos = set()
         objetivo = self.max_results_per_location
+        leidas = 0  # tarjetas del listado ya procesadas: cada pasada lee solo las nuevas
 
         for intento in range(max_scrolls + 1):
-            for tarjeta in self.driver.find_elements(By.CSS_SELECTOR, 'a[href*="/maps/place/"]'):
-                try:
-                    href = tarjeta.get_attribute('href')
-                    place_id = self.extraer_place_id(href)
-                    if not href or place_id in ids_vistos:
-                        continue
-
-                    # Ya extraido (en esta sesion o en una corrida previa via
-                    # --excluir): no cuenta como candidato, si no el listado se
-                    # llenaria de repetidos y la busqueda quedaria corta
-                    if place_id and place_id in self.vistos:
-                        ids_vistos.add(place_id)
-                        continue
+            total, tarjetas = self._leer_listado(leidas)
+            leidas = total
+            for tarjeta in tarjetas:
+                href = tarjeta['href']
+                place_id = self.extraer_place_id(href)
+                if not href or place_id in ids_vistos:
+                    continue
 
-                    if self.es_patrocinado(tarjeta):
-                        logger.info(f"Anuncio descartado: "
-                                    f"{(tarjeta.get_attribute('aria-label') or '')[:40]}")
-                        ids_vistos.add(place_id)
-                        continue
+                # Ya extraido (en esta sesion o en una corrida previa via
+                # --excluir): no cuenta como candidato, si no el listado se
+                # llenaria de repetidos y la busqueda quedaria corta
+                if place_id and place_id in self.vistos:
+                    ids_vistos.add(place_id)
+                    continue
 
-                    nombre = (tarjeta.get_attribute('aria-label') or '').split('·')[0].strip()
+                if self.es_anuncio(tarjeta['texto'], tarjeta['aria']):
+                    logger.info(f"Anuncio descartado: {tarjeta['aria'][:40]}")
                     ids_vistos.add(place_id)
-                    candidatos.append((place_id, href, nombre or 'sin nombre'))
-                except Exception as e:
-                    logger.debug(f"Tarjeta ilegible: {e}")
+                    continue
+
+                nombre = tarjeta['aria'].split('·')[0].strip()
+                ids_vistos.add(place_id)
+                candidatos.append((place_id, href, nombre or 'sin nombre'))
 
             # Pedimos de mas: parte de los candidatos se caera al abrirlos
             if len(candidatos) >= objetivo + 3 or intento == max_scrolls:
                 break
 
-            antes = len(candidatos)
+            antes = total
             try:
-                feed = self.driver.find_element(By.CSS_SELECTOR, 'div[role="feed"]')
-                self.driver.execute_script(
-                    "arguments[0].scrollTop = arguments[0].scrollHeight", feed)
+                inicio = time.monotonic()
+                if not self.driver.execute_script(self.JS_SCROLL_LISTADO):
+                    logger.debug("No hay feed que scrollear")
+                    break
             except Exception:
                 logger.debug("No hay feed que scrollear")
                 break
 
-            self.random_delay(1.5, 3)
-            if len(self.driver.find_elements(By.CSS_SELECTOR, 'a[href*="/maps/place/"]')) <= antes:
+            # Listo en cuanto aparecen tarjetas nuevas; si no aparecen en el
+            # presupuesto del scroll, el listado se termino
+            if not self.ritmo.esperar_listo(
+                    lambda: self.driver.execute_script(self.JS_CONTAR_TARJETAS) > antes,
+                    'scroll', inicio):
                 logger.info("El listado ya no carga mas resultados")
                 break
 
         return candidatos
 
+    def _leer_listado(self, desde):
+        """(total de tarjetas, [{href, aria, texto}] de la numero `desde` en adelante).
+
+        Un solo execute_script; si falla, el camino de siempre, tarjeta por
+        tarjeta (y entonces se releen todas: el id repetido se descarta igual).
+        """
+        try:
+            leido = self.driver.execute_script(self.JS_LISTADO, desde)
+            return leido['total'], leido['nuevas']
+        except Exception as e:
+            logger.debug(f"Listado por script fallo ({e}); se lee tarjeta por tarjeta")
+
+        tarjetas = []
+        elementos = self.driver.find_elements(By.CSS_SELECTOR, 'a[href*="/maps/place/"]')
+        for elemento in elementos:
+            try:
+                contenedor = elemento
+                try:
+                    contenedor = elemento.find_element(
+                        By.XPATH, './ancestor::div[contains(@class,"Nv2PK")][1]')
+                except Exception:
+                    pass
+                tarjetas.append({'href': elemento.get_attribute('href'),
+                                 'aria': elemento.get_attribute('aria-label') or '',
+                                 'texto': contenedor.text or ''})
+            except Exception as e:
+                logger.debug(f"Tarjeta ilegible: {e}")
+        return len(elementos), tarjetas
+
     def extraer_desde_url(self, href, location):
         """Abre la ficha por su URL y extrae los datos.
 
@@ -596,31 +1121,144 @@ class GMBScraper:
         reordene, con lo que unas tarjetas se repiten y otras no se visitan
         nunca. Navegando directo, cada negocio se abre una sola vez.
         """
+        self._ficha_red = None
         try:
+            if not self.ritmo.turno(self.detener):
+                return None  # corte pedido: la ficha queda sin abrir
+            self._vaciar_red()
+            inicio = time.monotonic()
             self.driver.get(href)
-            self.random_delay(2.5, 4)
 
-            abierta = False
-            for h1 in self.driver.find_elements(By.TAG_NAME, 'h1'):
-                if h1.text and h1.text not in ('Resultados', 'Results', ''):
-                    abierta = True
-                    break
-
-            if not abierta:
+            if not self.ritmo.esperar_listo(self._ficha_abierta, 'ficha', inicio):
                 motivo = self.detectar_bloqueo()
                 if motivo:
                     raise BloqueoDetectado(motivo)
                 logger.warning(f"La ficha no cargo: {href[:80]}")
                 return None
 
+            if self.motor_ficha == 'red':
+                lugares = self._lugares_red()
+                # Por el id del href; si no lo trae y llego un solo negocio, es ese
+                self._ficha_red = lugares.get(self.extraer_place_id(href)) or (
+                    next(iter(lugares.values())) if len(lugares) == 1 else None)
+                if self._ficha_red is None:
+                    self._ficha_red = self._ficha_red_de_pagina(href)
+
             return self._extraer_datos_ficha(location)
 
         except BloqueoDetectado:
             raise
         except Exception as e:
+            if not self.driver_responde():
+                raise DriverCaido(f"{type(e).__name__}: {e}") from e
             logger.warning(f"Error abriendo la ficha por URL: {e}")
             return None
 
+    def _listado_cargado(self):
+        """True si ya hay listado (o Maps abrio directo una ficha, o nos redirigio al bloqueo)."""
+        if '/sorry/' in (self.driver.current_url or ''):
+            return True
+        return bool(self.driver.find_elements(
+            By.CSS_SELECTOR, 'div[role="feed"], a[href*="/maps/place/"], h1.DUwDvf'))
+
+    def _ficha_abierta(self):
+        """True si la pestana actual ya muestra una ficha (h1 con el nombre)."""
+        for h1 in self.driver.find_elements(By.TAG_NAME, 'h1'):
+            if h1.text and h1.text not in ('Resultados', 'Results', ''):
+                return True
+        return False
+
+    def extraer_en_pestanas(self, hrefs, location):
+        """Abre varias fichas en pestanas del mismo driver y las extrae al cargar.
+
+        Lo que domina el tiempo por ficha es esperar la carga de cada pagina;
+        abriendo K pestanas de una vez esas esperas se solapan, sin sumar otro
+        proceso ni otra IP. Devuelve una lista alineada con `hrefs`: los datos
+        de cada ficha o None si no cargo.
+        """
+        principal = self.driver.current_window_handle
+        resultados = [None] * len(hrefs)
+        pendientes = {}   # handle -> indice en hrefs
+
+        try:
+            abiertas = {}    # handle -> momento en que se pidio
+            for i, href in enumerate(hrefs):
+                if not self.ritmo.turno(self.detener):
+                    break  # corte pedido: se extraen solo las ya abiertas
+                antes = set(self.driver.window_handles)
+                # Con bloqueo la pestana nace vacia: CDP se aplica por pestana
+                # y tiene que estar activo antes de que empiece la carga
+                destino = 'about:blank' if self.patrones_bloqueo else href
+                self.driver.execute_script("window.open(arguments[0], '_blank');", destino)
+                nuevas = set(self.driver.window_handles) - antes
+                if nuevas:
+                    handle = nuevas.pop()
+                    if self.patrones_bloqueo:
+                        self.driver.switch_to.window(handle)
+                        navegador.bloquear_recursos(self.driver, self.patrones_bloqueo)
+                        # Page.navigate no espera la carga: las pestanas se siguen solapando
+                        self.driver.execute_cdp_cmd('Page.navigate', {'url': href})
+                        self.driver.switch_to.window(principal)
+                    pendientes[handle] = i
+                    abiertas[handle] = time.monotonic()
+                else:
+                    logger.warning(f"No se pudo abrir la pestana: {href[:80]}")
+
+            # Ir pasando por las pestanas y extraer las que ya cargaron
+            limite = time.time() + self.espera_pestanas
+            while pendientes and time.time() < limite:
+                for handle, i in list(pendientes.items()):
+                    self.driver.switch_to.window(handle)
+                    if not self._ficha_abierta():
+                        continue
+                    self.ritmo.observar_carga('ficha', time.monotonic() - abiertas[handle], True)
+                    try:
+                        # El log de red no ve las pestanas: su estado inicial si
+                        if self.motor_ficha == 'red':
+                            self._ficha_red = self._ficha_red_de_pagina(hrefs[i])
+                        resultados[i] = self._extraer_datos_ficha(location)
+                    except Exception as e:
+                        logger.warning(f"Error extrayendo la pestana: {e}")
+                    del pendientes[handle]
+                    self.driver.close()
+                if pendientes:
+                    time.sleep(0.5)
+
+            # Las que nunca cargaron: puede ser lentitud... o un bloqueo
+            motivo = None
+            for handle, i in pendientes.items():
+                self.driver.switch_to.window(handle)
+                self.ritmo.observar_carga('ficha', time.monotonic() - abiertas[handle], False)
+                motivo = motivo or self.detectar_bloqueo()
+                logger.warning(f"La ficha no cargo en pestana: {hrefs[i][:80]}")
+                self.driver.close()
+            pendientes = {}
+            if motivo:
+                raise BloqueoDetectado(motivo)
+
+        except BloqueoDetectado:
+            raise
+        except Exception as e:
+            if not self.driver_responde():
+                raise DriverCaido(f"{type(e).__name__}: {e}") from e
+            # Lo que ya se extrajo sirve; el resto cuenta como no cargado
+            logger.warning(f"Error manejando pestanas: {e}")
+        finally:
+            for handle in pendientes:
+                try:
+                    self.driver.switch_to.window(handle)
+                    self.driver.close()
+                except Exception:
+                    pass
+            try:
+                self.driver.switch_to.window(principal)
+            except Exception as e:
+                if not self.driver_responde():
+                    raise DriverCaido(f"{type(e).__name__}: {e}") from e
+                raise
+
+        return resultados
+
     def extract_business_info(self, element, location):
         try:
             # Try to click with random delay
@@ -703,6 +1341,7 @@ class GMBScraper:
             business_info = self._extraer_datos_ficha(location)
             if business_info is None:
                 return None
+            business_info.pop('_snapshot', None)  # sin place_id no hay donde archivarlo
 
             # Go back to the list
             back_success = False
@@ -762,42 +1401,37 @@ class GMBScraper:
         ("domingo, De 1 p.m. a 12 a.m.; lunes, ..."). Si no esta, cae al
         estado actual visible ("Abierto - Cierra a las 12 a.m.").
         """
-        selectores = [
-            'div.t39EBf[aria-label]',
-            '[aria-label*="Horario de atención"]',
-            '[aria-label*="horario"]',
-            '[aria-label*="Hours"]',
-            '[aria-label*="hours"]',
-        ]
-        for selector in selectores:
+        for selector in parseo.SELECTORES_HORARIO_ARIA:
             try:
                 for elem in panel.find_elements(By.CSS_SELECTOR, selector):
-                    aria = (elem.get_attribute('aria-label') or '').replace('\xa0', ' ').strip()
-                    # Descartar etiquetas de boton sin datos ("Horario de atención")
-                    if len(aria) > 20 and re.search(r'\d', aria):
-                        return re.sub(r',?\s*Copiar el horario de atención\.?', '', aria).strip()
+                    # Descarta etiquetas de boton sin datos ("Horario de atención")
+                    horario = parseo.horario_de_aria(elem.get_attribute('aria-label'))
+                    if horario:
+                        return horario
             except Exception:
                 continue
 
         # Fallback: texto del estado actual
-        for selector in ['div[jsaction*="openhours"]', '.OqCZI', '.t39EBf']:
+        for selector in parseo.SELECTORES_HORARIO_TEXTO:
             try:
                 for elem in panel.find_elements(By.CSS_SELECTOR, selector):
-                    texto = (elem.text or '').replace('\xa0', ' ')
-                    # Quitar glifos de iconos de Material (rango privado unicode)
-                    texto = re.sub('[\\ue000-\\uf8ff]', '', texto)
-                    texto = ' '.join(texto.split())
-                    if texto and re.search(r'\d', texto):
-                        return texto
+                    horario = parseo.horario_de_texto(elem.text)
+                    if horario:
+                        return horario
             except Exception:
                 continue
 
         return 'N/A'
 
+    def asignar_emails(self, business_info, emails):
+        """Deja en la ficha los emails validos, sin repetidos, en `emails` y `email`."""
+        emails = list(set([email for email in emails if self.validate_email(email)]))
+        business_info['emails'] = emails if emails else []
+        business_info['email'] = emails[0] if emails else 'N/A'
+
     def validate_email(self, email):
         """Validate email format"""
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(email_pattern, email.lower()) is not None
+        return parseo.email_valido(email)
     
     def extract_emails_from_gmb(self, panel=None):
         """Extract emails from GMB page (solo de la ficha abierta)"""
@@ -805,9 +1439,7 @@ class GMBScraper:
         scope = panel if panel is not None else self.driver
         try:
             page_text = scope.text if panel is not None else self.driver.find_element(By.TAG_NAME, 'body').text
-            email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
-            found_emails = re.findall(email_pattern, page_text)
-            emails.extend(found_emails)
+            emails.extend(parseo.emails_de_texto(page_text))
 
             # Look for mailto links
             try:
@@ -835,6 +1467,8 @@ class GMBScraper:
                     'wordpress.org', 'sentry.wixpress.com', 'core.com']
     JUNK_LOCALS = ['noreply', 'no-reply', 'donotreply', 'wixpress', 'sentry', 'example',
                    'your-email', 'youremail', 'nombre', 'usuario', 'email']
+    # Las dos listas ya armadas para buscar rapido (ver parseo.FiltroEmails)
+    FILTRO_EMAILS = parseo.FiltroEmails(JUNK_DOMAINS, JUNK_LOCALS)
 
     def _emails_from_html(self, html):
         """Saca emails del texto y de los mailto de un HTML."""
@@ -845,10 +1479,9 @@ class GMBScraper:
         for tag in soup(['script', 'style', 'noscript']):
             tag.decompose()
 
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
-        emails.extend(re.findall(email_pattern, soup.get_text(' ')))
+        emails.extend(parseo.emails_de_texto(soup.get_text(' ')))
 
-        for link in soup.find_all('a', href=re.compile(r'^mailto:', re.I)):
+        for link in soup.find_all('a', href=parseo.RE_MAILTO):
             email = link.get('href')[7:].split('?')[0].strip()
             if email:
                 emails.append(email)
@@ -881,6 +1514,12 @@ class GMBScraper:
 
         return encontrados
 
+    def _get_web(self, url, headers, timeout):
+        """GET a la web de un negocio, pasando por la cache en disco si hay."""
+        if self.cache_web is not None:
+            return self.cache_web.obtener(requests, url, headers=headers, timeout=timeout)
+        return requests.get(url, headers=headers, timeout=timeout, verify=False)
+
     def extract_emails_from_website(self, url, timeout=8, seguir_contacto=True):
         """Extrae emails de la web del negocio y de sus paginas de contacto."""
         emails = []
@@ -888,12 +1527,20 @@ class GMBScraper:
         if not url or url == 'N/A':
             return emails
 
+        # Otra sucursal de la misma cadena ya dio su resultado
+        if self.memo_emails is not None:
+            memo = self.memo_emails.obtener(url)
+            if memo is not None:
+                return memo
+
         headers = {'User-Agent': random.choice(self.user_agents)}
+        visitada = False
 
         try:
-            response = requests.get(url, headers=headers, timeout=timeout, verify=False)
+            response = self._get_web(url, headers, timeout)
 
             if response.status_code == 200:
+                visitada = True
                 encontrados, soup = self._emails_from_html(response.text)
                 emails.extend(encontrados)
 
@@ -901,8 +1548,8 @@ class GMBScraper:
                 if seguir_contacto and not encontrados:
                     for contacto in self._find_contact_urls(soup, response.url):
                         try:
-                            self.random_delay(0.5, 1.5)
-                            r2 = requests.get(contacto, headers=headers, timeout=timeout, verify=False)
+                            self.ritmo.pausa('contacto')
+                            r2 = self._get_web(contacto, headers, timeout)
                             if r2.status_code == 200:
                                 mas, _ = self._emails_from_html(r2.text)
                                 if mas:
@@ -915,27 +1562,15 @@ class GMBScraper:
         except Exception as e:
             logger.debug(f"Error extracting emails from website {url}: {e}")
 
-        # Filtrar ruido: dominios de librerias/plataformas y buzones automaticos
-        filtered_emails = []
-        for email in emails:
-            email = email.strip().strip('.').lower()
-            if '@' not in email:
-                continue
+        filtrados = self.filtrar_emails(emails)
+        # Solo se recuerda lo que se pudo leer: un timeout no es "no tiene email"
+        if visitada and self.memo_emails is not None:
+            self.memo_emails.guardar(url, filtrados)
+        return filtrados
 
-            local, _, dominio = email.partition('@')
-            if '.' not in dominio:
-                continue
-            if any(d in dominio for d in self.JUNK_DOMAINS):
-                continue
-            if any(j in local for j in self.JUNK_LOCALS):
-                continue
-            # Falsos positivos tipo "logo@2x.png" o "imagen@3x.jpg"
-            if re.search(r'\.(png|jpe?g|gif|svg|webp|css|js)$', email):
-                continue
-            if email not in filtered_emails:
-                filtered_emails.append(email)
-
-        return filtered_emails
+    def filtrar_emails(self, emails):
+        """Filtra ruido: dominios de librerias/plataformas y buzones automaticos."""
+        return self.FILTRO_EMAILS.filtrar(emails)
     
     def filter_results(self, businesses, min_rating=0, min_reviews=0, min_age_days=0, max_age_days=36500):
         filtered = []
@@ -968,9 +1603,39 @@ class GMBScraper:
         if self.results:
             pausa_min, pausa_max = self.pausa_entre_busquedas
             logger.info(f"Pausa entre busquedas: {pausa_min}-{pausa_max}s")
-            self.random_delay(pausa_min, pausa_max)
+            self.ritmo.pausa('entre_busquedas', self.pausa_entre_busquedas)
 
-        businesses = self.search_business(query, location)
+        try:
+            businesses = self.search_business(query, location)
+        except DriverCaido as e:
+            # Las fichas que se alcanzaron a sacar salen completas igual
+            e.parciales = self._completar_lote(e.parciales, query, department, province,
+                                               district, filters)
+            raise
+        lote = self._completar_lote(businesses, query, department, province, district, filters)
+        self._guardar_listado(query, location, department, province, district)
+        return lote
+
+    def _guardar_listado(self, query, location, department, province, district):
+        """Agrega a archivo_listado los negocios del listado (leidos por red)
+        que no se abrieron. Va aparte del CSV: trae coordenadas y no trae
+        emails, y no tiene que cambiar las columnas de la salida."""
+        if not self.archivo_listado or not self.listado_red:
+            return
+        ahora = datetime.now().isoformat()
+        registros = [dict(campos, location=location, department=department, province=province,
+                          district=district, search_keyword=query, timestamp=ahora,
+                          fuente='listado')
+                     for place_id, campos in self.listado_red.items()
+                     if place_id not in self.vistos]
+        if registros:
+            # Lo escriben todos los workers
+            with _ESCRITURA_LISTADO:
+                salidas.agregar_jsonl(self.archivo_listado, registros)
+            logger.info(f"{len(registros)} negocios del listado sin abrir guardados en "
+                        f"{self.archivo_listado}")
+
+    def _completar_lote(self, businesses, query, department, province, district, filters):
         # Filter only valid parameters for filter_results
         valid_filters = {k: v for k, v in filters.items() if k in ['min_rating', 'min_reviews', 'min_age_days', 'max_age_days']}
         filtered_businesses = self.filter_results(businesses, **valid_filters)
@@ -1004,13 +1669,18 @@ class GMBScraper:
             logger.info(f"Results saved to {filename}.json")
     
     def save_results_incremental(self, results_batch, filename='gmb_results', format='both', append=True):
-        """Guarda resultados de forma incremental (append o create)"""
+        """Guarda resultados de forma incremental (append o create).
+
+        format: 'csv', 'json', 'both' (csv + json), 'jsonl' o 'csv+jsonl'. El
+        JSON se relee y reescribe entero en cada lote; el JSONL solo agrega
+        (ver salidas.exportar_json para armar el JSON al final).
+        """
         import os
         
         if not results_batch:
             return
             
-        if format in ['csv', 'both']:
+        if format in ['csv', 'both', 'csv+jsonl']:
             csv_file = f'{filename}.csv'
             file_exists = os.path.exists(csv_file) and append
             
@@ -1050,65 +1720,77 @@ class GMBScraper:
                 json.dump(existing_data, f, ensure_ascii=False, indent=2)
             
             logger.info(f"Batch saved to {json_file} ({len(existing_data)} total records)")
+
+        if format in ['jsonl', 'csv+jsonl']:
+            jsonl_file = f'{filename}.jsonl'
+            if not append and os.path.exists(jsonl_file):
+                os.remove(jsonl_file)
+            salidas.agregar_jsonl(jsonl_file, results_batch)
+            logger.info(f"Batch saved to {jsonl_file} ({len(results_batch)} appended)")
     
-    def save_results_by_district(self, format='csv'):
-        """Guarda resultados en archivos separados por distrito"""
-        if not self.results:
+    def save_results_parquet(self, directory='gmb_parquet', results=None):
+        """Agrega los resultados al dataset Parquet particionado por
+        departamento/distrito/rubro (ver salidas.exportar_parquet)."""
+        results = self.results if results is None else results
+        if not results:
+            logger.warning("No results to save")
+            return 0
+        if not salidas.PYARROW_AVAILABLE:
+            logger.error("Parquet export needs pyarrow (pip install pyarrow)")
+            return 0
+        total = salidas.exportar_parquet(results, directory)
+        logger.info(f"Results saved to {directory}/ ({total} records, Parquet)")
+        return total
+
+    def save_results_sqlite(self, path='leads.sqlite', results=None, campaign=None):
+        """Upsert de los resultados en el almacen de leads (ver almacen.py)."""
+        from almacen import AlmacenLeads
+        results = self.results if results is None else results
+        almacen = AlmacenLeads(path)
+        try:
+            nuevos = almacen.guardar(results, campana=campaign)
+        finally:
+            almacen.cerrar()
+        logger.info(f"Results saved to {path} ({nuevos} new businesses)")
+        return nuevos
+
+    def save_results_by_district(self, format='csv', directory='gmb_results', results=None):
+        """Guarda resultados en archivos separados por distrito.
+
+        Solo agrega al CSV de cada distrito los negocios que no tenia; para
+        dejarlos ordenados por keyword y nombre, finalize_results_by_district
+        al terminar (ver salidas.ArchivosDistrito).
+        """
+        results = self.results if results is None else results
+        if not results:
             logger.warning("No results to save")
             return
         
         # Agrupar resultados por distrito
         from collections import defaultdict
-        import os
         
         by_district = defaultdict(list)
-        for result in self.results:
+        for result in results:
             district_key = result.get('district', 'unknown').replace(' ', '_')
             by_district[district_key].append(result)
         
-        # Crear directorio para resultados si no existe
-        os.makedirs('gmb_results', exist_ok=True)
-        
-        # Guardar cada distrito en su archivo
-        for district, businesses in by_district.items():
-            # Ordenar por keyword para agrupar
-            businesses.sort(key=lambda x: x.get('search_keyword', ''))
-            
-            filename = f"gmb_results/gmb_{district}.csv"
-            
-            # Verificar si el archivo existe para append
-            file_exists = os.path.exists(filename)
-            
-            if format in ['csv', 'both']:
-                if PANDAS_AVAILABLE:
-                    df = pd.DataFrame(businesses)
-                    # Si existe, leer el existente y combinar
-                    if file_exists:
-                        existing_df = pd.read_csv(filename, encoding='utf-8-sig')
-                        df = pd.concat([existing_df, df], ignore_index=True)
-                        # Eliminar duplicados basados en nombre y dirección
-                        df = df.drop_duplicates(subset=['name', 'address'], keep='last')
-                    # Ordenar por keyword y luego por nombre
-                    df = df.sort_values(['search_keyword', 'name'])
-                    df.to_csv(filename, index=False, encoding='utf-8-sig')
-                else:
-                    # Sin pandas, append manual
-                    mode = 'a' if file_exists else 'w'
-                    with open(filename, mode, newline='', encoding='utf-8-sig') as f:
-                        keys = businesses[0].keys()
-                        writer = csv.DictWriter(f, fieldnames=keys)
-                        if not file_exists:
-                            writer.writeheader()
-                        writer.writerows(businesses)
-                
-                logger.info(f"Results saved to {filename} ({len(businesses)} businesses)")
+        if format in ['csv', 'both']:
+            archivos = salidas.ArchivosDistrito(directory)
+            try:
+                for district, businesses in by_district.items():
+                    nuevos = archivos.agregar(district, businesses)
+                    logger.info(f"Results saved to {archivos.ruta(district)} "
+                                f"({nuevos} new of {len(businesses)} businesses)")
+            finally:
+                archivos.cerrar()
         
         # Crear resumen
-        summary_file = 'gmb_results/summary.txt'
+        os.makedirs(directory, exist_ok=True)
+        summary_file = os.path.join(directory, 'summary.txt')
         with open(summary_file, 'w', encoding='utf-8') as f:
             f.write(f"GMB Scraping Summary\n")
             f.write(f"="*50 + "\n")
-            f.write(f"Total businesses: {len(self.results)}\n")
+            f.write(f"Total businesses: {len(results)}\n")
             f.write(f"Districts processed: {len(by_district)}\n\n")
             for district, businesses in sorted(by_district.items()):
                 keywords = defaultdict(int)
@@ -1119,7 +1801,19 @@ class GMBScraper:
                     f.write(f"  - {keyword}: {count} results\n")
         
         logger.info(f"Summary saved to {summary_file}")
+
+    def finalize_results_by_district(self, directory='gmb_results'):
+        """Ordena por keyword y nombre los CSV de save_results_by_district."""
+        archivos = salidas.ArchivosDistrito(directory)
+        try:
+            total = archivos.finalizar()
+        finally:
+            archivos.cerrar()
+        logger.info(f"{total} district files sorted in {directory}/")
+        return total
     
     def close(self):
         if self.driver:
+            # Conectado por depuracion remota, quit() cierra la sesion de
+            # chromedriver pero el Chrome persistente sigue abierto
             self.driver.quit()
\ No newline at end of file
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Arranque del navegador: chromedriver sin red y Chrome persistente.
+
+Cada `init_driver` llamaba a `ChromeDriverManager().install()`, que consulta
+la ultima version por red y revisa el disco, y abria Chrome con un perfil
+vacio: cache fria y muro de consentimiento en cada corrida. Aca:
+
+  resolver_chromedriver  ruta fija (--chromedriver / CHROMEDRIVER), la que
+                         quedo anotada de una corrida anterior, la del PATH y,
+                         solo si no hay ninguna, la descarga de webdriver-manager
+  arrancar_chrome        Chrome suelto con --remote-debugging-port y un perfil
+                         propio; sobrevive al proceso de Python, asi que la
+                         corrida siguiente se conecta al mismo navegador ya
+                         caliente en vez de abrir otro
+  procesos_navegador     los procesos de Chrome de un driver (chromedriver, el
+                         navegador y sus renderers), para medir su memoria
+                         (memoria_procesos) o matar los que quedaron colgados
+                         reteniendo el perfil
+  bloquear_recursos      modo ligero: la ficha se lee del DOM, asi que las
+                         teselas del mapa, fotos, street view, fuentes, media y
+                         trackers son bytes y tiempo de carga tirados
+"""
+import logging
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import threading
+import time
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Donde queda anotada la ruta del chromedriver ya bajado
+RUTA_CACHE_DRIVER = os.environ.get(
+    'GMB_CACHE_CHROMEDRIVER',
+    os.path.join(os.path.expanduser('~'), '.gmb_scraper', 'chromedriver.txt'))
+
+# Nombres del ejecutable de Chrome, en orden de preferencia
+BINARIOS_CHROME = ['google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome']
+RUTAS_CHROME = [
+    r'C:\Program Files\Google\Chrome\Application\chrome.exe',
+    r'C:\Program Files (x86)\Google\Chrome\Application\chrome.exe',
+    '/Applications/Google Chrome.app/Contents/MacOS/Google Chrome',
+]
+
+# Modo ligero: patrones de Network.setBlockedURLs (* = cualquier cosa)
+BLOQUEO_LIGERO = [
+    # Teselas del mapa y street view
+    '*/maps/vt*', '*/kh/v=*', '*khms*.googleapis.com*', '*streetviewpixels-pa.googleapis.com*',
+    '*/cbk?*', '*geo*.ggpht.com*',
+    # Fotos e imagenes
+    '*googleusercontent.com/p/*', '*.jpg*', '*.jpeg*', '*.png*', '*.gif*', '*.webp*', '*.ico*',
+    # Fuentes y media
+    '*fonts.gstatic.com*', '*.woff2*', '*.woff*', '*.ttf*', '*.mp4*', '*.webm*', '*.mp3*',
+    # Trackers y telemetria
+    '*google-analytics.com*', '*googletagmanager.com*', '*/gtag/js*', '*/analytics.js*',
+    '*doubleclick.net*', '*googlesyndication.com*', '*/gen_204*', '*/log?format=*',
+    '*facebook.net*', '*hotjar.com*',
+]
+
+# Lo que tiene que cargar para que el listado y la ficha se armen. Un patron
+# de bloqueo que toque alguna de estas URLs se descarta (con aviso) en vez de
+# dejar al scraper frente a un panel vacio.
+PERMITIDOS = [
+    'https://www.google.com/maps/search/estudio+contable+en+San+Isidro',
+    'https://www.google.com/maps/place/Estudio/@-12.09,-77.03,17z/data=!4m7!3m6!1s0x9105c8:0x1!8m2',
+    'https://www.google.com/maps/preview/place?authuser=0&hl=es&gl=pe&pb=!1m12!1s0x9105c8',
+    'https://www.google.com/search?tbm=map&authuser=0&hl=es&gl=pe&q=estudio+contable',
+    'https://www.google.com/maps/_/js/k=maps.m.es.abc/m=sc2,per,mo,lp,ti,ds,stx/am=x/rt=j/d=1',
+    'https://www.google.com/maps/_/ss/k=maps.m.abc.L.X.O/am=x/d=1/rs=x',
+    'https://www.google.com/maps/rpc/listugcposts?authuser=0&hl=es',
+    'https://consent.google.com/ml?continue=https://www.google.com/maps&gl=PE&hl=es',
+    'https://www.google.com/sorry/index?continue=https://www.google.com/maps',
+]
+
+# Preferencias de Chrome del modo ligero: sin imagenes ni notificaciones
+PREFERENCIAS_LIGERO = {
+    'profile.managed_default_content_settings.images': 2,
+    'profile.default_content_setting_values.notifications': 2,
+}
+
+# ChromeDriverManager descarga/escribe en la misma carpeta: con varios workers
+# arrancando a la vez se pisaban el binario a medio bajar.
+_INSTALACION_DRIVER = threading.Lock()
+_ruta_driver = None
+
+
+def _leer_cache_driver():
+    try:
+        with open(RUTA_CACHE_DRIVER, encoding='utf-8') as f:
+            ruta = f.read().strip()
+    except OSError:
+        return None
+    return ruta if ruta and os.path.isfile(ruta) else None
+
+
+def _anotar_cache_driver(ruta):
+    try:
+        os.makedirs(os.path.dirname(RUTA_CACHE_DRIVER), exist_ok=True)
+        with open(RUTA_CACHE_DRIVER, 'w', encoding='utf-8') as f:
+            f.write(ruta)
+    except OSError as e:
+        logger.warning(f"No se pudo anotar la ruta del chromedriver ({e})")
+
+
+def resolver_chromedriver(fija=None):
+    """Ruta del chromedriver, sin tocar la red salvo que no haya ninguno.
+
+    Devuelve (ruta, origen) con origen en 'fija', 'cache', 'path' o 'descarga'.
+    """
+    global _ruta_driver
+    fija = fija or os.environ.get('CHROMEDRIVER')
+    if fija:
+        if not os.path.isfile(fija):
+            raise FileNotFoundError(f"No existe el chromedriver {fija}")
+        return fija, 'fija'
+
+    with _INSTALACION_DRIVER:
+        if _ruta_driver and os.path.isfile(_ruta_driver):
+            return _ruta_driver, 'cache'
+        ruta = _leer_cache_driver()
+        if ruta:
+            _ruta_driver = ruta
+            return ruta, 'cache'
+        ruta = shutil.which('chromedriver')
+        if ruta:
+            _ruta_driver = ruta
+            return ruta, 'path'
+
+        from webdriver_manager.chrome import ChromeDriverManager
+        ruta = ChromeDriverManager().install()
+        _anotar_cache_driver(ruta)
+        _ruta_driver = ruta
+        return ruta, 'descarga'
+
+
+def olvidar_chromedriver():
+    """Descarta la ruta anotada: Chrome se actualizo y ese driver ya no le sirve."""
+    global _ruta_driver
+    with _INSTALACION_DRIVER:
+        _ruta_driver = None
+        try:
+            os.remove(RUTA_CACHE_DRIVER)
+        except OSError:
+            pass
+
+
+def buscar_chrome():
+    """Ejecutable de Chrome (CHROME o el primero que aparezca), o None."""
+    if os.environ.get('CHROME'):
+        return os.environ['CHROME']
+    for nombre in BINARIOS_CHROME:
+        ruta = shutil.which(nombre)
+        if ruta:
+            return ruta
+    return next((r for r in RUTAS_CHROME if os.path.isfile(r)), None)
+
+
+def puerto_abierto(puerto, host='127.0.0.1', timeout=0.5):
+    try:
+        with socket.create_connection((host, puerto), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def arrancar_chrome(puerto, perfil, argumentos=(), espera=20):
+    """Lanza Chrome con depuracion remota en `puerto` y lo deja corriendo.
+
+    Va en su propia sesion de proceso: ni el Ctrl+C de la corrida ni su salida
+    lo cierran. Devuelve cuando el puerto ya acepta conexiones.
+    """
+    binario = buscar_chrome()
+    if not binario:
+        raise FileNotFoundError('No se encontro Chrome; indicar la ruta con la variable CHROME')
+    os.makedirs(perfil, exist_ok=True)
+    comando = [binario, f'--remote-debugging-port={puerto}',
+               f'--user-data-dir={os.path.abspath(perfil)}',
+               '--no-first-run', '--no-default-browser-check',
+               # chromedriver lo pone solo; sin esto window.open (pestanas) no abre
+               '--disable-popup-blocking', *argumentos, 'about:blank']
+    opciones = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP} if os.name == 'nt' \
+        else {'start_new_session': True}
+    subprocess.Popen(comando, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                     stderr=subprocess.DEVNULL, **opciones)
+
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        if puerto_abierto(puerto):
+            return
+        time.sleep(0.2)
+    raise TimeoutError(f"Chrome no abrio el puerto de depuracion {puerto} en {espera}s")
+
+
+def _argumentos(crudos):
+    """Argumentos de una linea de comando ya separada. Chrome reescribe la de
+    algunos de sus procesos como un solo texto con espacios: se parte ahi."""
+    argumentos = tuple(a for a in crudos if a)
+    if len(argumentos) == 1:
+        argumentos = tuple(argumentos[0].split())
+    return argumentos
+
+
+def _tabla_procesos():
+    """{pid: (ppid, argumentos de la linea de comando)} de todo el sistema.
+
+    Con psutil en cualquier sistema; sin psutil, leyendo /proc (Linux). Si no
+    hay ninguno de los dos, vacia: no se mide ni se limpia nada.
+    """
+    tabla = {}
+    if PSUTIL_AVAILABLE:
+        for p in psutil.process_iter(['pid', 'ppid', 'cmdline']):
+            tabla[p.info['pid']] = (p.info['ppid'], _argumentos(p.info['cmdline'] or []))
+        return tabla
+    if not os.path.isdir('/proc'):
+        return tabla
+    for nombre in os.listdir('/proc'):
+        if not nombre.isdigit():
+            continue
+        try:
+            with open(f'/proc/{nombre}/stat', encoding='utf-8', errors='replace') as f:
+                # "pid (comm) estado ppid ...": comm puede tener espacios
+                ppid = int(f.read().rpartition(')')[2].split()[1])
+            with open(f'/proc/{nombre}/cmdline', 'rb') as f:
+                crudos = f.read().decode('utf-8', 'replace').split('\0')
+        except (OSError, ValueError, IndexError):
+            continue
+        tabla[int(nombre)] = (ppid, _argumentos(crudos))
+    return tabla
+
+
+def procesos_navegador(pid_driver=None, marcas=()):
+    """Pids del chromedriver `pid_driver`, de los Chrome que tienen alguna de
+    `marcas` (el user-data-dir, el puerto de depuracion) como argumento y de
+    todos sus descendientes (renderers, GPU, utilidades).
+
+    Las marcas se comparan contra argumentos enteros: worker1 no es worker10
+    ni el puerto 922 es el 9220.
+    """
+    tabla = _tabla_procesos()
+    marcas = {m for m in marcas if m}
+    raices = {pid for pid, (_, argumentos) in tabla.items()
+              if pid == pid_driver or not marcas.isdisjoint(argumentos)}
+    hijos = {}
+    for pid, (ppid, _) in tabla.items():
+        hijos.setdefault(ppid, []).append(pid)
+    pids, pendientes = set(), list(raices)
+    while pendientes:
+        pid = pendientes.pop()
+        if pid not in pids:
+            pids.add(pid)
+            pendientes.extend(hijos.get(pid, []))
+    pids.discard(os.getpid())
+    return pids
+
+
+def memoria_procesos(pids):
+    """RSS sumado de `pids`, en bytes. Cuenta dos veces lo compartido entre
+    procesos de Chrome: sirve para ver la tendencia y dimensionar, no como
+    consumo exacto."""
+    total = 0
+    pagina = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+    for pid in pids:
+        try:
+            if PSUTIL_AVAILABLE:
+                total += psutil.Process(pid).memory_info().rss
+            else:
+                with open(f'/proc/{pid}/statm', encoding='utf-8') as f:
+                    total += int(f.read().split()[1]) * pagina
+        except Exception:
+            continue  # termino entre la lista y la lectura
+    return total
+
+
+def puede_medir():
+    return PSUTIL_AVAILABLE or os.path.isdir('/proc')
+
+
+def _identidad(pid):
+    """(inicio, linea de comando) del proceso, o None si ya no existe.
+
+    El pid solo no alcanza: el sistema lo reusa apenas termina el proceso.
+    """
+    try:
+        if PSUTIL_AVAILABLE:
+            p = psutil.Process(pid)
+            return p.create_time(), ' '.join(p.cmdline())
+        with open(f'/proc/{pid}/stat', encoding='utf-8', errors='replace') as f:
+            # starttime es el campo 22; tras "(comm)" el primero es el 3
+            inicio = int(f.read().rpartition(')')[2].split()[19])
+        with open(f'/proc/{pid}/cmdline', 'rb') as f:
+            comando = f.read().replace(b'\0', b' ').decode('utf-8', 'replace').strip()
+        return inicio, comando
+    except Exception:
+        return None
+
+
+def identificar_procesos(pids):
+    """{pid: identidad} de los que siguen vivos, para matar_procesos."""
+    procesos = {}
+    for pid in pids:
+        identidad = _identidad(pid)
+        if identidad is not None:
+            procesos[pid] = identidad
+    return procesos
+
+
+def matar_procesos(procesos):
+    """Mata los de `procesos` ({pid: identidad}) que sigan vivos; devuelve cuantos.
+
+    Entre que se anotan y se matan pasa el cierre del driver: un pid que ya no
+    tiene el mismo inicio y linea de comando, o que no es de Chrome ni de
+    chromedriver, es otro proceso que heredo el numero y no se toca.
+    """
+    muertos = 0
+    for pid, identidad in procesos.items():
+        actual = _identidad(pid)
+        if actual is None or actual != identidad or 'chrom' not in actual[1].lower():
+            continue
+        try:
+            os.kill(pid, getattr(signal, 'SIGKILL', signal.SIGTERM))
+            muertos += 1
+        except (OSError, ProcessLookupError):
+            pass
+    return muertos
+
+
+def _patron_regex(patron):
+    return re.compile('.*'.join(map(re.escape, patron.split('*'))), re.I)
+
+
+def patrones_bloqueo(extra=()):
+    """BLOQUEO_LIGERO mas `extra`, sin los que tocarian una URL de PERMITIDOS."""
+    patrones = []
+    for patron in [*BLOQUEO_LIGERO, *extra]:
+        regex = _patron_regex(patron)
+        choca = next((url for url in PERMITIDOS if regex.fullmatch(url)), None)
+        if choca:
+            logger.warning(f"Patron de bloqueo {patron!r} descartado: bloquearia {choca}")
+        elif patron not in patrones:
+            patrones.append(patron)
+    return patrones
+
+
+def bloquear_recursos(driver, patrones):
+    """Aplica el bloqueo a la pestana actual (CDP va por pestana, no por navegador)."""
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': list(patrones)})
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""Parseo de los campos de una ficha de Maps a partir de texto ya leido.
+
+No toca el navegador: recibe los textos y aria-labels crudos de la ficha y
+devuelve los campos del esquema del scraper. Lo usan el camino Selenium de
+GMBScraper (elemento por elemento), el camino de un solo `execute_script` y
+cualquier parser que trabaje sobre HTML guardado, asi los tres dan lo mismo.
+
+Las expresiones regulares se compilan una sola vez, aca arriba: al reparsear
+archivos de cientos de miles de paginas, buscarlas en la cache de `re` en cada
+llamada ya se nota. Medir con benchmarks/bench_parseo.py.
+"""
+import re
+
+# Textos de h1 que son del listado, no de un negocio
+TITULOS_LISTADO = ('Resultados', 'Results', '')
+
+# Selectores del nombre, en orden de preferencia; 'h1' es "cualquier h1 que
+# no sea el del listado"
+SELECTORES_NOMBRE = [
+    'h1.DUwDvf',
+    'h1[class*="fontHeadline"]',
+    'h1[class*="fontTitle"]',
+    'div[class*="fontTitle"] span',
+    'h1',
+]
+
+# Bloque de horarios: primero el aria-label con la semana completa, despues
+# el texto del estado actual ("Abierto - Cierra a las 12 a.m.")
+SELECTORES_HORARIO_ARIA = [
+    'div.t39EBf[aria-label]',
+    '[aria-label*="Horario de atención"]',
+    '[aria-label*="horario"]',
+    '[aria-label*="Hours"]',
+    '[aria-label*="hours"]',
+]
+SELECTORES_HORARIO_TEXTO = ['div[jsaction*="openhours"]', '.OqCZI', '.t39EBf']
+
+PATRON_EMAIL = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
+PATRON_EMAIL_VALIDO = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
+
+RE_EMAIL = re.compile(PATRON_EMAIL)
+RE_EMAIL_VALIDO = re.compile(PATRON_EMAIL_VALIDO)
+RE_MAILTO = re.compile(r'^mailto:', re.I)
+# "logo@2x.png" o "imagen@3x.jpg" parecen emails y no lo son
+RE_EMAIL_ARCHIVO = re.compile(r'\.(png|jpe?g|gif|svg|webp|css|js)$')
+
+RE_RATING = re.compile(r'(\d+[.,]\d+)')
+RE_REVIEWS = re.compile(r'\(([\d.,\s]+)\)')
+RE_RATING_ARIA = re.compile(r'([\d.,]+)\s*(?:star|estrella)')
+RE_REVIEWS_ARIA = re.compile(r'([\d.,]+)\s*(?:opinion|opiniones|reseña|reseñas|review|reviews)')
+RE_COPIAR_HORARIO = re.compile(r',?\s*Copiar el horario de atención\.?')
+# Glifos de iconos de Material (rango privado unicode)
+RE_GLIFOS = re.compile('[\\ue000-\\uf8ff]')
+RE_DIGITO = re.compile(r'\d')
+RE_NO_DIGITO = re.compile(r'\D')
+
+RE_PLACE_ID = re.compile(r'!1s([^!]+)')
+RE_PLACE_NOMBRE = re.compile(r'/maps/place/([^/@]+)')
+
+
+def rating_de_texto(texto):
+    """"4.9 (1,599)" -> 4.9, o 0.0 si no hay un rating valido."""
+    m = RE_RATING.search((texto or '').replace('\xa0', ' '))
+    if m:
+        valor = float(m.group(1).replace(',', '.'))
+        if 0 < valor <= 5:
+            return valor
+    return 0.0
+
+
+def reviews_de_texto(texto):
+    """"4.9 (1,599)" -> 1599, o 0."""
+    m = RE_REVIEWS.search((texto or '').replace('\xa0', ' '))
+    if m:
+        digitos = RE_NO_DIGITO.sub('', m.group(1))
+        if digitos:
+            return int(digitos)
+    return 0
+
+
+def rating_de_aria(aria):
+    """"4,9 estrellas" / "4.9 stars" -> 4.9, o 0.0."""
+    m = RE_RATING_ARIA.search((aria or '').lower())
+    if m:
+        try:
+            valor = float(m.group(1).replace(',', '.'))
+        except ValueError:
+            return 0.0
+        if 0 < valor <= 5:
+            return valor
+    return 0.0
+
+
+def reviews_de_aria(aria):
+    """"1.599 opiniones" / "1,599 reviews" -> 1599, o 0."""
+    aria = (aria or '').replace('\xa0', ' ')
+    m = RE_REVIEWS_ARIA.search(aria.lower())
+    if m:
+        digitos = RE_NO_DIGITO.sub('', m.group(1))
+        if digitos:
+            return int(digitos)
+    return 0
+
+
+def horario_de_aria(aria):
+    """aria-label del bloque de horarios -> semana completa, o None si es solo
+    la etiqueta del boton sin datos ("Horario de atención")."""
+    aria = (aria or '').replace('\xa0', ' ').strip()
+    if len(aria) > 20 and RE_DIGITO.search(aria):
+        return RE_COPIAR_HORARIO.sub('', aria).strip()
+    return None
+
+
+def horario_de_texto(texto):
+    """Texto visible del estado actual, sin glifos de iconos, o None."""
+    texto = (texto or '').replace('\xa0', ' ')
+    texto = RE_GLIFOS.sub('', texto)
+    texto = ' '.join(texto.split())
+    if texto and RE_DIGITO.search(texto):
+        return texto
+    return None
+
+
+def limpiar_direccion(aria):
+    return aria.replace('Address: ', '').replace('Dirección: ', '')
+
+
+def limpiar_telefono(aria):
+    return aria.replace('Phone: ', '').replace('Teléfono: ', '')
+
+
+def emails_de_texto(texto):
+    return RE_EMAIL.findall(texto or '')
+
+
+def email_valido(email):
+    # El patron ya acepta mayusculas: no hace falta pasarlo a minusculas
+    return RE_EMAIL_VALIDO.match(email) is not None
+
+
+def place_id_de_href(href):
+    """Token tras !1s del href de una ficha; si no hay, el nombre de la URL."""
+    if not href:
+        return ''
+    m = RE_PLACE_ID.search(href)
+    if m:
+        return m.group(1)
+    m = RE_PLACE_NOMBRE.search(href)
+    return m.group(1) if m else ''
+
+
+class FiltroEmails:
+    """Descarta los emails que nunca son un lead: dominios de plataformas y
+    librerias, buzones automaticos y nombres de archivo con arroba.
+
+    Los dominios van en un set y se busca cada sufijo del dominio del email
+    (mail.sentry.io -> mail.sentry.io, sentry.io, io): tantas consultas como
+    etiquetas, sin recorrer la lista. Antes se buscaba cada dominio como
+    subcadena y caian dominios reales (latest.com contiene test.com). Las
+    palabras de la parte local se buscan todas juntas, con una sola regex.
+    """
+
+    def __init__(self, dominios, locales):
+        self.dominios = frozenset(d.lower() for d in dominios)
+        self.re_locales = (re.compile('|'.join(re.escape(l.lower()) for l in locales))
+                           if locales else None)
+
+    def _sufijo_basura(self, dominio):
+        i = 0
+        while True:
+            if dominio[i:] in self.dominios:
+                return True
+            i = dominio.find('.', i) + 1
+            if not i:
+                return False
+
+    def dominio_basura(self, dominio):
+        if self._sufijo_basura(dominio):
+            return True
+        # example.com.pe: el mismo dominio con la terminacion de un pais
+        base, _, pais = dominio.rpartition('.')
+        return len(pais) == 2 and '.' in base and self._sufijo_basura(base)
+
+    def filtrar(self, emails):
+        """Emails limpios, en minusculas, sin repetidos y en el orden original."""
+        filtrados, vistos = [], set()
+        for email in emails:
+            email = email.strip().strip('.').lower()
+            local, arroba, dominio = email.partition('@')
+            if not arroba or '.' not in dominio or email in vistos:
+                continue
+            if self.dominio_basura(dominio):
+                continue
+            if self.re_locales is not None and self.re_locales.search(local):
+                continue
+            if RE_EMAIL_ARCHIVO.search(email):
+                continue
+            vistos.add(email)
+            filtrados.append(email)
+        return filtrados
+
+
+def campos_desde_crudos(crudos):
+    """Convierte los textos crudos de una ficha en los campos del scraper.
+
+    `crudos` trae, con las mismas reglas que el camino Selenium:
+      nombres:        [[textos]] por cada selector de SELECTORES_NOMBRE
+      f7nice:         textos de div.F7nice del panel
+      estrellas:      aria-labels de span[role="img"][aria-label] del panel
+      arias:          aria-labels de todo [aria-label] del panel
+      direccion, telefono: aria-label del boton correspondiente (o None)
+      web:            href de a[data-item-id="authority"] (o None)
+      categoria:      texto del boton de categoria (o None)
+      horarios_aria:  [[aria-labels]] por cada selector de SELECTORES_HORARIO_ARIA
+      horarios_texto: [[textos]] por cada selector de SELECTORES_HORARIO_TEXTO
+      texto_panel:    texto visible del panel
+      mailtos:        hrefs de a[href^="mailto:"] del panel
+
+    Devuelve (campos, emails_de_la_ficha).
+    """
+    campos = {}
+
+    campos['name'] = 'N/A'
+    for selector, textos in zip(SELECTORES_NOMBRE, crudos.get('nombres') or []):
+        textos = [t for t in textos or [] if t]
+        if selector == 'h1':
+            textos = [t for t in textos if t not in TITULOS_LISTADO]
+        elif textos:
+            textos = textos[:1]  # find_element: solo el primero cuenta
+        if textos:
+            campos['name'] = textos[0]
+            break
+
+    # Rating y reviews: primero el bloque F7nice, despues los aria-label
+    rating, reviews = 0.0, 0
+    for texto in crudos.get('f7nice') or []:
+        rating = rating_de_texto(texto) or rating
+        reviews = reviews_de_texto(texto) or reviews
+        if rating or reviews:
+            break
+    if rating == 0.0:
+        for aria in crudos.get('estrellas') or []:
+            rating = rating_de_aria(aria)
+            if rating:
+                break
+    if reviews == 0:
+        for aria in crudos.get('arias') or []:
+            reviews = reviews_de_aria(aria)
+            if reviews:
+                break
+    campos['rating'] = rating
+    campos['review_count'] = reviews
+
+    campos['address'] = limpiar_direccion(crudos['direccion']) if crudos.get('direccion') else 'N/A'
+    campos['phone'] = limpiar_telefono(crudos['telefono']) if crudos.get('telefono') else 'N/A'
+    campos['website'] = crudos.get('web') or 'N/A'
+    campos['category'] = crudos.get('categoria') if crudos.get('categoria') is not None else 'N/A'
+
+    campos['hours'] = 'N/A'
+    for arias in crudos.get('horarios_aria') or []:
+        horario = next((h for h in map(horario_de_aria, arias or []) if h), None)
+        if horario:
+            campos['hours'] = horario
+            break
+    else:
+        for textos in crudos.get('horarios_texto') or []:
+            horario = next((h for h in map(horario_de_texto, textos or []) if h), None)
+            if horario:
+                campos['hours'] = horario
+                break
+
+    emails = emails_de_texto(crudos.get('texto_panel'))
+    for href in crudos.get('mailtos') or []:
+        email = (href or '').replace('mailto:', '')
+        if email:
+            emails.append(email)
+
+    return campos, emails
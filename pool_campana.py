@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""Pool de navegadores para correr_campana.py: N Chrome en paralelo.
+
+Cada worker tiene su propio GMBScraper (su perfil, su driver, su ritmo) y va
+sacando combinaciones rubro x distrito de una cola comun. Ninguno escribe a
+disco: entregan el lote a un unico escritor, que es el que toca los archivos
+de salida, el historial y el progreso. Asi no hay dos hilos escribiendo el
+mismo CSV ni marcando el mismo progreso a la vez.
+
+Un bloqueo en cualquier worker corta a TODOS: comparten IP, y si Google corto
+a uno, los demas solo van a juntar ceros.
+
+Un navegador caido o colgado, en cambio, es problema de ese worker: se
+relanza con el mismo perfil, lo ya extraido se guarda como 'caida' (nunca
+'ok') y la combinacion vuelve a la cola.
+"""
+import logging
+import queue
+import random
+import threading
+
+from gmb_scraper_lite import BloqueoDetectado, DriverCaido
+
+logger = logging.getLogger('campana')
+
+
+class CupoCompartido:
+    """Tope de fichas de la sesion, repartido entre todos los workers.
+
+    Cada worker reserva un lugar antes de abrir una ficha y lo devuelve si la
+    ficha no sirvio; asi el tope es duro aunque haya varios abriendo a la vez.
+    """
+
+    def __init__(self, tope=None):
+        self.tope = tope
+        self.usadas = 0
+        self._lock = threading.Lock()
+
+    def reservar(self):
+        with self._lock:
+            if self.tope is not None and self.usadas >= self.tope:
+                return False
+            self.usadas += 1
+            return True
+
+    def liberar(self):
+        with self._lock:
+            self.usadas = max(0, self.usadas - 1)
+
+    @property
+    def agotado(self):
+        return self.tope is not None and self.usadas >= self.tope
+
+
+class EscritorLotes:
+    """Hilo unico que guarda lo que entregan los workers, en orden de llegada.
+
+    `guardar(rubro, distrito, lote, estado)` es la funcion que de verdad
+    escribe; aqui solo se garantiza que nunca corran dos a la vez.
+    """
+
+    def __init__(self, guardar):
+        self.guardar = guardar
+        self.cola = queue.Queue()
+        self.error = None
+        self._hilo = threading.Thread(target=self._bucle, name='escritor', daemon=True)
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def entregar(self, rubro, distrito, lote, estado):
+        self.cola.put((rubro, distrito, lote, estado))
+
+    def _bucle(self):
+        while True:
+            item = self.cola.get()
+            if item is None:
+                return
+            try:
+                self.guardar(*item)
+            except Exception as e:
+                # Si no se puede guardar, seguir scrapeando es tirar fichas
+                logger.error(f"Error guardando el lote {item[0]} / {item[1]}: {e}")
+                self.error = e
+
+    def cerrar(self):
+        """Espera a que se guarde todo lo entregado."""
+        self.cola.put(None)
+        self._hilo.join()
+
+
+class PoolCampana:
+    """Reparte `pendientes` entre `workers` navegadores.
+
+    `crear_scraper(n)` devuelve el GMBScraper del worker n ya configurado
+    (tope, vistos y cupo compartidos); el pool solo lo arranca, lo usa y lo
+    cierra. Una combinacion cortada por la caida del navegador se reintenta
+    hasta `reintentos_caida` veces en la misma corrida.
+    """
+
+    def __init__(self, pendientes, crear_scraper, escritor, cupo,
+                 departamento, provincia, por_busqueda, workers=1, reintentos_caida=2):
+        self.pendientes = list(pendientes)
+        self.crear_scraper = crear_scraper
+        self.escritor = escritor
+        self.cupo = cupo
+        self.departamento = departamento
+        self.provincia = provincia
+        self.por_busqueda = por_busqueda
+        self.workers = max(1, min(workers, len(self.pendientes) or 1))
+
+        self.cola = queue.Queue()
+        for i, combinacion in enumerate(self.pendientes, 1):
+            self.cola.put((i, combinacion))
+
+        self.detener = threading.Event()
+        self.bloqueo = None          # motivo del primer bloqueo, si lo hubo
+        self.tope_alcanzado = False
+        self.reintentos_caida = reintentos_caida
+        self.caidas = {}             # combinacion -> veces que se le cayo el navegador
+        self.vivos = set()           # numeros de los workers que siguen corriendo
+        self.arrancados = 0          # workers que llegaron a abrir su navegador
+        self._lock = threading.Lock()
+
+    def _pedir_corte(self, motivo):
+        with self._lock:
+            if self.bloqueo is None:
+                self.bloqueo = motivo
+        self.detener.set()
+
+    def _worker(self, n):
+        with self._lock:
+            self.vivos.add(n)
+        s = self.crear_scraper(n)
+        s.detener = self.detener
+        etiqueta = f"[w{n}] " if self.workers > 1 else ''
+        try:
+            # Escalonar los arranques: N busquedas en el mismo segundo desde
+            # la misma IP es justo el patron que no queremos mostrar
+            if n > 1:
+                espera = random.uniform(0, max(s.pausa_entre_busquedas))
+                if self.detener.wait(espera):
+                    return
+            s.init_driver()
+            with self._lock:
+                self.arrancados += 1
+
+            while not self.detener.is_set():
+                if self.escritor.error is not None:
+                    self.detener.set()
+                    break
+
+                # Con el ritmo frenado por senales de riesgo trabajan menos
+                # navegadores: los de numero mas alto esperan su turno. Con la
+                # cola vacia no hay turno que esperar (y el nivel ya no va a
+                # bajar: nadie observa nada mas), asi que se termina; si los
+                # que tenian turno ya terminaron, se trabaja igual.
+                limite = s.ritmo.concurrencia(self.workers)
+                with self._lock:
+                    vivos = tuple(self.vivos)
+                if n > limite and any(m <= limite for m in vivos):
+                    if self.cola.empty():
+                        break
+                    self.detener.wait(5)
+                    continue
+                try:
+                    i, (rubro, distrito) = self.cola.get_nowait()
+                except queue.Empty:
+                    break
+
+                if self.cupo.agotado:
+                    with self._lock:
+                        self.tope_alcanzado = True
+                    break
+
+                print(f"{etiqueta}[{i}/{len(self.pendientes)}] {rubro} en {distrito} "
+                      f"(acumulado: {self.cupo.usadas}/{self.cupo.tope} · ritmo {s.ritmo.estado()})")
+
+                # Chequeo de salud antes de gastar una busqueda en un driver muerto
+                if not s.driver_responde():
+                    logger.warning(f"{etiqueta}El navegador no responde, se relanza")
+                    s.reiniciar_driver()
+
+                try:
+                    lote = s.search_location(rubro, self.departamento, self.provincia, distrito,
+                                             max_results=self.por_busqueda)
+                except DriverCaido as e:
+                    self._caida(s, etiqueta, i, rubro, distrito, e)
+                    continue
+
+                # Cortada por el tope, por otro worker o por un error a mitad
+                # de la busqueda: queda 'parcial' para reintentarla completa
+                # en la proxima corrida.
+                cortada = (s.busqueda_incompleta
+                           or ((self.cupo.agotado or self.detener.is_set())
+                               and len(lote) < self.por_busqueda))
+                self.escritor.entregar(rubro, distrito, lote, 'parcial' if cortada else 'ok')
+
+        except BloqueoDetectado as e:
+            logger.error(f"{etiqueta}Bloqueo detectado, se corta a todos los workers: {e}")
+            self._pedir_corte(str(e))
+        except Exception as e:
+            # Un worker roto no tumba a los demas: su combinacion en curso no
+            # se marca y se reintenta en la proxima corrida
+            logger.error(f"{etiqueta}Worker detenido por error: {e}")
+        finally:
+            with self._lock:
+                self.vivos.discard(n)
+            try:
+                if s.driver is not None:
+                    mb, procesos = s.memoria_navegador()
+                    logger.info(f"{etiqueta}Navegador al terminar: {mb:.0f} MB en {procesos} "
+                                f"procesos, {s.fichas_driver} fichas desde el ultimo arranque, "
+                                f"{s.reciclajes} reciclajes, {s.reinicios} relanzamientos")
+            except Exception:
+                pass
+            try:
+                s.close()
+            except Exception:
+                pass
+
+    def _caida(self, s, etiqueta, i, rubro, distrito, error):
+        """Guarda lo que se alcanzo a extraer, devuelve la combinacion a la
+        cola (si le quedan reintentos) y relanza el navegador."""
+        with self._lock:
+            veces = self.caidas.get((rubro, distrito), 0) + 1
+            self.caidas[(rubro, distrito)] = veces
+        logger.warning(f"{etiqueta}Navegador caido en {rubro} / {distrito} "
+                       f"({len(error.parciales)} fichas a salvo): {error}")
+        # 'caida' nunca cuenta como hecha: si no se completa aca, queda pendiente
+        self.escritor.entregar(rubro, distrito, error.parciales, 'caida')
+        if veces <= self.reintentos_caida:
+            self.cola.put((i, (rubro, distrito)))
+        else:
+            logger.error(f"{etiqueta}{rubro} / {distrito}: {veces} caidas, "
+                         f"queda para la proxima corrida")
+        s.reiniciar_driver()
+
+    def correr(self):
+        """Corre hasta vaciar la cola, agotar el tope o recibir un bloqueo.
+
+        Ctrl+C corta a todos los workers y espera a que el escritor guarde lo
+        que ya se entrego antes de propagar la interrupcion.
+        """
+        self.escritor.iniciar()
+        hilos = [threading.Thread(target=self._worker, args=(n,), name=f'worker{n}', daemon=True)
+                 for n in range(1, self.workers + 1)]
+        for h in hilos:
+            h.start()
+
+        try:
+            for h in hilos:
+                while h.is_alive():
+                    h.join(timeout=0.5)
+        except KeyboardInterrupt:
+            self.detener.set()
+            for h in hilos:
+                h.join()
+            raise
+        finally:
+            self.escritor.cerrar()
+
+        if self.cupo.agotado:
+            with self._lock:
+                self.tope_alcanzado = True
+        return self.bloqueo
@@ -7,23 +7,64 @@ todo desde cero, lo que ademas quema busquedas contra Google innecesariamente.
 Formato: un JSONL, una linea por combinacion terminada. Se puede leer a ojo y
 sobrevive a que el proceso muera a mitad de escritura (solo se pierde la ultima
 linea, no el archivo).
+
+Remarcar una combinacion (parcial y despues ok) deja lineas muertas; para que
+el arranque no relea un log cada vez mas largo, cada tanto se compacta: la
+ultima marca de cada clave pasa a una foto (`progreso.snapshot.json`, un solo
+JSON) y el jsonl vuelve a quedar vacio. Al arrancar se lee la foto y despues
+solo la cola de marcas posteriores.
 """
 import json
+import logging
 import os
+import sqlite3
+import threading
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+
+def _reemplazar_atomico(ruta, contenido):
+    """Escribe `contenido` en `ruta` sin dejar nunca un archivo a medias."""
+    temporal = ruta + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write(contenido)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+
+def _termina_a_medias(ruta):
+    with open(ruta, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
 
 class RegistroProgreso:
-    def __init__(self, ruta='progreso.jsonl'):
+    # Marcas en la cola a partir de las cuales se compacta solo
+    COMPACTAR_DESDE = 500
+
+    def __init__(self, ruta='progreso.jsonl', compactar_desde=COMPACTAR_DESDE):
         self.ruta = ruta
+        self.ruta_snapshot = os.path.splitext(ruta)[0] + '.snapshot.json'
+        self.compactar_desde = compactar_desde
         self.hechas = {}
+        self.en_cola = 0          # marcas en el jsonl, desde la ultima foto
         self._cargar()
+        if self.compactar_desde and self.en_cola >= self.compactar_desde:
+            self.compactar()
 
     @staticmethod
     def clave(rubro, department, province, district):
         return f"{rubro}|{department}|{province}|{district}".lower()
 
     def _cargar(self):
+        if os.path.exists(self.ruta_snapshot):
+            with open(self.ruta_snapshot, encoding='utf-8') as f:
+                self.hechas = json.load(f).get('hechas', {})
+
+        # La cola se aplica encima: es posterior a la foto. Si se corto entre
+        # escribir la foto y vaciar la cola, reaplicarla da lo mismo.
         if not os.path.exists(self.ruta):
             return
         with open(self.ruta, encoding='utf-8') as f:
@@ -37,18 +78,38 @@ class RegistroProgreso:
                     continue  # linea a medias de una corrida cortada
                 if reg.get('clave'):
                     self.hechas[reg['clave']] = reg
+                    self.en_cola += 1
+
+    def compactar(self):
+        """Pasa la ultima marca de cada clave a la foto y vacia la cola.
+
+        Devuelve cuantas marcas de la cola se absorbieron.
+        """
+        absorbidas = self.en_cola
+        _reemplazar_atomico(self.ruta_snapshot, json.dumps({
+            'generado': datetime.now().isoformat(),
+            'hechas': self.hechas,
+        }, ensure_ascii=False))
+        if os.path.exists(self.ruta):
+            _reemplazar_atomico(self.ruta, '')
+        self.en_cola = 0
+        return absorbidas
 
     def ya_hecha(self, rubro, department, province, district):
         """Solo cuenta como hecha si termino completa.
 
-        Una combinacion cortada por el tope de sesion queda 'parcial' y se
-        vuelve a intentar en la siguiente corrida; si no, se perderian las
-        fichas que faltaban por extraer.
+        Una combinacion cortada por el tope de sesion queda 'parcial', y una
+        cortada porque se cayo el navegador queda 'caida'; las dos se vuelven
+        a intentar en la siguiente corrida. Si no, se perderian las fichas que
+        faltaban por extraer.
         """
         reg = self.hechas.get(self.clave(rubro, department, province, district))
         return bool(reg) and reg.get('estado') == 'ok'
 
-    def marcar(self, rubro, department, province, district, encontrados, estado='ok'):
+    def marcar(self, rubro, department, province, district, encontrados, estado='ok',
+               sincronizar=True):
+        """Anota la combinacion. `sincronizar=False` deja el fsync a quien
+        llama (DiarioCampana sincroniza varios lotes juntos)."""
         reg = {
             'clave': self.clave(rubro, department, province, district),
             'rubro': rubro,
@@ -61,16 +122,84 @@ class RegistroProgreso:
         }
         self.hechas[reg['clave']] = reg
         with open(self.ruta, 'a', encoding='utf-8') as f:
+            if f.tell() and _termina_a_medias(self.ruta):
+                f.write('\n')  # no pegar la marca a una linea cortada
             f.write(json.dumps(reg, ensure_ascii=False) + '\n')
             f.flush()
-            os.fsync(f.fileno())  # que sobreviva a un corte
+            if sincronizar:
+                os.fsync(f.fileno())  # que sobreviva a un corte
+        self.en_cola += 1
+        if self.compactar_desde and self.en_cola >= self.compactar_desde:
+            self.compactar()
         return reg
 
     def resumen(self):
         total = len(self.hechas)
         fichas = sum(r.get('encontrados', 0) for r in self.hechas.values())
-        vacias = sum(1 for r in self.hechas.values() if not r.get('encontrados'))
-        return {'combinaciones': total, 'fichas': fichas, 'sin_resultados': vacias}
+        vacias = sum(1 for r in self.hechas.values()
+                     if not r.get('encontrados') and r.get('estado', 'ok') == 'ok')
+        caidas = sum(1 for r in self.hechas.values() if r.get('estado') == 'caida')
+        return {'combinaciones': total, 'fichas': fichas, 'sin_resultados': vacias,
+                'caidas': caidas}
+
+
+class IndiceClaves:
+    """Claves del historial en SQLite: pertenencia en O(log n) sin cargarlas.
+
+    Con cientos de miles de negocios, armar un set en memoria en cada arranque
+    costaba segundos y cientos de MB. El indice es un B-tree en disco; recuerda
+    hasta que byte del jsonl ya indexo, asi al abrir solo lee lo agregado
+    despues (por otra corrida, por sembrar_vistos.py o a mano).
+    """
+
+    LOTE = 5000
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        # Lo consultan todos los workers a la vez
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.executescript('''
+            PRAGMA journal_mode = WAL;
+            PRAGMA synchronous = NORMAL;
+            CREATE TABLE IF NOT EXISTS claves (clave TEXT PRIMARY KEY) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (nombre TEXT PRIMARY KEY, valor INTEGER);
+        ''')
+        self._db.commit()
+
+    def __contains__(self, clave):
+        with self._lock:
+            return self._db.execute('SELECT 1 FROM claves WHERE clave = ?',
+                                    (clave,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute('SELECT COUNT(*) FROM claves').fetchone()[0]
+
+    def meta(self, nombre, defecto=0):
+        with self._lock:
+            fila = self._db.execute('SELECT valor FROM meta WHERE nombre = ?', (nombre,)).fetchone()
+        return fila[0] if fila else defecto
+
+    def agregar(self, claves, **meta):
+        """Inserta `claves` y actualiza `meta` en una sola transaccion."""
+        claves = iter(claves)
+        with self._lock, self._db:
+            while True:
+                tanda = [(c,) for _, c in zip(range(self.LOTE), claves)]
+                if not tanda:
+                    break
+                self._db.executemany('INSERT OR IGNORE INTO claves VALUES (?)', tanda)
+            self._db.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)', meta.items())
+
+    def vaciar(self):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM claves')
+            self._db.execute('DELETE FROM meta')
+
+    def cerrar(self):
+        with self._lock:
+            self._db.close()
 
 
 class HistorialVistos:
@@ -81,11 +210,15 @@ class HistorialVistos:
 
     Guarda dos claves por negocio, el place_id y nombre|direccion, porque
     alguna ficha puede no tener place_id legible.
+
+    vistos.jsonl sigue siendo el registro legible (wc -l, grep); `claves` es
+    su IndiceClaves (vistos.idx.sqlite al lado), que se puede borrar: se
+    reconstruye solo en el siguiente arranque.
     """
 
-    def __init__(self, ruta='vistos.jsonl'):
+    def __init__(self, ruta='vistos.jsonl', ruta_indice=None):
         self.ruta = ruta
-        self.claves = set()
+        self.claves = IndiceClaves(ruta_indice or os.path.splitext(ruta)[0] + '.idx.sqlite')
         self.negocios = 0
         self._cargar()
 
@@ -101,29 +234,52 @@ class HistorialVistos:
         return claves
 
     def _cargar(self):
+        """Indexa la cola del jsonl que el indice todavia no vio."""
+        indexado = self.claves.meta('bytes')
+        self.negocios = self.claves.meta('negocios')
         if not os.path.exists(self.ruta):
+            if indexado:
+                self.claves.vaciar()
+                self.negocios = 0
             return
-        with open(self.ruta, encoding='utf-8') as f:
+
+        if indexado > os.path.getsize(self.ruta):
+            # El jsonl se reemplazo o recorto: el indice ya no le corresponde
+            logger.warning(f"{self.ruta} cambio por fuera, se reconstruye el indice")
+            self.claves.vaciar()
+            indexado, self.negocios = 0, 0
+
+        nuevas = []
+        with open(self.ruta, 'rb') as f:
+            f.seek(indexado)
             for linea in f:
-                linea = linea.strip()
-                if not linea:
-                    continue
+                if not linea.endswith(b'\n'):
+                    break  # linea a medias: se relee cuando este completa
+                indexado += len(linea)
                 try:
                     reg = json.loads(linea)
-                except json.JSONDecodeError:
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if not isinstance(reg, dict):
                     continue
-                self.claves.update(reg.get('claves', []))
+                nuevas.extend(reg.get('claves', []))
                 self.negocios += 1
 
-    def agregar(self, registros):
+        if indexado != self.claves.meta('bytes'):
+            self.claves.agregar(nuevas, bytes=indexado, negocios=self.negocios)
+
+    def agregar(self, registros, sincronizar=True):
         """Anota negocios recien extraidos. Devuelve cuantos eran nuevos."""
         nuevos = 0
+        claves_nuevas = set()
         with open(self.ruta, 'a', encoding='utf-8') as f:
+            if f.tell() and _termina_a_medias(self.ruta):
+                f.write('\n')  # no pegar el primer registro a una linea cortada
             for reg in registros:
                 claves = self.claves_de(reg)
-                if not claves or claves & self.claves:
+                if not claves or claves & claves_nuevas or any(c in self.claves for c in claves):
                     continue
-                self.claves.update(claves)
+                claves_nuevas.update(claves)
                 self.negocios += 1
                 nuevos += 1
                 f.write(json.dumps({
@@ -134,5 +290,47 @@ class HistorialVistos:
                     'timestamp': datetime.now().isoformat(),
                 }, ensure_ascii=False) + '\n')
             f.flush()
-            os.fsync(f.fileno())
+            if sincronizar:
+                os.fsync(f.fileno())
+            fin = f.tell()
+        # Si se corta aca, el proximo arranque indexa estas lineas desde el jsonl
+        self.claves.agregar(claves_nuevas, bytes=fin, negocios=self.negocios)
         return nuevos
+
+    def cerrar(self):
+        self.claves.cerrar()
+
+
+class VistosSesion:
+    """Lo que una corrida no debe volver a abrir: el historial (en disco) mas
+    lo de esta sesion y lo excluido a mano (en memoria).
+
+    Es el `vistos` que comparten los workers; nunca copia el historial.
+    """
+
+    def __init__(self, historial=None, claves=()):
+        self.historial = historial
+        self.memoria = set(claves)
+        self._lock = threading.Lock()
+
+    def __contains__(self, clave):
+        if clave in self.memoria:
+            return True
+        return self.historial is not None and clave in self.historial.claves
+
+    def add(self, clave):
+        with self._lock:
+            self.memoria.add(clave)
+
+    def agregar_si_nuevo(self, clave):
+        """Marca `clave` como vista; False si ya lo estaba. Es atomico: de dos
+        workers que abrieron el mismo negocio, solo uno se lo queda."""
+        with self._lock:
+            if clave in self:
+                return False
+            self.memoria.add(clave)
+            return True
+
+    def update(self, claves):
+        with self._lock:
+            self.memoria.update(claves)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""Datos de negocios leidos de las respuestas de red de Maps, no del DOM.
+
+Maps no arma la ficha ni el listado con lo que se ve: los trae en arrays JSON
+con el prefijo anti-XSSI `)]}'`. Una ficha abierta por URL los trae dentro del
+documento (`window.APP_INITIALIZATION_STATE`); un clic en el listado, en
+`/maps/preview/place`; el scroll del listado, en `/search?tbm=map`. En las
+tres, cada negocio es un array con la misma forma, y ahi estan juntos nombre,
+rating, reviews, direccion, telefono, web, categoria, horario y coordenadas.
+
+Las posiciones no estan documentadas y Google las puede mover: aca solo se
+lee lo que esta, y lo que falte queda 'N/A' para que el scraper complete con
+el camino del DOM. Un array se reconoce como negocio por su id de Maps
+(0x...:0x..., el mismo que va tras !1s en el href de la ficha) y su nombre,
+asi que no importa en que envoltorio venga.
+"""
+import json
+import re
+
+PREFIJO = ")]}'"
+
+RE_ESTADO_INICIAL = re.compile(
+    r'window\.APP_INITIALIZATION_STATE\s*=\s*(\[.*?\]);\s*window\.APP_FLAGS', re.S)
+RE_ID_MAPS = re.compile(r'^0x[0-9a-f]+:0x[0-9a-f]+$')
+
+# Campos de la ficha que salen de la respuesta (los del esquema del scraper)
+CAMPOS = ['name', 'rating', 'review_count', 'address', 'phone', 'website', 'category', 'hours']
+
+# Respuestas de red que pueden traer negocios
+URLS_DATOS = ('/maps/preview/place', '/search?tbm=map', '/maps/place/', '/maps/search/')
+
+# Posiciones dentro del array de un negocio
+POS_ID = 10
+POS_NOMBRE = 11
+
+
+def _en(datos, *indices):
+    """datos[i][j]... o None si algun nivel no existe."""
+    for i in indices:
+        if not isinstance(datos, list) or i >= len(datos):
+            return None
+        datos = datos[i]
+    return datos
+
+
+def decodificar(texto):
+    """Cuerpo de una respuesta -> objeto JSON, o None si no trae datos.
+
+    Acepta el JSON con prefijo, el envoltorio {"d": ")]}'..."} de la busqueda
+    y el HTML de la pagina con su estado inicial.
+    """
+    if not texto:
+        return None
+    texto = texto.lstrip()
+    if texto.startswith(PREFIJO):
+        texto = texto[len(PREFIJO):]
+    elif texto.startswith('<'):
+        m = RE_ESTADO_INICIAL.search(texto)
+        if not m:
+            return None
+        texto = m.group(1)
+    try:
+        return json.loads(texto)
+    except ValueError:
+        return None
+
+
+def es_lugar(datos):
+    return (isinstance(_en(datos, POS_ID), str) and RE_ID_MAPS.match(datos[POS_ID]) is not None
+            and isinstance(_en(datos, POS_NOMBRE), str))
+
+
+def lugares(datos):
+    """Recorre el objeto y devuelve cada array de negocio, una sola vez."""
+    pendientes = [datos]
+    while pendientes:
+        actual = pendientes.pop()
+        if isinstance(actual, str):
+            if actual.startswith(PREFIJO):
+                pendientes.append(decodificar(actual))
+        elif isinstance(actual, dict):
+            pendientes.extend(actual.values())
+        elif isinstance(actual, list):
+            if es_lugar(actual):
+                yield actual
+                continue  # adentro solo hay datos del mismo negocio
+            pendientes.extend(reversed(actual))
+
+
+def _horario(datos):
+    """[[dia, [franjas]], ...] -> "lunes, De 9 a.m. a 6 p.m.; martes, ..." o None."""
+    dias = []
+    for dia in _en(datos, 34, 1) or []:
+        if not isinstance(dia, list) or not dia or not isinstance(dia[0], str):
+            continue
+        franjas = next((x for x in dia[1:] if isinstance(x, list)
+                        and x and all(isinstance(f, str) for f in x)), None)
+        if franjas:
+            dias.append(f"{dia[0]}, {', '.join(franjas)}")
+    return '; '.join(dias) or None
+
+
+def campos_de_lugar(datos):
+    """Array de un negocio -> campos del scraper, mas place_id, lat y lng."""
+    rating = _en(datos, 4, 7)
+    reviews = _en(datos, 4, 8)
+    direccion = _en(datos, 39)
+    if not isinstance(direccion, str):
+        partes = _en(datos, 2)
+        direccion = ', '.join(p for p in partes if isinstance(p, str)) \
+            if isinstance(partes, list) else None
+    texto = lambda v: v if isinstance(v, str) and v.strip() else 'N/A'
+    return {
+        'place_id': datos[POS_ID],
+        'name': datos[POS_NOMBRE],
+        'rating': float(rating) if isinstance(rating, (int, float)) and 0 < rating <= 5 else 0.0,
+        'review_count': int(reviews) if isinstance(reviews, (int, float)) else 0,
+        'address': texto(direccion),
+        'phone': texto(_en(datos, 178, 0, 0)),
+        'website': texto(_en(datos, 7, 0)),
+        'category': texto(_en(datos, 13, 0)),
+        'hours': _horario(datos) or 'N/A',
+        'lat': _en(datos, 9, 2),
+        'lng': _en(datos, 9, 3),
+    }
+
+
+def lugares_de_respuesta(texto):
+    """{place_id: campos} de todos los negocios de una respuesta."""
+    encontrados = {}
+    for datos in lugares(decodificar(texto)):
+        campos = campos_de_lugar(datos)
+        # El mismo negocio puede venir resumido y completo: gana el de mas datos
+        previo = encontrados.get(campos['place_id'])
+        if previo is None or _completitud(campos) > _completitud(previo):
+            encontrados[campos['place_id']] = campos
+    return encontrados
+
+
+def _completitud(campos):
+    return sum(1 for v in campos.values() if v not in (None, 'N/A', 0, 0.0))
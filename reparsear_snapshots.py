@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Re-extrae una campana desde las capturas guardadas con --snapshots.
+
+No abre Chrome ni toca Google: lee el HTML de cada ficha archivada y lo pasa
+por el mismo parseo que el scraper en vivo. Sirve para corregir un selector y
+regenerar la salida en segundos.
+
+    python3 reparsear_snapshots.py snapshots --salida campana_reparseada
+    python3 reparsear_snapshots.py snapshots --con-web   # + emails de las webs (usa la cache)
+"""
+import argparse
+import csv
+import json
+import sys
+
+import parseo
+from snapshots import ArchivoSnapshots, ficha_desde_snapshot
+
+
+def main():
+    p = argparse.ArgumentParser(description='Capturas de fichas -> CSV/JSON del scraper')
+    p.add_argument('directorio', help='carpeta de capturas (--snapshots de correr_campana.py)')
+    p.add_argument('--salida', default='campana_reparseada')
+    p.add_argument('--formato', choices=['csv', 'json', 'both'], default='both')
+    p.add_argument('--con-web', action='store_true',
+                   help='sumar los emails de la web de cada negocio (pasa por la cache web '
+                        'y la memo por dominio, asi que lo ya visitado no sale a la red)')
+    p.add_argument('--cache-web', default='cache_web.sqlite')
+    p.add_argument('--memo-emails', default='emails_dominio.sqlite')
+    args = p.parse_args()
+
+    scraper = None
+    if args.con_web:
+        # Import tardio: sin --con-web no hace falta tener selenium instalado
+        from cache_web import CacheHTTP, MemoEmailsDominio
+        from gmb_scraper_lite import GMBScraper
+        scraper = GMBScraper(headless=True)
+        scraper.cache_web = CacheHTTP(args.cache_web)
+        scraper.memo_emails = MemoEmailsDominio(args.memo_emails)
+
+    registros, sin_nombre = [], 0
+    for meta, html in ArchivoSnapshots(args.directorio):
+        registro, emails = ficha_desde_snapshot(meta, html)
+        if registro['name'] == 'N/A':
+            sin_nombre += 1
+        if scraper is not None and registro['website'] != 'N/A':
+            emails.extend(scraper.extract_emails_from_website(registro['website']))
+        emails = list(set(e for e in emails if parseo.email_valido(e)))
+        registro['emails'] = emails
+        registro['email'] = emails[0] if emails else 'N/A'
+        registros.append(registro)
+
+    if not registros:
+        print(f"No hay capturas en {args.directorio}")
+        return 1
+
+    if args.formato in ('csv', 'both'):
+        columnas = []
+        for r in registros:
+            columnas += [c for c in r if c not in columnas]
+        with open(f'{args.salida}.csv', 'w', newline='', encoding='utf-8-sig') as f:
+            escritor = csv.DictWriter(f, fieldnames=columnas)
+            escritor.writeheader()
+            escritor.writerows(registros)
+    if args.formato in ('json', 'both'):
+        with open(f'{args.salida}.json', 'w', encoding='utf-8') as f:
+            json.dump(registros, f, ensure_ascii=False, indent=2)
+
+    print(f"{len(registros)} fichas re-extraidas de {args.directorio} -> {args.salida}"
+          f" ({sin_nombre} sin nombre: revisar selectores)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
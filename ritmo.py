@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""Ritmo de las visitas a Google: esperar a que la pagina este lista y no mas.
+
+Antes cada paso dormia un rango fijo (3-6 s tras la busqueda, 2.5-4 s tras
+abrir una ficha, 1-3 s por candidato...) aunque la pagina ya hubiera cargado.
+Ahora cada momento tiene un presupuesto en segundos contado DESDE que se pidio
+la pagina: se espera la senal de "lista" (h1 de la ficha, feed del listado) y
+solo se completa con un sorteo hasta ese presupuesto. Si la carga ya se comio
+el presupuesto, no se duerme nada.
+
+Aparte, un balde de fichas por minuto y por hora limita las navegaciones de
+TODA la IP (una instancia compartida por todos los workers), asi el ritmo
+global queda dentro de lo que PRUEBA-DE-HUMO.md da por seguro aunque las
+paginas carguen rapido.
+
+Con un ControlAdaptivo, el ritmo ademas se ajusta solo: si las cargas se
+vuelven lentas, el h1 no aparece, los listados vuelven vacios o aparecen muros
+de consentimiento (lo que suele venir ANTES de un bloqueo), se alargan las
+pausas, se baja el tope y trabajan menos navegadores; cuando las senales
+vuelven a estar limpias, se acelera de nuevo.
+"""
+import logging
+import random
+import statistics
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+def _acotar(x):
+    return max(0.0, min(1.0, x))
+
+
+class ControlAdaptivo:
+    """Nivel de riesgo de la IP a partir de senales previas a un bloqueo.
+
+    Cada senal da un puntaje de 0 a 1 y el riesgo es el mayor:
+      - carga lenta: mediana reciente de las cargas contra la mejor vista, por
+        separado para listados y fichas (1.5x = 0, 3x = 1)
+      - senal que no llega (h1 de la ficha, listado): 30% de la ventana = 1
+      - listados vacios: la mitad de las ultimas busquedas = 1
+      - muros de consentimiento: uno = 0.5, dos o mas = 1
+    Con riesgo >= `subir` se va a 'precaucion' y con riesgo >= `frenar` a
+    'frenado' (de a un nivel, como mucho uno cada `minimo` observaciones); tras
+    `limpias` observaciones seguidas con riesgo < `bajar` se vuelve uno atras.
+    """
+
+    # estado, multiplicador de pausas, fraccion del tope, fraccion de navegadores
+    NIVELES = [
+        ('normal', 1.0, 1.0, 1.0),
+        ('precaucion', 2.0, 0.6, 0.5),
+        ('frenado', 4.0, 0.3, 0.0),     # 0: queda uno solo
+    ]
+
+    def __init__(self, ventana=20, minimo=5, subir=0.5, frenar=0.8, bajar=0.2, limpias=15):
+        self.minimo = minimo
+        self.subir = subir
+        self.frenar = frenar
+        self.bajar = bajar
+        self.limpias = limpias
+        self.nivel = 0
+        self.cambios = 0
+        self.ventana = ventana
+        self._cargas = {}                           # momento -> segundos hasta "lista"
+        self._mejor = {}                            # momento -> mejor mediana vista
+        self._sin_senal = deque(maxlen=ventana)     # True si la senal no llego
+        self._busquedas = deque(maxlen=10)          # 'ok' / 'vacio' / 'consentimiento'
+        self._desde_cambio = 0
+        self._racha_limpia = 0
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        return self.NIVELES[self.nivel][0]
+
+    @property
+    def escala(self):
+        return self.NIVELES[self.nivel][1]
+
+    @property
+    def fraccion_tope(self):
+        return self.NIVELES[self.nivel][2]
+
+    def concurrencia(self, total):
+        return max(1, int(total * self.NIVELES[self.nivel][3]))
+
+    def observar_carga(self, momento, segundos, llego):
+        with self._lock:
+            self._sin_senal.append(not llego)
+            if llego:
+                cargas = self._cargas.setdefault(momento, deque(maxlen=self.ventana))
+                cargas.append(segundos)
+                if len(cargas) >= self.minimo:
+                    mediana = statistics.median(cargas)
+                    self._mejor[momento] = min(self._mejor.get(momento, mediana), mediana)
+            self._evaluar()
+
+    def observar_busqueda(self, resultado):
+        """`resultado`: 'ok', 'vacio' (listado sin tarjetas) o 'consentimiento'."""
+        with self._lock:
+            self._busquedas.append(resultado)
+            self._evaluar()
+
+    def _puntajes(self):
+        puntajes = {}
+        for momento, mejor in self._mejor.items():
+            if mejor > 0:
+                relacion = statistics.median(self._cargas[momento]) / mejor
+                puntajes[f'{momento}_lento'] = _acotar((relacion - 1.5) / 1.5)
+        if len(self._sin_senal) >= self.minimo:
+            puntajes['sin_senal'] = _acotar(sum(self._sin_senal) / len(self._sin_senal) / 0.3)
+        if self._busquedas:
+            vacios = self._busquedas.count('vacio')
+            puntajes['listado_vacio'] = _acotar(vacios / len(self._busquedas) / 0.5) if vacios >= 2 else 0.0
+            puntajes['consentimiento'] = _acotar(self._busquedas.count('consentimiento') / 2)
+        return puntajes
+
+    def riesgo(self):
+        with self._lock:
+            return max(self._puntajes().values(), default=0.0)
+
+    def _evaluar(self):
+        puntajes = self._puntajes()
+        riesgo = max(puntajes.values(), default=0.0)
+        self._desde_cambio += 1
+
+        if riesgo >= self.subir:
+            self._racha_limpia = 0
+            objetivo = 2 if riesgo >= self.frenar else 1
+            if self.nivel < objetivo and self._desde_cambio >= self.minimo:
+                causa = max(puntajes, key=puntajes.get)
+                self._cambiar(self.nivel + 1, f"riesgo {riesgo:.2f} por {causa}")
+        elif riesgo < self.bajar:
+            self._racha_limpia += 1
+            if self.nivel > 0 and self._racha_limpia >= self.limpias:
+                self._cambiar(self.nivel - 1, f"{self._racha_limpia} observaciones limpias")
+        else:
+            self._racha_limpia = 0
+
+    def _cambiar(self, nivel, motivo):
+        anterior = self.estado
+        self.nivel = nivel
+        self.cambios += 1
+        self._desde_cambio = 0
+        self._racha_limpia = 0
+        logger.warning(f"Ritmo {anterior} -> {self.estado} ({motivo}): pausas x{self.escala:g}, "
+                       f"tope al {self.fraccion_tope:.0%}")
+
+
+class Ritmo:
+    """Pausas y tope de navegaciones de una IP."""
+
+    # momento -> (min, max) segundos desde que se pidio la pagina
+    PRESUPUESTOS = {
+        'listado': (5, 10),          # busqueda cargada (antes 3-6 + 2-4 fijos)
+        'ficha': (3.5, 7),           # ficha abierta (antes 1-3 + 2.5-4 fijos)
+        'scroll': (1.5, 3),          # mas tarjetas en el feed
+        'clic': (0.5, 1),            # antes/despues de un clic (cookies)
+        'gesto': (0.1, 0.3),         # movimientos de mouse
+        'web': (1, 2),               # antes de visitar la web del negocio
+        'contacto': (0.5, 1.5),      # entre paginas de contacto de la misma web
+        'entre_busquedas': (20, 40),
+    }
+
+    # Cuanto se espera como maximo la senal de "lista" antes de seguir igual
+    ESPERA_MAXIMA = {'listado': 15, 'ficha': 12}
+
+    # Cargas que alimentan al control adaptativo
+    MOMENTOS_CARGA = ('listado', 'ficha')
+
+    def __init__(self, presupuestos=None, escala=1.0, por_minuto=8, por_hora=300,
+                 intervalo=0.25, control=None):
+        self.presupuestos = dict(self.PRESUPUESTOS, **(presupuestos or {}))
+        self.escala = escala                  # 0 = sin pausas (benchmarks)
+        self.intervalo = intervalo            # cada cuanto se mira la senal
+        self.control = control                # ControlAdaptivo opcional
+        self._recientes = deque(maxlen=1000)  # momentos de las ultimas navegaciones
+        self._lock = threading.Lock()
+
+        # Baldes: capacidad = tope del periodo, se rellenan de a poco
+        self._baldes = []
+        for tope, periodo in ((por_minuto, 60.0), (por_hora, 3600.0)):
+            if tope:
+                self._baldes.append({'tope': float(tope), 'tasa': tope / periodo,
+                                     'fichas': float(tope), 'ultimo': time.monotonic()})
+
+        self.navegaciones = 0
+        self.segundos_carga = 0.0      # esperando que la pagina este lista
+        self.segundos_relleno = 0.0    # durmiendo para completar el presupuesto
+        self.segundos_tope = 0.0       # frenados por el balde
+
+    def _sorteo(self, momento, rango=None):
+        minimo, maximo = rango or self.presupuestos[momento]
+        escala = self.escala * (self.control.escala if self.control is not None else 1.0)
+        return random.uniform(minimo, maximo) * escala
+
+    def _dormir(self, segundos):
+        if segundos > 0:
+            time.sleep(segundos)
+            with self._lock:
+                self.segundos_relleno += segundos
+
+    def pausa(self, momento, rango=None):
+        """Pausa simple del momento (o de `rango`), sin senal que esperar."""
+        self._dormir(self._sorteo(momento, rango))
+
+    def completar(self, momento, desde):
+        """Duerme lo que falte para cumplir el presupuesto contado desde `desde`."""
+        self._dormir(self._sorteo(momento) - (time.monotonic() - desde))
+
+    def esperar_listo(self, lista, momento, desde, timeout=None):
+        """Espera a que `lista()` de True y completa el presupuesto de `momento`.
+
+        `desde` es el time.monotonic() de cuando se pidio la pagina. Devuelve
+        si la senal llego; si no llega en `timeout` se sigue igual y quien
+        llama decide (bloqueo, ficha que no cargo, fin del listado...).
+        """
+        if timeout is None:
+            timeout = self.ESPERA_MAXIMA.get(momento, self.presupuestos[momento][1])
+        limite = desde + timeout
+        ok = False
+        while True:
+            try:
+                ok = bool(lista())
+            except Exception:
+                ok = False
+            if ok or time.monotonic() >= limite:
+                break
+            time.sleep(self.intervalo)
+        self.observar_carga(momento, time.monotonic() - desde, ok)
+        self.completar(momento, desde)
+        return ok
+
+    def observar_carga(self, momento, segundos, llego):
+        """Registra una carga esperada por fuera de esperar_listo (pestanas)."""
+        with self._lock:
+            self.segundos_carga += segundos
+        if self.control is not None and momento in self.MOMENTOS_CARGA:
+            self.control.observar_carga(momento, segundos, llego)
+
+    def observar_busqueda(self, resultado):
+        if self.control is not None:
+            self.control.observar_busqueda(resultado)
+
+    def concurrencia(self, total):
+        """Cuantos de `total` navegadores/pestanas pueden trabajar ahora."""
+        return total if self.control is None else self.control.concurrencia(total)
+
+    def turno(self, detener=None):
+        """Toma una navegacion del balde; bloquea mientras la IP va sobre el tope.
+
+        Devuelve False si `detener` (threading.Event) se activo esperando.
+        """
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                fraccion = self.control.fraccion_tope if self.control is not None else 1.0
+                espera = 0.0
+                for b in self._baldes:
+                    tasa = b['tasa'] * fraccion
+                    b['fichas'] = min(b['tope'] * fraccion, b['fichas'] + (ahora - b['ultimo']) * tasa)
+                    b['ultimo'] = ahora
+                    if b['fichas'] < 1:
+                        espera = max(espera, (1 - b['fichas']) / tasa)
+                if espera == 0:
+                    for b in self._baldes:
+                        b['fichas'] -= 1
+                    self.navegaciones += 1
+                    self._recientes.append(ahora)
+                    return True
+            if detener is not None and detener.is_set():
+                return False
+            # De a poco, para enterarse si otro worker pidio cortar
+            tramo = min(espera, 1.0)
+            time.sleep(tramo)
+            with self._lock:
+                self.segundos_tope += tramo
+
+    def por_minuto_actual(self, ventana=300):
+        """Navegaciones por minuto en los ultimos `ventana` segundos."""
+        with self._lock:
+            desde = time.monotonic() - ventana
+            return sum(1 for t in self._recientes if t >= desde) * 60 / ventana
+
+    def estado(self):
+        """Linea corta para el log de la campana."""
+        texto = f"{self.por_minuto_actual():.1f} pag/min"
+        if self.control is not None:
+            texto = f"{self.control.estado}, {texto}, riesgo {self.control.riesgo():.2f}"
+        return texto
+
+    def resumen(self):
+        texto = (f"{self.navegaciones} navegaciones; {self.segundos_carga:.0f}s esperando cargas, "
+                 f"{self.segundos_relleno:.0f}s de pausas, {self.segundos_tope:.0f}s frenados por el tope")
+        if self.control is not None:
+            texto += f"; control en '{self.control.estado}' tras {self.control.cambios} cambios"
+        return texto
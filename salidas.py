@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""Lectura y exportacion de la salida del scraper (JSONL, JSON o CSV).
+
+La corrida escribe `<salida>.jsonl`: un negocio por linea, y cada lote solo se
+agrega al final. El JSON de siempre (un arreglo con indent=2) ya no se
+reescribe entero en cada lote; se arma una sola vez, al final de la corrida o
+a pedido:
+
+    python3 salidas.py campana_gmb.jsonl               # -> campana_gmb.json
+    python3 salidas.py campana_gmb.jsonl --salida otra.json
+
+`leer_registros` lee cualquiera de los tres formatos de a un registro, sin
+cargar el archivo entero (salvo el JSON, que no se puede leer por partes).
+
+Para analisis entre campanas, `exportar_parquet` escribe Parquet particionado
+por departamento/distrito/rubro con un esquema fijo (requiere pyarrow):
+
+    python3 salidas.py campana_gmb.jsonl --parquet gmb_parquet
+
+`ArchivosDistrito` mantiene los CSV por distrito (gmb_results/gmb_<distrito>.csv)
+agregando solo los negocios nuevos; el orden se arma aparte, con `finalizar`.
+"""
+import argparse
+import ast
+import csv
+import json
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime
+from itertools import count, islice
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pa_ds
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+from progreso import IndiceClaves
+
+logger = logging.getLogger(__name__)
+
+# Carpetas department=.../district=.../search_keyword=... (estilo Hive): un
+# filtro por distrito o rubro solo abre los archivos de esa particion
+PARTICIONES = ['department', 'district', 'search_keyword']
+
+# Esquema fijo del Parquet, en el orden de las columnas. Lo que el scraper
+# deja como 'N/A' queda nulo; las columnas que no estan aca no se exportan.
+COLUMNAS_PARQUET = [
+    ('place_id', 'string'),
+    ('name', 'string'),
+    ('rating', 'float64'),
+    ('review_count', 'int64'),
+    ('address', 'string'),
+    ('phone', 'string'),
+    ('website', 'string'),
+    ('category', 'string'),
+    ('hours', 'string'),
+    ('email', 'string'),
+    ('emails', 'lista'),
+    ('location', 'string'),
+    ('timestamp', 'timestamp'),
+    ('province', 'string'),
+    ('department', 'string'),
+    ('district', 'string'),
+    ('search_keyword', 'string'),
+]
+
+VACIOS = ('', 'N/A', 'No disponible')
+
+
+def leer_jsonl(ruta, desde=0):
+    """Registros de un JSONL, de a uno, a partir del byte `desde`. Una ultima
+    linea a medias (corte a mitad de escritura) se saltea."""
+    with open(ruta, encoding='utf-8') as f:
+        f.seek(desde)
+        for n, linea in enumerate(f, 1):
+            if not linea.strip():
+                continue
+            try:
+                yield json.loads(linea)
+            except json.JSONDecodeError:
+                logger.warning(f"{ruta}: linea {n} ilegible, se saltea")
+
+
+def leer_registros(ruta):
+    """Registros del scraper desde .jsonl, .json, .csv o el almacen .sqlite,
+    segun la extension."""
+    if ruta.endswith('.sqlite'):
+        from almacen import AlmacenLeads
+        almacen = AlmacenLeads(ruta)
+        try:
+            yield from almacen.registros()
+        finally:
+            almacen.cerrar()
+    elif ruta.endswith('.jsonl'):
+        yield from leer_jsonl(ruta)
+    elif ruta.endswith('.json'):
+        with open(ruta, encoding='utf-8') as f:
+            yield from json.load(f)
+    else:
+        with open(ruta, encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+
+
+def _termina_a_medias(ruta):
+    if not os.path.exists(ruta) or not os.path.getsize(ruta):
+        return False
+    with open(ruta, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b'\n'
+
+
+def agregar_jsonl(ruta, registros):
+    """Agrega los registros al final de `ruta`. Devuelve cuantos escribio."""
+    # Si el archivo quedo con una linea a medias, se cierra antes: si no, el
+    # primer registro nuevo se pegaria a ella y se perderian los dos
+    a_medias = _termina_a_medias(ruta)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        if a_medias:
+            f.write('\n')
+        for reg in registros:
+            f.write(json.dumps(reg, ensure_ascii=False, default=str) + '\n')
+    return len(registros)
+
+
+def exportar_json(origen, destino=None):
+    """Arma el JSON con indent=2 desde el JSONL `origen`, sin cargarlo entero.
+
+    Se escribe a un temporal y se reemplaza: el JSON anterior queda intacto
+    hasta que el nuevo esta completo. Devuelve cuantos registros exporto.
+    """
+    destino = destino or os.path.splitext(origen)[0] + '.json'
+    temporal = destino + '.tmp'
+    total = 0
+    with open(temporal, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for reg in leer_jsonl(origen):
+            bloque = json.dumps(reg, ensure_ascii=False, indent=2, default=str)
+            f.write((',\n  ' if total else '\n  ') + bloque.replace('\n', '\n  '))
+            total += 1
+        f.write('\n]' if total else ']')
+    os.replace(temporal, destino)
+    return total
+
+
+def _esquema_parquet():
+    tipos = {'string': pa.string(), 'float64': pa.float64(), 'int64': pa.int64(),
+             'lista': pa.list_(pa.string()), 'timestamp': pa.timestamp('us')}
+    return pa.schema([(nombre, tipos[tipo]) for nombre, tipo in COLUMNAS_PARQUET])
+
+
+def _valor_parquet(valor, tipo):
+    """Lleva un valor del scraper (JSON o CSV, donde todo es texto) al tipo
+    de su columna; lo vacio o ilegible queda nulo."""
+    if valor is None or (isinstance(valor, str) and valor.strip() in VACIOS):
+        return None
+    try:
+        if tipo == 'float64':
+            return float(str(valor).replace(',', '.'))
+        if tipo == 'int64':
+            return int(float(valor))
+        if tipo == 'timestamp':
+            return valor if isinstance(valor, datetime) else datetime.fromisoformat(str(valor))
+        if tipo == 'lista':
+            if isinstance(valor, str):
+                # En el CSV la lista viene como su repr: "['a@b.pe']"
+                valor = ast.literal_eval(valor) if valor.startswith('[') else [valor]
+            return [str(v) for v in valor if v not in VACIOS]
+    except (TypeError, ValueError, SyntaxError):
+        return None
+    return str(valor)
+
+
+def tabla_parquet(registros):
+    """Tabla de pyarrow con el esquema fijo a partir de registros del scraper."""
+    columnas = {nombre: [] for nombre, _ in COLUMNAS_PARQUET}
+    for reg in registros:
+        for nombre, tipo in COLUMNAS_PARQUET:
+            columnas[nombre].append(_valor_parquet(reg.get(nombre), tipo))
+    return pa.table(columnas, schema=_esquema_parquet())
+
+
+def exportar_parquet(registros, directorio, tanda=50000):
+    """Agrega `registros` al dataset Parquet de `directorio`, por tandas.
+
+    Cada exportacion escribe archivos nuevos en cada particion (no pisa los
+    anteriores), asi que para no duplicar hay que exportar cada corrida una
+    sola vez. Devuelve cuantos registros escribio.
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError('Exportar a Parquet requiere pyarrow (pip install pyarrow)')
+    registros = iter(registros)
+    prefijo = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    total = 0
+    for n in count():
+        registros_tanda = list(islice(registros, tanda))
+        if not registros_tanda:
+            break
+        pa_ds.write_dataset(
+            tabla_parquet(registros_tanda), directorio, format='parquet',
+            partitioning=PARTICIONES, partitioning_flavor='hive',
+            basename_template=f'{prefijo}-{n}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore')
+        total += len(registros_tanda)
+    return total
+
+
+def abrir_parquet(directorio):
+    """Dataset de pyarrow sobre `directorio`, con las particiones como columnas.
+
+    Leer solo lo necesario:
+        ds = abrir_parquet('gmb_parquet')
+        ds.to_table(columns=['name', 'phone'],
+                    filter=pa_ds.field('district') == 'San Isidro')
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError('Leer Parquet requiere pyarrow (pip install pyarrow)')
+    return pa_ds.dataset(directorio, format='parquet', partitioning='hive',
+                         schema=_esquema_parquet())
+
+
+class ArchivosDistrito:
+    """CSV por distrito que solo crecen: cada guardado agrega al final los
+    negocios que el archivo todavia no tiene (clave nombre|direccion).
+
+    Antes cada guardado releia el CSV entero con pandas, concatenaba,
+    deduplicaba, ordenaba y lo reescribia. Ahora las claves de cada distrito
+    viven en un IndiceClaves al lado (gmb_<distrito>.idx.sqlite), que solo se
+    rearma si el CSV cambio por fuera (otro tamano o fecha). Ordenar por rubro
+    y nombre queda para `finalizar`, una vez al terminar. No usa pandas.
+    """
+
+    def __init__(self, directorio='gmb_results'):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._indices = {}
+
+    @staticmethod
+    def clave(reg):
+        return f"{reg.get('name', '')}|{reg.get('address', '')}".lower()
+
+    def ruta(self, distrito):
+        return os.path.join(self.directorio, f"gmb_{distrito}.csv")
+
+    @staticmethod
+    def _firma(ruta):
+        st = os.stat(ruta) if os.path.exists(ruta) else None
+        return {'bytes': st.st_size if st else 0, 'mtime_ns': st.st_mtime_ns if st else 0}
+
+    @staticmethod
+    def _filas(ruta):
+        with open(ruta, encoding='utf-8-sig', newline='') as f:
+            yield from csv.DictReader(f)
+
+    def _indice(self, distrito):
+        ruta = self.ruta(distrito)
+        if distrito not in self._indices:
+            self._indices[distrito] = IndiceClaves(os.path.splitext(ruta)[0] + '.idx.sqlite')
+        indice = self._indices[distrito]
+        firma = self._firma(ruta)
+        if any(indice.meta(k, None) != v for k, v in firma.items()):
+            indice.vaciar()
+            claves = (self.clave(r) for r in self._filas(ruta)) if firma['bytes'] else ()
+            indice.agregar(claves, **firma)
+        return indice
+
+    def agregar(self, distrito, registros):
+        """Agrega a gmb_<distrito>.csv los registros nuevos; devuelve cuantos."""
+        indice = self._indice(distrito)
+        nuevos, claves = [], set()
+        for reg in registros:
+            clave = self.clave(reg)
+            if clave in claves or clave in indice:
+                continue
+            claves.add(clave)
+            nuevos.append(reg)
+        if not nuevos:
+            return 0
+
+        ruta = self.ruta(distrito)
+        existe = os.path.exists(ruta) and os.path.getsize(ruta) > 0
+        columnas = []
+        if existe:
+            with open(ruta, encoding='utf-8-sig', newline='') as f:
+                columnas = next(csv.reader(f), [])
+        faltan = list(dict.fromkeys(c for reg in nuevos for c in reg if c not in columnas))
+
+        if existe and faltan:
+            # Columna nueva (raro): se reescribe una vez con el encabezado ampliado
+            self._reescribir(ruta, columnas + faltan, list(self._filas(ruta)) + nuevos)
+        else:
+            a_medias = _termina_a_medias(ruta)
+            with open(ruta, 'a' if existe else 'w', newline='',
+                      encoding='utf-8' if existe else 'utf-8-sig') as f:
+                if a_medias:
+                    f.write('\r\n')
+                escritor = csv.DictWriter(f, fieldnames=columnas + faltan,
+                                          extrasaction='ignore', restval='')
+                if not existe:
+                    escritor.writeheader()
+                escritor.writerows(nuevos)
+
+        indice.agregar(claves, **self._firma(ruta))
+        return len(nuevos)
+
+    def _reescribir(self, ruta, columnas, filas):
+        temporal = ruta + '.tmp'
+        with open(temporal, 'w', newline='', encoding='utf-8-sig') as f:
+            escritor = csv.DictWriter(f, fieldnames=columnas, extrasaction='ignore', restval='')
+            escritor.writeheader()
+            escritor.writerows(filas)
+        os.replace(temporal, ruta)
+
+    def distritos(self):
+        return sorted(nombre[len('gmb_'):-len('.csv')] for nombre in os.listdir(self.directorio)
+                      if nombre.startswith('gmb_') and nombre.endswith('.csv'))
+
+    def finalizar(self, distrito=None):
+        """Ordena por rubro y nombre (como antes en cada guardado) el CSV de
+        `distrito`, o todos. Devuelve cuantos archivos ordeno."""
+        distritos = [distrito] if distrito else self.distritos()
+        for d in distritos:
+            ruta = self.ruta(d)
+            if not os.path.exists(ruta):
+                continue
+            indice = self._indice(d)
+            with open(ruta, encoding='utf-8-sig', newline='') as f:
+                lector = csv.DictReader(f)
+                filas = sorted(lector, key=lambda r: (r.get('search_keyword') or '',
+                                                      r.get('name') or ''))
+                columnas = lector.fieldnames or []
+            self._reescribir(ruta, columnas, filas)
+            # Mismas claves, otro archivo: que el indice no se rearme por eso
+            indice.agregar((), **self._firma(ruta))
+        return len(distritos)
+
+    def cerrar(self):
+        for indice in self._indices.values():
+            indice.cerrar()
+        self._indices = {}
+
+
+def migrar_json(prefijo):
+    """Si una campana vieja solo tiene `<prefijo>.json`, arma su `.jsonl`.
+
+    Asi la corrida sigue agregando sobre lo anterior y el JSON exportado al
+    final no pierde los registros previos.
+    """
+    ruta_json, ruta_jsonl = f'{prefijo}.json', f'{prefijo}.jsonl'
+    if os.path.exists(ruta_jsonl) or not os.path.exists(ruta_json):
+        return 0
+    try:
+        with open(ruta_json, encoding='utf-8') as f:
+            datos = json.load(f)
+    except ValueError as e:
+        logger.error(f"{ruta_json} ilegible ({e}); no se migra a {ruta_jsonl}")
+        return 0
+    temporal = ruta_jsonl + '.tmp'
+    agregar_jsonl(temporal, datos)
+    os.replace(temporal, ruta_jsonl)
+    logger.info(f"{ruta_json}: {len(datos)} registros pasados a {ruta_jsonl}")
+    return len(datos)
+
+
+def main():
+    p = argparse.ArgumentParser(description='JSONL del scraper -> JSON con indent=2 o Parquet')
+    p.add_argument('entrada', help='campana_gmb.jsonl (con --parquet tambien .json o .csv)')
+    p.add_argument('--salida', help='por defecto, el mismo nombre con .json')
+    p.add_argument('--parquet', metavar='DIR',
+                   help='agregar los registros al dataset Parquet de DIR en vez de armar el JSON')
+    args = p.parse_args()
+
+    if not os.path.exists(args.entrada):
+        print(f"No existe {args.entrada}")
+        return 1
+    if args.parquet:
+        total = exportar_parquet(leer_registros(args.entrada), args.parquet)
+        print(f"{total} registros agregados a {args.parquet}")
+        return 0
+    destino = args.salida or os.path.splitext(args.entrada)[0] + '.json'
+    total = exportar_json(args.entrada, destino)
+    print(f"{total} registros exportados a {destino}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
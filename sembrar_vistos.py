@@ -4,12 +4,16 @@
 Uso una sola vez, para que el historial arranque sabiendo todo lo que ya
 tenemos. Despues correr_campana.py lo mantiene solo.
 
-    python3 sembrar_vistos.py *.json
+    python3 sembrar_vistos.py *.json *.jsonl
 """
-import json
 import sys
+from itertools import islice
 
 from progreso import HistorialVistos
+from salidas import leer_registros
+
+# Los JSONL se leen de a tandas: nunca se carga una corrida entera
+TANDA = 5000
 
 
 def main():
@@ -22,20 +26,23 @@ def main():
     print(f"Historial actual: {historial.negocios} negocios")
 
     for ruta in rutas:
+        fichas = nuevos = 0
         try:
-            with open(ruta, encoding='utf-8') as f:
-                datos = json.load(f)
+            registros = leer_registros(ruta)
+            while True:
+                tanda = list(islice(registros, TANDA))
+                if not tanda:
+                    break
+                if not fichas and not (isinstance(tanda[0], dict) and 'name' in tanda[0]):
+                    break  # no es una salida del scraper
+                fichas += len(tanda)
+                nuevos += historial.agregar(tanda)
         except Exception as e:
             print(f"  {ruta}: ilegible ({e})")
             continue
 
-        if not isinstance(datos, list) or not datos or not isinstance(datos[0], dict):
-            continue
-        if 'name' not in datos[0]:
-            continue  # no es una salida del scraper
-
-        nuevos = historial.agregar(datos)
-        print(f"  {ruta}: {len(datos)} fichas -> {nuevos} nuevas al historial")
+        if fichas:
+            print(f"  {ruta}: {fichas} fichas -> {nuevos} nuevas al historial")
 
     print(f"Historial final: {historial.negocios} negocios unicos")
     return 0
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Capturas del panel de cada ficha, para re-extraer sin volver a Google.
+
+Durante la corrida (`--snapshots DIR` en correr_campana.py) se guarda el HTML
+del panel de detalle de cada ficha, comprimido, uno por place_id. Despues,
+`reparsear_snapshots.py` vuelve a sacar los campos de ese HTML con las mismas
+reglas que el scraper en vivo (parseo.campos_desde_crudos): arreglar un
+selector y re-extraer una campana entera pasa a ser un trabajo local de
+segundos en vez de horas de scraping.
+
+Formato: DIR/<place_id>.html.gz; la primera linea es un JSON con los datos de
+contexto (href, location, query, timestamp) y el resto es el HTML.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+
+from bs4 import BeautifulSoup
+
+import parseo
+
+try:
+    import lxml  # noqa: F401
+    PARSER_HTML = 'lxml'
+except ImportError:
+    PARSER_HTML = 'html.parser'
+
+
+class ArchivoSnapshots:
+    """Carpeta de capturas comprimidas, una por negocio."""
+
+    def __init__(self, directorio='snapshots'):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+
+    @staticmethod
+    def nombre_archivo(place_id, href=''):
+        # place_id trae ':' (invalido en Windows); sin place_id, hash del href
+        base = place_id or hashlib.sha1((href or '').encode('utf-8')).hexdigest()[:16]
+        return re.sub(r'[^A-Za-z0-9_.-]', '_', base) + '.html.gz'
+
+    def guardar(self, place_id, html, meta):
+        ruta = os.path.join(self.directorio, self.nombre_archivo(place_id, meta.get('href')))
+        temporal = ruta + '.tmp'
+        with gzip.open(temporal, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps(dict(meta, place_id=place_id), ensure_ascii=False) + '\n')
+            f.write(html)
+        os.replace(temporal, ruta)  # nunca dejar una captura a medias
+        return ruta
+
+    def __iter__(self):
+        """Recorre (meta, html) de todas las capturas, en orden de nombre."""
+        for nombre in sorted(os.listdir(self.directorio)):
+            if not nombre.endswith('.html.gz'):
+                continue
+            with gzip.open(os.path.join(self.directorio, nombre), 'rt', encoding='utf-8') as f:
+                meta = json.loads(f.readline())
+                yield meta, f.read()
+
+
+def _texto(elem):
+    """Aproxima el innerText/.text de Selenium: texto visible, espacios colapsados."""
+    return ' '.join(elem.get_text(' ').split()) if elem is not None else ''
+
+
+def crudos_desde_html(html):
+    """Mismos crudos que GMBScraper.JS_FICHA, pero desde HTML guardado."""
+    soup = BeautifulSoup(html, PARSER_HTML)
+
+    panel = None
+    for m in soup.select('div[role="main"]'):
+        if (m.get('aria-label') or '') not in parseo.TITULOS_LISTADO:
+            panel = m
+    alcance = panel or soup
+
+    def uno(selector):
+        return alcance.select_one(selector)
+
+    def todos(selector):
+        return alcance.select(selector)
+
+    nombres = []
+    for selector in parseo.SELECTORES_NOMBRE:
+        if selector == 'h1':
+            nombres.append([_texto(h) for h in soup.select('h1')])
+        else:
+            nombres.append([_texto(soup.select_one(selector))])
+
+    web = uno('a[data-item-id="authority"]')
+    categoria = uno('button[jsaction*="category"]')
+    direccion = uno('button[data-item-id="address"]')
+    telefono = uno('button[data-item-id*="phone"]')
+
+    return {
+        'panel': panel is not None,
+        'nombres': nombres,
+        'f7nice': [_texto(e) for e in todos('div.F7nice')],
+        'estrellas': [e.get('aria-label') for e in todos('span[role="img"][aria-label]')],
+        'arias': [e.get('aria-label') for e in todos('[aria-label]')],
+        'direccion': direccion.get('aria-label') if direccion is not None else None,
+        'telefono': telefono.get('aria-label') if telefono is not None else None,
+        'web': web.get('href') if web is not None else None,
+        'categoria': _texto(categoria) if categoria is not None else None,
+        'horarios_aria': [[e.get('aria-label') for e in todos(sel)]
+                          for sel in parseo.SELECTORES_HORARIO_ARIA],
+        'horarios_texto': [[_texto(e) for e in todos(sel)]
+                           for sel in parseo.SELECTORES_HORARIO_TEXTO],
+        'texto_panel': alcance.get_text('\n'),
+        'mailtos': [e.get('href') for e in todos('a[href^="mailto:"]')],
+    }
+
+
+def ficha_desde_snapshot(meta, html):
+    """Registro con el esquema de salida del scraper a partir de una captura.
+
+    Devuelve (registro, emails_de_la_ficha); los emails de la web del negocio
+    no estan en la captura y los agrega quien llama, si quiere.
+    """
+    campos, emails = parseo.campos_desde_crudos(crudos_desde_html(html))
+    registro = {'location': meta.get('location', ''), 'timestamp': meta.get('timestamp', '')}
+    registro.update(campos)
+    registro['emails'] = []
+    registro['email'] = 'N/A'
+    registro['place_id'] = meta.get('place_id', '')
+
+    # location es "distrito, provincia, departamento" (ver search_location)
+    partes = [p.strip() for p in registro['location'].split(',')]
+    if len(partes) == 3:
+        registro['department'] = partes[2]
+        registro['province'] = partes[1]
+        registro['district'] = partes[0]
+    registro['search_keyword'] = meta.get('query', '')
+    return registro, emails
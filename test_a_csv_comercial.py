@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Pruebas de a_csv_comercial.py: solo se agregan prospectos nuevos."""
+import csv
+import os
+import sys
+
+import pytest
+
+import a_csv_comercial
+from a_csv_comercial import anexar, clave_negocio, normalizar_telefono
+from salidas import agregar_jsonl
+
+
+def negocio(n, **extra):
+    reg = {'name': f'Negocio {n}', 'phone': f'983 436 {n:03d}', 'website': 'N/A',
+           'email': 'N/A', 'rating': 4.5, 'review_count': 10, 'category': 'Contable',
+           'district': 'Surco', 'province': 'Lima'}
+    reg.update(extra)
+    return reg
+
+
+def convertir(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['a_csv_comercial.py', *args])
+    assert a_csv_comercial.main() == 0
+
+
+def filas(ruta):
+    with open(ruta, encoding='utf-8-sig', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_telefono_y_clave():
+    assert normalizar_telefono('+51 983 436 614') == '983436614'
+    assert normalizar_telefono('N/A') == ''
+    assert clave_negocio('X', '983436614', '') == 'tel:983436614'
+    assert clave_negocio('X', '', 'https://www.estudio.pe/contacto') == 'web:estudio.pe'
+    assert clave_negocio('Estudio X', '', 'N/A') == 'nom:estudio x'
+
+
+@pytest.mark.parametrize('indice', [False, True])
+def test_agrega_solo_lo_nuevo_sin_tocar_lo_trabajado(tmp_path, monkeypatch, indice):
+    entrada = str(tmp_path / 'campana.jsonl')
+    salida = str(tmp_path / 'cola.csv')
+    extra = ['--indice'] if indice else []
+    agregar_jsonl(entrada, [negocio(1), negocio(2), negocio(2)])
+    convertir(monkeypatch, entrada, '--salida', salida, *extra)
+    assert [f['WhatsApp'] for f in filas(salida)] == ['983436001', '983436002']
+
+    # El equipo comercial trabaja la cola a mano
+    actuales = filas(salida)
+    actuales[0]['Estado'] = 'Contactado'
+    with open(salida, 'w', newline='', encoding='utf-8-sig') as f:
+        escritor = csv.DictWriter(f, fieldnames=a_csv_comercial.COLUMNAS)
+        escritor.writeheader()
+        escritor.writerows(actuales)
+
+    agregar_jsonl(entrada, [negocio(3)])
+    convertir(monkeypatch, entrada, '--salida', salida, *extra)
+    resultado = filas(salida)
+    assert [f['WhatsApp'] for f in resultado] == ['983436001', '983436002', '983436003']
+    assert resultado[0]['Estado'] == 'Contactado' and resultado[2]['Estado'] == 'Nuevo'
+    assert not os.path.exists(salida + '.tmp')
+
+
+def test_destino_con_columnas_viejas_se_reescribe(tmp_path, monkeypatch):
+    entrada = str(tmp_path / 'campana.jsonl')
+    salida = str(tmp_path / 'cola.csv')
+    with open(salida, 'w', newline='', encoding='utf-8-sig') as f:
+        f.write('Nombre,WhatsApp,Estado\r\nViejo,999999999,Cerrado\r\n')
+    agregar_jsonl(entrada, [negocio(1)])
+    convertir(monkeypatch, entrada, '--salida', salida)
+
+    resultado = filas(salida)
+    assert list(resultado[0]) == a_csv_comercial.COLUMNAS
+    assert [(f['Nombre'], f['Estado']) for f in resultado] == [('Viejo', 'Cerrado'),
+                                                               ('Negocio 1', 'Nuevo')]
+
+
+def test_anexar_deja_el_destino_como_estaba_si_falla(tmp_path, monkeypatch):
+    destino = tmp_path / 'cola.csv'
+    destino.write_bytes(b'a,b\r\n1,2')
+    temporal = tmp_path / 'cola.csv.tmp'
+    temporal.write_bytes(b'3,4\r\n')
+
+    def copia_rota(origen, hacia):
+        hacia.write(b'3,')
+        raise OSError('disco lleno')
+
+    monkeypatch.setattr(a_csv_comercial.shutil, 'copyfileobj', copia_rota)
+    with pytest.raises(OSError):
+        anexar(str(destino), str(temporal))
+    assert destino.read_bytes() == b'a,b\r\n1,2'
+    assert not temporal.exists()
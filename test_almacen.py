@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Pruebas de almacen.py: upsert por negocio, observaciones y exportacion."""
+import csv
+import os
+import sys
+from datetime import datetime
+
+from almacen import AlmacenLeads, main
+from salidas import leer_registros
+
+
+def negocio(n, **extra):
+    reg = {'place_id': f'0x{n}:0x1', 'name': f'Negocio {n}', 'address': f'Av {n}',
+           'rating': 4.5, 'review_count': 10, 'phone': '01 1234567', 'website': 'N/A',
+           'district': 'Surco', 'search_keyword': 'contador', 'category': 'Contable',
+           'emails': [], 'email': 'N/A', 'timestamp': '2024-05-01T10:00:00'}
+    reg.update(extra)
+    return reg
+
+
+def test_upsert_no_pisa_con_vacios_y_guarda_cada_observacion(tmp_path):
+    almacen = AlmacenLeads(str(tmp_path / 'leads.sqlite'))
+    campana = almacen.abrir_campana('prueba', tope=10)
+    assert almacen.guardar([negocio(1), negocio(2, emails=['a@dos.pe'])], campana) == 2
+
+    # Mismo negocio otro dia: rating nuevo, telefono vacio, un email mas
+    otra_vez = negocio(1, rating=4.7, review_count=12, phone='N/A',
+                       email='info@uno.pe', timestamp='2024-06-01T10:00:00')
+    assert almacen.guardar([otra_vez], campana) == 0
+    # Reaplicar el mismo lote (diario) no duplica la observacion
+    assert almacen.guardar([otra_vez], campana) == 0
+    almacen.cerrar_campana(campana)
+
+    uno = next(r for r in almacen.registros() if r['place_id'] == '0x1:0x1')
+    assert uno['rating'] == 4.7 and uno['review_count'] == 12
+    assert uno['phone'] == '01 1234567' and uno['website'] == 'N/A'
+    assert uno['emails'] == ['info@uno.pe'] and uno['timestamp'] == '2024-06-01T10:00:00'
+    assert almacen.resumen() == {'negocios': 2, 'observaciones': 3, 'con_email': 2, 'campanas': 1}
+    almacen.cerrar()
+
+
+def test_sin_place_id_la_clave_es_nombre_y_direccion(tmp_path):
+    almacen = AlmacenLeads(str(tmp_path / 'leads.sqlite'))
+    assert almacen.guardar([negocio(1, place_id='', name='Estudio X', address='Av 1')]) == 1
+    assert almacen.guardar([negocio(1, place_id='', name='ESTUDIO X', address='AV 1',
+                                    timestamp='2024-07-01T10:00:00')]) == 0
+    assert [r['place_id'] for r in almacen.registros()] == ['estudio x|av 1']
+    almacen.cerrar()
+
+
+def test_filtros_y_exportacion(tmp_path):
+    ruta = str(tmp_path / 'leads.sqlite')
+    almacen = AlmacenLeads(ruta)
+    c1 = almacen.abrir_campana('una')
+    c2 = almacen.abrir_campana('otra')
+    almacen.guardar([negocio(1), negocio(2, district='Lince')], c1)
+    almacen.guardar([negocio(3, search_keyword='abogado', emails=['b@tres.pe', 'a@tres.pe'])], c2)
+
+    assert [r['name'] for r in almacen.registros(distrito='Surco')] == ['Negocio 3', 'Negocio 1']
+    assert [r['name'] for r in almacen.registros(rubro='abogado')] == ['Negocio 3']
+    assert [r['name'] for r in almacen.registros(campana=c1)] == ['Negocio 2', 'Negocio 1']
+
+    destino = str(tmp_path / 'surco.csv')
+    assert almacen.exportar_csv(destino, distrito='Surco') == 2
+    with open(destino, encoding='utf-8-sig', newline='') as f:
+        filas = list(csv.DictReader(f))
+    assert filas[0]['emails'] == 'a@tres.pe; b@tres.pe' and filas[0]['email'] == 'a@tres.pe'
+    almacen.cerrar()
+
+    # El almacen tambien es una entrada valida para a_csv_comercial.py
+    assert len(list(leer_registros(ruta))) == 3
+
+
+def test_leer_registros_cierra_el_almacen(tmp_path, monkeypatch):
+    ruta = str(tmp_path / 'leads.sqlite')
+    almacen = AlmacenLeads(ruta)
+    almacen.guardar([negocio(1), negocio(2)])
+    almacen.cerrar()
+
+    cerrados = []
+    cerrar = AlmacenLeads.cerrar
+    monkeypatch.setattr(AlmacenLeads, 'cerrar', lambda self: (cerrados.append(1), cerrar(self)))
+    lector = leer_registros(ruta)
+    next(lector)
+    lector.close()    # quien lee corta a mitad de camino
+    assert len(list(leer_registros(ruta))) == 2
+    assert cerrados == [1, 1]
+
+
+def test_importar_dos_veces_un_csv_sin_timestamp_no_duplica(tmp_path, monkeypatch):
+    entrada = tmp_path / 'viejo.csv'
+    with open(entrada, 'w', newline='', encoding='utf-8-sig') as f:
+        escritor = csv.DictWriter(f, fieldnames=['place_id', 'name', 'address', 'district'])
+        escritor.writeheader()
+        escritor.writerow({'place_id': '0x1:0x1', 'name': 'Uno', 'address': 'Av 1',
+                           'district': 'Surco'})
+    ruta = str(tmp_path / 'leads.sqlite')
+    for _ in range(2):
+        monkeypatch.setattr(sys, 'argv', ['almacen.py', ruta, '--importar', str(entrada)])
+        assert main() == 0
+
+    leads = AlmacenLeads(ruta)
+    assert leads.resumen()['observaciones'] == 1
+    visto = datetime.fromtimestamp(os.path.getmtime(entrada)).isoformat(timespec='seconds')
+    assert [r['timestamp'] for r in leads.registros()] == [visto]
+    leads.cerrar()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Pruebas de cache_web.py: clave por dominio, TTL y revalidacion por ETag."""
+import os
+
+import pytest
+import requests
+
+from cache_web import (CacheHTTP, HostNoDisponible, MemoEmailsDominio, dominio_registrable,
+                       normalizar_url)
+
+
+class Respuesta:
+    def __init__(self, status_code, text='', url='', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.url = url
+        self.headers = headers or {}
+
+
+class Sesion:
+    """Responde en orden lo que se le carga y anota los headers de cada GET."""
+
+    def __init__(self, *respuestas):
+        self.respuestas = list(respuestas)
+        self.pedidos = []
+
+    def get(self, url, headers=None, timeout=None, verify=True):
+        self.pedidos.append((url, dict(headers or {})))
+        respuesta = self.respuestas.pop(0)
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        respuesta.url = respuesta.url or url
+        return respuesta
+
+
+def test_dominio_registrable():
+    assert dominio_registrable('https://www.cadena.com.pe/sucursal') == 'cadena.com.pe'
+    assert dominio_registrable('http://lima.sucursal.cadena.com.pe') == 'cadena.com.pe'
+    assert dominio_registrable('estudio.pe/contacto') == 'estudio.pe'
+    assert dominio_registrable('https://Blog.Ejemplo.COM/') == 'ejemplo.com'
+    assert dominio_registrable('http://192.168.0.10/web') == '192.168.0.10'
+    # Plataformas compartidas: cada negocio es su subdominio o su ruta
+    assert dominio_registrable('https://minegocio.wixsite.com/tienda') == 'minegocio.wixsite.com/tienda'
+    assert dominio_registrable('https://www.facebook.com/EstudioX/about') == 'facebook.com/estudiox'
+    assert dominio_registrable('https://www.facebook.com/') == 'facebook.com'
+
+
+def test_normalizar_url():
+    assert (normalizar_url('HTTP://Web.pe:80/contacto/?b=2&a=1&utm_source=x#form')
+            == 'http://web.pe/contacto?a=1&b=2')
+    assert normalizar_url('https://web.pe') == 'https://web.pe/'
+
+
+def test_fresca_se_sirve_sin_red(tmp_path):
+    cache = CacheHTTP(str(tmp_path / 'cache.sqlite'))
+    sesion = Sesion(Respuesta(200, 'hola', headers={'ETag': '"v1"'}))
+    assert cache.obtener(sesion, 'https://web.pe/').text == 'hola'
+
+    r = cache.obtener(sesion, 'https://web.pe/?utm_campaign=x')
+    assert r.desde_cache and r.text == 'hola'
+    assert len(sesion.pedidos) == 1
+    assert cache.fresca('https://web.pe/')
+    assert cache.resumen()['aciertos'] == 1
+    cache.cerrar()
+
+
+def test_vencida_se_revalida_con_etag(tmp_path):
+    cache = CacheHTTP(str(tmp_path / 'cache.sqlite'), ttl=0)
+    sesion = Sesion(Respuesta(200, 'hola', headers={'ETag': '"v1"', 'Last-Modified': 'ayer'}),
+                    Respuesta(304),
+                    Respuesta(200, 'cambio'))
+    cache.obtener(sesion, 'https://web.pe/')
+    assert not cache.fresca('https://web.pe/')
+
+    r = cache.obtener(sesion, 'https://web.pe/')
+    assert r.desde_cache and r.text == 'hola'
+    assert sesion.pedidos[1][1] == {'If-None-Match': '"v1"', 'If-Modified-Since': 'ayer'}
+    assert cache.revalidadas == 1
+
+    assert cache.obtener(sesion, 'https://web.pe/').text == 'cambio'
+    cache.cerrar()
+
+
+def test_host_caido_queda_castigado(tmp_path):
+    cache = CacheHTTP(str(tmp_path / 'cache.sqlite'))
+    sesion = Sesion(requests.Timeout('lento'), Respuesta(503))
+    with pytest.raises(requests.Timeout):
+        cache.obtener(sesion, 'https://lento.pe/')
+    with pytest.raises(HostNoDisponible):
+        cache.obtener(sesion, 'https://lento.pe/contacto')
+
+    assert cache.obtener(sesion, 'https://roto.pe/').status_code == 503
+    with pytest.raises(HostNoDisponible):
+        cache.obtener(sesion, 'https://roto.pe/')
+    assert len(sesion.pedidos) == 2 and cache.resumen()['hosts_evitados'] == 2
+    cache.cerrar()
+
+
+def test_al_pasar_el_tope_recorta_lo_menos_usado_con_margen(tmp_path):
+    ruta = str(tmp_path / 'cache.sqlite')
+    cache = CacheHTTP(ruta)
+    cache.max_bytes = 10_500
+    paginas = [os.urandom(1000).hex() for _ in range(11)]   # ~1,1 KB cada una, comprimida
+    sesion = Sesion(*(Respuesta(200, texto) for texto in paginas + paginas[:1]))
+    for i in range(9):
+        cache.obtener(sesion, f'https://web{i}.pe/')
+    cache.obtener(sesion, 'https://web0.pe/?utm_source=x')   # web0 vuelve a usarse
+    assert len(sesion.pedidos) == 9
+
+    def guardadas():
+        return {c for (c,) in cache._db.execute('SELECT clave FROM respuestas')}
+
+    def total():
+        return cache._db.execute('SELECT SUM(bytes) FROM respuestas').fetchone()[0]
+
+    cache.obtener(sesion, 'https://web9.pe/')
+    assert cache._bytes == total() <= cache.max_bytes * CacheHTTP.RECORTE
+    # Se fue lo menos usado, no lo recien pedido
+    assert {'https://web1.pe/', 'https://web2.pe/'}.isdisjoint(guardadas())
+    assert {'https://web0.pe/', 'https://web9.pe/'} <= guardadas()
+
+    # El margen deja lugar: la siguiente descarga no vuelve a recortar
+    cache.obtener(sesion, 'https://web10.pe/')
+    assert len(guardadas()) == 9 and cache._bytes == total()
+
+    # Reemplazar una entrada no la cuenta dos veces, y el total sobrevive al reabrir
+    cache.ttl = 0
+    cache.obtener(sesion, 'https://web0.pe/')
+    assert cache._bytes == total()
+    cache.cerrar()
+    reabierta = CacheHTTP(ruta)
+    assert reabierta._bytes == cache._bytes
+    reabierta.cerrar()
+
+
+def test_memo_por_dominio_y_ttl(tmp_path):
+    ruta = str(tmp_path / 'memo.sqlite')
+    memo = MemoEmailsDominio(ruta)
+    assert memo.obtener('https://cadena.com.pe/') is None
+    memo.guardar('https://cadena.com.pe/', ['info@cadena.com.pe'])
+    assert memo.obtener('https://sur.cadena.com.pe/local') == ['info@cadena.com.pe']
+    memo.cerrar()
+
+    # Otra corrida lo lee del SQLite; vencido, ya no sirve
+    assert MemoEmailsDominio(ruta).obtener('http://cadena.com.pe') == ['info@cadena.com.pe']
+    assert MemoEmailsDominio(ruta, ttl=0).obtener('http://cadena.com.pe') is None
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Pruebas de diario.py: recuperacion tras un corte a mitad de corrida."""
+import json
+import os
+
+from almacen import AlmacenLeads
+from diario import DiarioCampana
+from gmb_scraper_lite import GMBScraper
+from progreso import HistorialVistos, RegistroProgreso
+from salidas import leer_jsonl
+
+
+def negocio(n):
+    return {'place_id': f'0x{n}:0x1', 'name': f'Negocio {n}', 'address': f'Av {n}',
+            'rating': 4.5, 'district': 'Surco', 'search_keyword': 'rubro'}
+
+
+def abrir(tmp_path):
+    prefijo = str(tmp_path / 'campana')
+    registro = RegistroProgreso(str(tmp_path / 'progreso.jsonl'))
+    historial = HistorialVistos(str(tmp_path / 'vistos.jsonl'))
+    diario = DiarioCampana(GMBScraper(headless=True), prefijo, registro,
+                           historial=historial, checkpoint_cada=100)
+    return prefijo, registro, historial, diario
+
+
+def test_corte_antes_del_checkpoint_reaplica_y_recorta(tmp_path):
+    prefijo, _, historial, diario = abrir(tmp_path)
+    diario.confirmar('rubro', 'Lima', 'Lima', 'Surco', [negocio(1), negocio(2)], 'ok')
+    diario.checkpoint()
+    base_jsonl = os.path.getsize(f'{prefijo}.jsonl')
+    diario.confirmar('rubro', 'Lima', 'Lima', 'Lince', [negocio(3)], 'parcial')
+    historial.cerrar()
+
+    # Se corta aplicando un lote que no llego a confirmarse: la salida queda
+    # con bytes de mas y el diario con una confirmacion a medias
+    with open(f'{prefijo}.jsonl', 'a', encoding='utf-8') as f:
+        f.write(json.dumps(negocio(4)) + '\n{"place_id": "0x5')
+    with open(f'{prefijo}.csv', 'a', encoding='utf-8') as f:
+        f.write('0x4:0x1,Negocio 4,')
+    with open(diario.ruta, 'a', encoding='utf-8') as f:
+        f.write('{"tipo": "lote", "rubro": "rubro", "distr')
+
+    _, registro, historial, diario = abrir(tmp_path)
+    assert diario.recuperados == 1
+    nombres = [r['name'] for r in leer_jsonl(f'{prefijo}.jsonl')]
+    assert nombres == ['Negocio 1', 'Negocio 2', 'Negocio 3']
+    assert os.path.getsize(f'{prefijo}.jsonl') > base_jsonl
+    with open(f'{prefijo}.csv', encoding='utf-8-sig') as f:
+        assert [l.split(',')[0] for l in f.read().splitlines()] == \
+            ['place_id', '0x1:0x1', '0x2:0x1', '0x3:0x1']
+    assert registro.ya_hecha('rubro', 'Lima', 'Lima', 'Surco')
+    assert registro.hechas[registro.clave('rubro', 'Lima', 'Lima', 'Lince')]['estado'] == 'parcial'
+    assert historial.negocios == 3   # reaplicar no duplica el historial
+
+    # Tras recuperar, el diario vuelve a quedar solo con la base
+    with open(diario.ruta, encoding='utf-8') as f:
+        assert [json.loads(l)['tipo'] for l in f] == ['base']
+    historial.cerrar()
+
+
+def test_corte_sin_checkpoint_previo_recrea_la_salida(tmp_path):
+    prefijo, _, historial, diario = abrir(tmp_path)
+    diario.confirmar('rubro', 'Lima', 'Lima', 'Surco', [negocio(1)], 'ok')
+    historial.cerrar()
+
+    _, _, historial, diario = abrir(tmp_path)
+    assert diario.recuperados == 1
+    assert [r['name'] for r in leer_jsonl(f'{prefijo}.jsonl')] == ['Negocio 1']
+    historial.cerrar()
+
+
+def test_cierre_limpio_no_deja_nada_que_recuperar(tmp_path):
+    prefijo, _, historial, diario = abrir(tmp_path)
+    diario.confirmar('rubro', 'Lima', 'Lima', 'Surco', [negocio(1)], 'ok')
+    diario.cerrar()
+    historial.cerrar()
+
+    _, _, historial, diario = abrir(tmp_path)
+    assert diario.recuperados == 0
+    assert [r['name'] for r in leer_jsonl(f'{prefijo}.jsonl')] == ['Negocio 1']
+    historial.cerrar()
+
+
+def test_reaplicar_no_duplica_en_el_almacen(tmp_path):
+    almacen = AlmacenLeads(str(tmp_path / 'leads.sqlite'))
+    campana = almacen.abrir_campana('prueba')
+    prefijo = str(tmp_path / 'campana')
+    registro = RegistroProgreso(str(tmp_path / 'progreso.jsonl'))
+    diario = DiarioCampana(GMBScraper(headless=True), prefijo, registro,
+                           almacen=almacen, campana=campana, checkpoint_cada=100)
+    lote = [dict(negocio(1), timestamp='2024-05-01T10:00:00')]
+    diario.confirmar('rubro', 'Lima', 'Lima', 'Surco', lote, 'ok')
+
+    # Corte antes del checkpoint: al abrir se reaplica el mismo lote
+    diario = DiarioCampana(GMBScraper(headless=True), prefijo, registro,
+                           almacen=almacen, campana=campana, checkpoint_cada=100)
+    assert diario.recuperados == 1
+    assert almacen.resumen()['observaciones'] == 1
+    assert [r['place_id'] for r in almacen.registros(campana=campana)] == ['0x1:0x1']
+    almacen.cerrar()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""Pruebas de la etapa asincrona de emails, con una sesion HTTP falsa (sin red)."""
+import threading
+import time
+
+from cache_web import MemoEmailsDominio
+from enriquecedor_web import EnriquecedorEmails
+from gmb_scraper_lite import GMBScraper
+
+
+class Respuesta:
+    def __init__(self, url, text, status_code=200):
+        self.url = url
+        self.text = text
+        self.status_code = status_code
+
+
+class SesionFalsa:
+    """Responde desde un dict url -> html; las urls en `frenar` esperan a `soltar`."""
+
+    def __init__(self, paginas):
+        self.paginas = paginas
+        self.frenar = set()
+        self.soltar = threading.Event()
+        self.pedidas = []
+
+    def get(self, url, headers=None, timeout=None, verify=True):
+        self.pedidas.append(url)
+        if url in self.frenar:
+            self.soltar.wait(5)
+        if url not in self.paginas:
+            return Respuesta(url, '', 404)
+        return Respuesta(url, self.paginas[url])
+
+    def close(self):
+        pass
+
+
+def enriquecedor(paginas, **kw):
+    enr = EnriquecedorEmails(GMBScraper(headless=True), concurrencia=4, pausa_host=(0, 0), **kw)
+    enr.sesion = SesionFalsa(paginas)
+    return enr
+
+
+def test_completa_los_emails_de_la_web():
+    enr = enriquecedor({'https://a.pe/': '<p>ventas@a.pe</p>', 'https://b.pe/': '<p>sin nada</p>'})
+    try:
+        a = {'name': 'A', 'emails': [], 'email': 'N/A'}
+        b = {'name': 'B', 'emails': [], 'email': 'N/A'}
+        enr.encolar('pa', 'https://a.pe/', a)
+        enr.encolar('pb', 'https://b.pe/', b)
+        assert enr.esperar([a, b], timeout=10) == 0
+        assert a['emails'] == ['ventas@a.pe'] and a['email'] == 'ventas@a.pe'
+        assert b['emails'] == [] and b['email'] == 'N/A'
+        assert enr.procesadas == 2 and enr.con_email == 1
+    finally:
+        enr.cerrar()
+
+
+def test_sigue_a_la_pagina_de_contacto():
+    enr = enriquecedor({
+        'https://c.pe/': '<a href="/contacto">Contacto</a>',
+        'https://c.pe/contacto': '<a href="mailto:info@c.pe">escribenos</a>',
+    })
+    try:
+        ficha = {'name': 'C', 'emails': ['dueno@c.pe'], 'email': 'dueno@c.pe'}
+        enr.encolar('pc', 'https://c.pe/', ficha)
+        enr.esperar([ficha], timeout=10)
+        assert sorted(ficha['emails']) == ['dueno@c.pe', 'info@c.pe']
+    finally:
+        enr.cerrar()
+
+
+def test_ficha_abandonada_no_se_toca_despues():
+    enr = enriquecedor({'https://lenta.pe/': '<p>tarde@lenta.pe</p>'})
+    enr.sesion.frenar.add('https://lenta.pe/')
+    try:
+        ficha = {'name': 'L', 'emails': [], 'email': 'N/A'}
+        enr.encolar('pl', 'https://lenta.pe/', ficha)
+        assert enr.esperar([ficha], timeout=0.2) == 1
+        enr.sesion.soltar.set()
+        while enr.procesadas < 1:
+            time.sleep(0.05)
+        assert ficha['email'] == 'N/A' and ficha['emails'] == []
+    finally:
+        enr.cerrar()
+
+
+def test_sucursales_de_la_misma_cadena_salen_de_la_memo(tmp_path):
+    memo = MemoEmailsDominio(str(tmp_path / 'memo.sqlite'))
+    enr = enriquecedor({'https://cadena.pe/': '<p>info@cadena.pe</p>'}, memo=memo)
+    try:
+        fichas = [{'name': f'Sucursal {i}', 'emails': [], 'email': 'N/A'} for i in range(3)]
+        for i, ficha in enumerate(fichas):
+            enr.encolar(f'p{i}', 'https://cadena.pe/', ficha)
+        enr.esperar(fichas, timeout=10)
+        assert all(f['email'] == 'info@cadena.pe' for f in fichas)
+        assert enr.sesion.pedidas == ['https://cadena.pe/']
+        assert memo.consultas == 3 and memo.aciertos == 2
+    finally:
+        enr.cerrar()
+        memo.cerrar()
+
+
+def test_lo_que_bloquea_corre_fuera_del_loop(tmp_path):
+    hilos = []
+
+    class MemoAnotada(MemoEmailsDominio):
+        def obtener(self, url):
+            hilos.append(threading.current_thread().name)
+            return super().obtener(url)
+
+        def guardar(self, url, emails):
+            hilos.append(threading.current_thread().name)
+            return super().guardar(url, emails)
+
+    memo = MemoAnotada(str(tmp_path / 'memo.sqlite'))
+    enr = enriquecedor({'https://d.pe/': '<p>info@d.pe</p>'}, memo=memo)
+    parsear = enr.scraper._emails_from_html
+
+    def parsear_anotado(html):
+        hilos.append(threading.current_thread().name)
+        return parsear(html)
+
+    enr.scraper._emails_from_html = parsear_anotado
+    try:
+        ficha = {'name': 'D', 'emails': [], 'email': 'N/A'}
+        enr.encolar('pd', 'https://d.pe/', ficha)
+        enr.esperar([ficha], timeout=10)
+        assert ficha['email'] == 'info@d.pe'
+        assert len(hilos) == 3 and 'enriquecedor' not in hilos
+    finally:
+        enr.cerrar()
+        memo.cerrar()
+
+
+def test_no_abandona_una_ficha_a_mitad_de_completarla():
+    enr = enriquecedor({'https://e.pe/': '<p>a@e.pe</p>'})
+    asignar = enr.scraper.asignar_emails
+    adentro = threading.Event()
+
+    def asignar_lento(ficha, emails):
+        adentro.set()
+        time.sleep(0.3)
+        asignar(ficha, emails)
+
+    enr.scraper.asignar_emails = asignar_lento
+    try:
+        ficha = {'name': 'E', 'emails': [], 'email': 'N/A'}
+        enr.encolar('pe', 'https://e.pe/', ficha)
+        assert adentro.wait(5)
+        # Se vence la espera mientras se completa: se espera a que termine
+        assert enr.esperar([ficha], timeout=0) == 0
+        assert ficha['email'] == 'a@e.pe'
+    finally:
+        enr.cerrar()
+
+
+def test_fichas_que_nunca_se_esperan_no_quedan_pendientes():
+    enr = enriquecedor({'https://f.pe/': '<p>f@f.pe</p>'})
+    try:
+        for i in range(3):
+            enr.encolar(f'p{i}', 'https://f.pe/', {'name': f'F{i}', 'emails': [], 'email': 'N/A'})
+        while enr.procesadas < 3:
+            time.sleep(0.05)
+        assert enr._pendientes == {}
+    finally:
+        enr.cerrar()
+
+
+def test_cerrar_cierra_el_loop():
+    enr = enriquecedor({'https://lenta.pe/': '<p>tarde@lenta.pe</p>'})
+    enr.sesion.frenar.add('https://lenta.pe/')
+    enr.encolar('pl', 'https://lenta.pe/', {'name': 'L', 'emails': [], 'email': 'N/A'})
+    enr.cerrar()
+    enr.sesion.soltar.set()
+    assert not enr._hilo.is_alive() and enr._loop.is_closed()
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""Pruebas de navegador.py sin Chrome real: driver, arranque, procesos y modo ligero."""
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import navegador
+from gmb_scraper_lite import GMBScraper
+
+
+@pytest.fixture
+def sin_driver(tmp_path, monkeypatch):
+    """Sin ruta fija, sin cache anotada y sin chromedriver en el PATH."""
+    monkeypatch.delenv('CHROMEDRIVER', raising=False)
+    monkeypatch.setattr(navegador, 'RUTA_CACHE_DRIVER', str(tmp_path / 'cache' / 'chromedriver.txt'))
+    monkeypatch.setattr(navegador, '_ruta_driver', None)
+    monkeypatch.setattr(navegador.shutil, 'which', lambda nombre: None)
+    return tmp_path
+
+
+def ejecutable(ruta):
+    ruta.write_text('#!/bin/sh\n', encoding='utf-8')
+    ruta.chmod(0o755)
+    return str(ruta)
+
+
+def test_ruta_fija_primero(sin_driver, monkeypatch):
+    fija = ejecutable(sin_driver / 'fijo')
+    assert navegador.resolver_chromedriver(fija) == (fija, 'fija')
+    monkeypatch.setenv('CHROMEDRIVER', fija)
+    assert navegador.resolver_chromedriver() == (fija, 'fija')
+    with pytest.raises(FileNotFoundError):
+        navegador.resolver_chromedriver(str(sin_driver / 'no-existe'))
+
+
+def test_cache_anotada_antes_que_el_path(sin_driver, monkeypatch):
+    anotado = ejecutable(sin_driver / 'anotado')
+    del_path = ejecutable(sin_driver / 'del-path')
+    monkeypatch.setattr(navegador.shutil, 'which', lambda nombre: del_path)
+
+    assert navegador.resolver_chromedriver() == (del_path, 'path')
+    monkeypatch.setattr(navegador, '_ruta_driver', None)
+    navegador._anotar_cache_driver(anotado)
+    assert navegador.resolver_chromedriver() == (anotado, 'cache')
+
+    # Chrome se actualizo: se olvida la anotada y se vuelve a buscar
+    navegador.olvidar_chromedriver()
+    assert not os.path.exists(navegador.RUTA_CACHE_DRIVER)
+    assert navegador.resolver_chromedriver() == (del_path, 'path')
+
+
+def test_cache_anotada_que_ya_no_existe_se_ignora(sin_driver, monkeypatch):
+    navegador._anotar_cache_driver(str(sin_driver / 'borrado'))
+    del_path = ejecutable(sin_driver / 'del-path')
+    monkeypatch.setattr(navegador.shutil, 'which', lambda nombre: del_path)
+    assert navegador.resolver_chromedriver() == (del_path, 'path')
+
+
+def test_puerto_abierto():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        s.listen()
+        puerto = s.getsockname()[1]
+        assert navegador.puerto_abierto(puerto)
+    assert not navegador.puerto_abierto(puerto)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='el Chrome falso es un script de shell')
+def test_arrancar_chrome_deja_el_puerto_escuchando(tmp_path, monkeypatch):
+    # "Chrome" falso: anota sus argumentos y escucha en el puerto de depuracion
+    falso = tmp_path / 'chrome'
+    falso.write_text(f'''#!{sys.executable}
+import json, os, socket, sys, time
+puerto = int(next(a for a in sys.argv if a.startswith('--remote-debugging-port=')).split('=')[1])
+with open({str(tmp_path / 'args.json')!r}, 'w') as f:
+    json.dump({{'argv': sys.argv[1:], 'pid': os.getpid()}}, f)
+s = socket.socket()
+s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+s.bind(('127.0.0.1', puerto))
+s.listen()
+time.sleep(30)
+''', encoding='utf-8')
+    falso.chmod(0o755)
+    monkeypatch.setenv('CHROME', str(falso))
+    assert navegador.buscar_chrome() == str(falso)
+
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        puerto = s.getsockname()[1]
+    perfil = tmp_path / 'perfiles' / 'worker1'
+    navegador.arrancar_chrome(puerto, str(perfil), ['--headless=new'], espera=10)
+    with open(tmp_path / 'args.json', encoding='utf-8') as f:
+        lanzado = json.load(f)
+    try:
+        assert perfil.is_dir()
+        assert f'--remote-debugging-port={puerto}' in lanzado['argv']
+        assert f'--user-data-dir={perfil}' in lanzado['argv']
+        assert lanzado['argv'][-2:] == ['--headless=new', 'about:blank']
+        # En su propia sesion: el Ctrl+C de la corrida no le llega
+        assert os.getsid(lanzado['pid']) == lanzado['pid']
+    finally:
+        os.kill(lanzado['pid'], signal.SIGTERM)
+
+
+def test_patrones_de_bloqueo_no_tocan_lo_que_arma_la_ficha():
+    patrones = navegador.patrones_bloqueo(['*google.com/maps*', '*.svg*', '*.png*'])
+    assert '*google.com/maps*' not in patrones   # bloquearia el listado: se descarta
+    assert '*.svg*' in patrones
+    assert patrones.count('*.png*') == 1
+    for patron in patrones:
+        regex = navegador._patron_regex(patron)
+        assert not any(regex.fullmatch(url) for url in navegador.PERMITIDOS), patron
+
+
+def test_patrones_de_bloqueo_atrapan_lo_pesado():
+    patrones = [navegador._patron_regex(p) for p in navegador.patrones_bloqueo()]
+    for url in ('https://www.google.com/maps/vt?pb=!1m5', 'https://lh5.googleusercontent.com/p/AF1Q=w408',
+                'https://fonts.gstatic.com/s/roboto.woff2', 'https://www.google.com/gen_204?atyp=i',
+                'https://www.googletagmanager.com/gtag/js?id=G-1'):
+        assert any(r.fullmatch(url) for r in patrones), url
+
+
+def test_bloquear_recursos_por_cdp():
+    class DriverFalso:
+        def __init__(self):
+            self.comandos = []
+
+        def execute_cdp_cmd(self, comando, parametros):
+            self.comandos.append((comando, parametros))
+
+    driver = DriverFalso()
+    navegador.bloquear_recursos(driver, ('*.png*', '*.jpg*'))
+    assert driver.comandos == [('Network.enable', {}),
+                               ('Network.setBlockedURLs', {'urls': ['*.png*', '*.jpg*']})]
+
+
+def tabla_falsa(monkeypatch, tabla):
+    monkeypatch.setattr(navegador, '_tabla_procesos',
+                        lambda: {pid: (ppid, tuple(comando.split()))
+                                 for pid, (ppid, comando) in tabla.items()})
+
+
+def test_procesos_navegador_sigue_a_los_descendientes(monkeypatch):
+    tabla_falsa(monkeypatch, {
+        100: (1, 'chromedriver --port=9515'),
+        101: (100, 'chrome --user-data-dir=/p/worker1 --remote-debugging-port=9222'),
+        102: (101, 'chrome --type=renderer'),
+        103: (102, 'chrome --type=utility'),
+        200: (1, 'chrome --user-data-dir=/p/worker2'),
+        201: (200, 'chrome --type=renderer'),
+        300: (1, 'chrome --remote-debugging-port=9222 --user-data-dir=/p/suelto'),
+        301: (300, 'chrome --type=gpu-process'),
+    })
+    assert navegador.procesos_navegador(pid_driver=100) == {100, 101, 102, 103}
+    assert navegador.procesos_navegador(marcas=['--user-data-dir=/p/worker2']) == {200, 201}
+    assert navegador.procesos_navegador(marcas=['--remote-debugging-port=9222']) == \
+        {101, 102, 103, 300, 301}
+    assert navegador.procesos_navegador(marcas=['', None]) == set()
+
+
+def test_procesos_navegador_compara_argumentos_enteros(monkeypatch):
+    tabla_falsa(monkeypatch, {
+        100: (1, 'chrome --user-data-dir=/p/worker1 --remote-debugging-port=922'),
+        101: (100, 'chrome --type=renderer'),
+        200: (1, 'chrome --user-data-dir=/p/worker10 --remote-debugging-port=9220'),
+        201: (200, 'chrome --type=renderer'),
+    })
+    assert navegador.procesos_navegador(marcas=['--user-data-dir=/p/worker1']) == {100, 101}
+    assert navegador.procesos_navegador(marcas=['--remote-debugging-port=922']) == {100, 101}
+    assert navegador.procesos_navegador(marcas=['--user-data-dir=/p/worker10']) == {200, 201}
+
+
+def test_argumentos_de_una_linea_reescrita():
+    assert navegador._argumentos(['chrome', '--a=1', '']) == ('chrome', '--a=1')
+    assert navegador._argumentos(['chrome --type=renderer --a=1']) == \
+        ('chrome', '--type=renderer', '--a=1')
+
+
+def test_tabla_de_procesos_se_ve_a_si_misma():
+    if not (navegador.PSUTIL_AVAILABLE or os.path.isdir('/proc')):
+        pytest.skip('sin psutil ni /proc')
+    tabla = navegador._tabla_procesos()
+    ppid, argumentos = tabla[os.getpid()]
+    assert ppid == os.getppid() and any('pytest' in a for a in argumentos)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='usa un proceso de sleep de POSIX')
+def test_matar_procesos(tmp_path):
+    if not (navegador.PSUTIL_AVAILABLE or os.path.isdir('/proc')):
+        pytest.skip('sin psutil ni /proc')
+    # Un "chromedriver" colgado: sleep con otro nombre
+    driver = tmp_path / 'chromedriver-falso'
+    driver.symlink_to(shutil.which('sleep'))
+    colgado = subprocess.Popen([str(driver), '30'])
+    ajeno = subprocess.Popen(['sleep', '30'])
+    try:
+        procesos = navegador.identificar_procesos({colgado.pid, ajeno.pid, 2**22 + 7})
+        assert set(procesos) == {colgado.pid, ajeno.pid}
+        # Lo que no es de Chrome no se toca aunque se haya anotado
+        assert navegador.matar_procesos(procesos) == 1
+        assert colgado.wait(5) != 0 and ajeno.poll() is None
+        assert navegador.matar_procesos(procesos) == 0
+    finally:
+        ajeno.kill()
+        ajeno.wait()
+
+
+@pytest.mark.skipif(os.name == 'nt', reason='usa un proceso de sleep de POSIX')
+def test_matar_procesos_no_toca_un_pid_reusado(tmp_path):
+    if not (navegador.PSUTIL_AVAILABLE or os.path.isdir('/proc')):
+        pytest.skip('sin psutil ni /proc')
+    driver = tmp_path / 'chromedriver-falso'
+    driver.symlink_to(shutil.which('sleep'))
+    otro = subprocess.Popen([str(driver), '30'])
+    try:
+        inicio, comando = navegador.identificar_procesos({otro.pid})[otro.pid]
+        # Anotado antes con el mismo pid pero otro inicio: es otro proceso
+        assert navegador.matar_procesos({otro.pid: (inicio - 1, comando)}) == 0
+        assert otro.poll() is None
+    finally:
+        otro.kill()
+        otro.wait()
+
+
+def test_memoria_procesos():
+    if not navegador.puede_medir():
+        pytest.skip('sin psutil ni /proc')
+    assert navegador.memoria_procesos({os.getpid()}) > 2**20
+    # Los que terminaron entre la lista y la lectura no cuentan
+    assert navegador.memoria_procesos({2**22 + 7}) == 0
+
+
+def test_motivo_de_reciclaje(monkeypatch):
+    s = GMBScraper(headless=True)
+    monkeypatch.setattr(s, 'memoria_navegador', lambda: (900.0, 12))
+    assert s._motivo_reciclaje() is None
+
+    s.reciclar_fichas, s.fichas_driver = 50, 49
+    assert s._motivo_reciclaje() is None
+    s.fichas_driver = 50
+    assert s._motivo_reciclaje() == '50 fichas'
+
+    s.reciclar_fichas, s.reciclar_mb = None, 800
+    assert s._motivo_reciclaje() == '900 MB'
+    s.reciclar_mb = 1000
+    assert s._motivo_reciclaje() is None
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""Pruebas de parseo.FiltroEmails y de los parsers de texto de la ficha."""
+import parseo
+from gmb_scraper_lite import GMBScraper
+
+FILTRO = GMBScraper.FILTRO_EMAILS
+
+
+def test_dominio_que_solo_contiene_uno_basura_se_conserva():
+    # Antes se buscaba como subcadena: latest.com contiene test.com
+    assert FILTRO.filtrar(['ventas@latest.com', 'hola@myemail.com', 'a@contest.com.pe']) == \
+        ['ventas@latest.com', 'hola@myemail.com', 'a@contest.com.pe']
+
+
+def test_dominio_basura_subdominio_y_con_pais():
+    assert FILTRO.filtrar(['x@test.com', 'x@mail.sentry.io', 'x@o123.ingest.sentry.io',
+                           'x@example.com.pe', 'x@w3.org']) == []
+
+
+def test_locales_archivos_y_repetidos():
+    emails = [' Info@Estudio.pe. ', 'noreply@estudio.pe', 'logo@2x.png', 'info@estudio.pe',
+              'sin-arroba.pe', 'a@sinpunto', 'contacto@estudio.pe']
+    assert FILTRO.filtrar(emails) == ['info@estudio.pe', 'contacto@estudio.pe']
+
+
+def test_filtro_sin_locales():
+    filtro = parseo.FiltroEmails(['spam.pe'], [])
+    assert filtro.filtrar(['email@ok.pe', 'x@spam.pe', 'x@a.spam.pe']) == ['email@ok.pe']
+    assert not filtro.dominio_basura('nospam.pe')
+
+
+def test_parsers_de_texto():
+    assert parseo.rating_de_texto('4,8\n(1.204)') == 4.8
+    assert parseo.reviews_de_texto('4,8\n(1.204)') == 1204
+    assert parseo.place_id_de_href(
+        'https://www.google.com/maps/place/X/data=!4m7!3m6!1s0x9105c8:0x1a2b!8m2') == '0x9105c8:0x1a2b'
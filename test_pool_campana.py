@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Pruebas del pool de workers de correr_campana.py, con scrapers falsos (sin Chrome)."""
+import threading
+
+from gmb_scraper_lite import BloqueoDetectado, DriverCaido
+from pool_campana import CupoCompartido, EscritorLotes, PoolCampana
+from ritmo import ControlAdaptivo, Ritmo
+
+
+class ScraperFalso:
+    """Lo que el pool usa de un GMBScraper. `respuestas`: distrito -> cuantas
+    fichas devolver o excepcion a lanzar en search_location; una lista se va
+    consumiendo en cada intento y una tupla (n, 'incompleta') simula un error a
+    mitad de la busqueda."""
+
+    def __init__(self, respuestas=None, cupo=None, ritmo=None):
+        self.respuestas = respuestas or {}
+        self.cupo = cupo
+        self.ritmo = ritmo or Ritmo(escala=0)
+        self.pausa_entre_busquedas = (0, 0.01)
+        self.detener = None
+        self.cerrado = False
+        self.responde = True
+        self.reinicios = 0
+        self.busqueda_incompleta = False
+
+    def init_driver(self):
+        pass
+
+    def driver_responde(self):
+        return self.responde
+
+    def reiniciar_driver(self):
+        self.reinicios += 1
+        self.responde = True
+
+    def search_location(self, rubro, departamento, provincia, distrito, max_results=None):
+        respuesta = self.respuestas.get(distrito, max_results)
+        if isinstance(respuesta, list):
+            respuesta = respuesta.pop(0) if respuesta else max_results
+        if isinstance(respuesta, Exception):
+            raise respuesta
+        # (n, 'incompleta'): n fichas y un error a mitad de la busqueda
+        self.busqueda_incompleta = isinstance(respuesta, tuple)
+        if self.busqueda_incompleta:
+            respuesta = respuesta[0]
+        lote = []
+        for i in range(respuesta):
+            if self.cupo is not None and not self.cupo.reservar():
+                break
+            lote.append({'name': f'{rubro} {distrito} {i}'})
+        return lote
+
+    def close(self):
+        self.cerrado = True
+
+
+def correr_pool(pendientes, workers=2, por_busqueda=3, cupo=None, ritmo=None, **respuestas):
+    cupo = cupo or CupoCompartido()
+    ritmo = ritmo or Ritmo(escala=0, por_minuto=0, por_hora=0)
+    guardados = []
+    scrapers = []
+
+    def crear(n):
+        s = ScraperFalso(respuestas, cupo, ritmo)
+        scrapers.append(s)
+        return s
+
+    pool = PoolCampana(pendientes, crear, EscritorLotes(lambda *l: guardados.append(l)), cupo,
+                       'Lima', 'Lima', por_busqueda, workers=workers)
+    bloqueo = pool.correr()
+    return pool, bloqueo, guardados, scrapers
+
+
+def test_cupo_compartido_es_duro_entre_hilos():
+    cupo = CupoCompartido(50)
+    reservas = []
+
+    def reservar():
+        reservas.extend(cupo.reservar() for _ in range(40))
+
+    hilos = [threading.Thread(target=reservar) for _ in range(4)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert sum(reservas) == 50 and cupo.usadas == 50 and cupo.agotado
+    cupo.liberar()
+    assert not cupo.agotado and cupo.reservar()
+
+
+def test_escritor_guarda_en_orden_y_anota_el_error():
+    guardados = []
+
+    def guardar(rubro, distrito, lote, estado):
+        if distrito == 'roto':
+            raise OSError('disco lleno')
+        guardados.append(distrito)
+
+    escritor = EscritorLotes(guardar)
+    escritor.iniciar()
+    for distrito in ('a', 'b', 'roto', 'c'):
+        escritor.entregar('rubro', distrito, [], 'ok')
+    escritor.cerrar()
+    assert guardados == ['a', 'b', 'c']
+    assert isinstance(escritor.error, OSError)
+
+
+def test_reparte_todas_las_combinaciones():
+    pendientes = [('rubro', f'd{i}') for i in range(7)]
+    pool, bloqueo, guardados, scrapers = correr_pool(pendientes, workers=3)
+    assert bloqueo is None
+    assert sorted(g[1] for g in guardados) == sorted(d for _, d in pendientes)
+    assert all(len(g[2]) == 3 and g[3] == 'ok' for g in guardados)
+    assert len(scrapers) == 3 and all(s.cerrado for s in scrapers)
+
+
+def test_bloqueo_corta_a_todos():
+    pendientes = [('rubro', f'd{i}') for i in range(20)]
+    pool, bloqueo, guardados, _ = correr_pool(pendientes, workers=2,
+                                              d0=BloqueoDetectado('captcha'))
+    assert bloqueo == 'captcha'
+    assert pool.detener.is_set()
+    assert len(guardados) < len(pendientes)
+
+
+def test_tope_deja_la_combinacion_cortada_como_parcial():
+    pendientes = [('rubro', f'd{i}') for i in range(5)]
+    pool, _, guardados, _ = correr_pool(pendientes, workers=1, cupo=CupoCompartido(4))
+    assert pool.tope_alcanzado
+    assert [(g[1], len(g[2]), g[3]) for g in guardados] == [('d0', 3, 'ok'), ('d1', 1, 'parcial')]
+
+
+def test_worker_roto_no_tumba_a_los_demas():
+    pendientes = [('rubro', f'd{i}') for i in range(6)]
+    pool, bloqueo, guardados, _ = correr_pool(pendientes, workers=2, d2=RuntimeError('driver'))
+    assert bloqueo is None
+    assert 'd2' not in {g[1] for g in guardados}
+
+
+def test_navegador_caido_guarda_lo_extraido_y_reintenta():
+    pendientes = [('rubro', 'd0'), ('rubro', 'd1')]
+    caida = DriverCaido('chrome murio', parciales=[{'name': 'a salvo'}])
+    pool, bloqueo, guardados, scrapers = correr_pool(pendientes, workers=1, d0=[caida])
+    assert bloqueo is None
+    assert [(g[1], len(g[2]), g[3]) for g in guardados] == \
+        [('d0', 1, 'caida'), ('d1', 3, 'ok'), ('d0', 3, 'ok')]
+    assert pool.caidas == {('rubro', 'd0'): 1} and scrapers[0].reinicios == 1
+
+
+def test_sin_reintentos_la_combinacion_queda_para_la_proxima():
+    caidas = [DriverCaido('chrome murio') for _ in range(3)]
+    pool, _, guardados, _ = correr_pool([('rubro', 'd0')], workers=1, d0=caidas)
+    assert [g[3] for g in guardados] == ['caida'] * 3   # 1 + reintentos_caida
+    assert pool.caidas[('rubro', 'd0')] == 3
+
+
+def test_navegador_que_no_responde_se_relanza_antes_de_buscar():
+    creados = []
+
+    def crear(n):
+        s = ScraperFalso(cupo=CupoCompartido(), ritmo=Ritmo(escala=0, por_minuto=0, por_hora=0))
+        s.responde = False
+        creados.append(s)
+        return s
+
+    guardados = []
+    pool = PoolCampana([('rubro', 'd0')], crear, EscritorLotes(lambda *l: guardados.append(l)),
+                       CupoCompartido(), 'Lima', 'Lima', 2)
+    pool.correr()
+    assert creados[0].reinicios == 1 and [g[3] for g in guardados] == ['ok']
+
+
+def test_workers_frenados_no_cuelgan_la_corrida():
+    # Frenado: solo trabaja el worker 1; el 2 espera y termina con la cola vacia
+    control = ControlAdaptivo()
+    control.nivel = 2
+    ritmo = Ritmo(escala=0, por_minuto=0, por_hora=0, control=control)
+    pendientes = [('rubro', f'd{i}') for i in range(4)]
+    pool, bloqueo, guardados, _ = correr_pool(pendientes, workers=2, ritmo=ritmo)
+    assert bloqueo is None and len(guardados) == 4
+
+
+def test_worker_frenado_toma_la_cola_si_los_que_tenian_turno_terminaron():
+    control = ControlAdaptivo()
+    control.nivel = 2
+    ritmo = Ritmo(escala=0, por_minuto=0, por_hora=0, control=control)
+    guardados = []
+
+    def crear(n):
+        s = ScraperFalso(cupo=CupoCompartido(), ritmo=ritmo)
+        if n == 1:
+            def roto():
+                raise RuntimeError('chromedriver no arranca')
+            s.init_driver = roto
+        return s
+
+    pendientes = [('rubro', f'd{i}') for i in range(3)]
+    pool = PoolCampana(pendientes, crear, EscritorLotes(lambda *l: guardados.append(l)),
+                       CupoCompartido(), 'Lima', 'Lima', 2, workers=2)
+    pool.correr()
+    assert sorted(g[1] for g in guardados) == ['d0', 'd1', 'd2']
+
+
+def test_busqueda_incompleta_queda_parcial_con_lo_extraido():
+    _, bloqueo, guardados, _ = correr_pool([('rubro', 'd0'), ('rubro', 'd1')], workers=1,
+                                           d0=(2, 'incompleta'))
+    assert bloqueo is None
+    assert sorted((g[1], len(g[2]), g[3]) for g in guardados) == [('d0', 2, 'parcial'),
+                                                                  ('d1', 3, 'ok')]
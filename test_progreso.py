@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Pruebas de progreso.py: compactacion del registro, indice de claves e historial."""
+import json
+import os
+import threading
+
+from progreso import HistorialVistos, IndiceClaves, RegistroProgreso, VistosSesion
+
+
+def test_compacta_y_recarga_la_ultima_marca(tmp_path):
+    ruta = str(tmp_path / 'progreso.jsonl')
+    r = RegistroProgreso(ruta, compactar_desde=3)
+    r.marcar('inmobiliaria', 'Lima', 'Lima', 'Surco', 4, 'parcial')
+    r.marcar('inmobiliaria', 'Lima', 'Lima', 'Lince', 0)
+    assert r.en_cola == 2 and not os.path.exists(r.ruta_snapshot)
+    r.marcar('inmobiliaria', 'Lima', 'Lima', 'Surco', 10)   # la tercera compacta
+
+    assert r.en_cola == 0
+    assert os.path.getsize(ruta) == 0
+    with open(r.ruta_snapshot, encoding='utf-8') as f:
+        assert len(json.load(f)['hechas']) == 2
+
+    # Cola posterior a la foto: se aplica encima al arrancar
+    r.marcar('estudio contable', 'Lima', 'Lima', 'Surco', 1, 'caida')
+    otro = RegistroProgreso(ruta, compactar_desde=3)
+    assert otro.en_cola == 1
+    assert otro.ya_hecha('Inmobiliaria', 'Lima', 'Lima', 'Surco')
+    assert not otro.ya_hecha('estudio contable', 'Lima', 'Lima', 'Surco')
+    assert otro.resumen() == {'combinaciones': 3, 'fichas': 11, 'sin_resultados': 1, 'caidas': 1}
+
+
+def test_compacta_al_arrancar_con_cola_larga(tmp_path):
+    ruta = str(tmp_path / 'progreso.jsonl')
+    r = RegistroProgreso(ruta, compactar_desde=0)
+    for i in range(5):
+        r.marcar('rubro', 'Lima', 'Lima', 'Surco', i)
+    assert r.en_cola == 5
+
+    compactado = RegistroProgreso(ruta, compactar_desde=5)
+    assert compactado.en_cola == 0 and os.path.getsize(ruta) == 0
+    assert compactado.hechas[RegistroProgreso.clave('rubro', 'Lima', 'Lima', 'Surco')]['encontrados'] == 4
+
+
+def test_linea_a_medias_no_rompe_la_carga(tmp_path):
+    ruta = str(tmp_path / 'progreso.jsonl')
+    r = RegistroProgreso(ruta)
+    r.marcar('rubro', 'Lima', 'Lima', 'Surco', 2)
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write('{"clave": "rubro|lima|lima|li')   # corte a mitad de escritura
+
+    r = RegistroProgreso(ruta)
+    r.marcar('rubro', 'Lima', 'Lima', 'Lince', 3)
+    r = RegistroProgreso(ruta)
+    assert r.ya_hecha('rubro', 'Lima', 'Lima', 'Surco')
+    assert r.ya_hecha('rubro', 'Lima', 'Lima', 'Lince')
+
+
+def test_indice_claves(tmp_path):
+    indice = IndiceClaves(str(tmp_path / 'claves.sqlite'))
+    indice.agregar(['a', 'b', 'b'], bytes=10)
+    assert 'a' in indice and 'z' not in indice
+    assert len(indice) == 2
+    assert indice.meta('bytes') == 10 and indice.meta('otro', 7) == 7
+    indice.vaciar()
+    assert len(indice) == 0 and indice.meta('bytes') == 0
+    indice.cerrar()
+
+
+def test_historial_indexa_solo_lo_agregado_por_fuera(tmp_path):
+    ruta = str(tmp_path / 'vistos.jsonl')
+    h = HistorialVistos(ruta)
+    assert h.agregar([{'place_id': '0x1:0x1', 'name': 'Uno', 'address': 'Av 1'},
+                      {'place_id': '0x1:0x1', 'name': 'Uno', 'address': 'Av 1'}]) == 1
+    h.cerrar()
+
+    # Otra herramienta agrega al jsonl sin pasar por el indice
+    with open(ruta, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({'claves': ['0x2:0x2', 'dos|av 2']}) + '\n')
+    h = HistorialVistos(ruta)
+    assert h.negocios == 2
+    assert '0x2:0x2' in h.claves and 'uno|av 1' in h.claves
+    h.cerrar()
+
+    # Jsonl reemplazado por uno mas corto: el indice se reconstruye
+    with open(ruta, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'claves': ['0x3:0x3']}) + '\n')
+    h = HistorialVistos(ruta)
+    assert h.negocios == 1
+    assert '0x3:0x3' in h.claves and '0x1:0x1' not in h.claves
+    h.cerrar()
+
+
+def test_vistos_de_la_sesion_no_copian_el_historial(tmp_path):
+    h = HistorialVistos(str(tmp_path / 'vistos.jsonl'))
+    h.agregar([{'place_id': '0x1:0x1', 'name': 'Uno', 'address': 'Av 1'}])
+    vistos = VistosSesion(h, claves=['excluido'])
+    vistos.add('0x2:0x2')
+    assert '0x1:0x1' in vistos and 'excluido' in vistos and '0x2:0x2' in vistos
+    assert '0x3:0x3' not in vistos
+    assert vistos.memoria == {'excluido', '0x2:0x2'}
+    h.cerrar()
+
+
+def test_agregar_si_nuevo_deja_cada_clave_a_un_solo_worker(tmp_path):
+    h = HistorialVistos(str(tmp_path / 'vistos.jsonl'))
+    h.agregar([{'place_id': '0x1:0x1', 'name': 'Uno', 'address': 'Av 1'}])
+    vistos = VistosSesion(h)
+    assert not vistos.agregar_si_nuevo('0x1:0x1')   # ya estaba en el historial
+
+    claves = [f'0x{n}:0x9' for n in range(200)]
+    largada = threading.Barrier(8)
+    ganadas = []
+
+    def worker():
+        largada.wait()
+        ganadas.extend(c for c in claves if vistos.agregar_si_nuevo(c))
+
+    hilos = [threading.Thread(target=worker) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert sorted(ganadas) == sorted(claves)
+    h.cerrar()
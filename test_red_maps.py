@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""Pruebas de red_maps.py contra las fixtures de benchmarks/ y respuestas armadas a mano."""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import red_maps  # noqa: E402
+from servidor_fixtures import ServidorFixtures  # noqa: E402
+
+CAMPOS_VERIFICADOS = ['name', 'rating', 'review_count', 'address', 'phone',
+                      'website', 'category', 'hours']
+
+
+@pytest.fixture(scope='module')
+def servidor():
+    s = ServidorFixtures().iniciar()
+    yield s
+    s.cerrar()
+
+
+def test_cada_ficha_de_las_fixtures(servidor):
+    for slug, place_id, _, _ in servidor.fichas():
+        lugares = red_maps.lugares_de_respuesta(servidor.pagina_ficha(slug))
+        assert list(lugares) == [place_id]
+        campos = lugares[place_id]
+        esperado = servidor.esperado(slug)
+        if not servidor.por_slug[slug].get('horario'):
+            # Solo el estado ("Abierto ahora"): eso no viene en la respuesta
+            assert campos['hours'] == 'N/A'
+            esperado = dict(esperado, hours='N/A')
+        assert {c: campos[c] for c in CAMPOS_VERIFICADOS} == \
+            {c: esperado[c] for c in CAMPOS_VERIFICADOS}, slug
+        assert isinstance(campos['lat'], float) and isinstance(campos['lng'], float)
+
+
+def test_listado_trae_todos_los_negocios(servidor):
+    lugares = red_maps.lugares_de_respuesta(servidor.pagina_listado('estudio contable'))
+    assert set(lugares) == {place_id for _, place_id, _, _ in servidor.fichas()}
+
+
+def lugar(place_id, nombre, **posiciones):
+    datos = [None] * 40
+    datos[red_maps.POS_ID] = place_id
+    datos[red_maps.POS_NOMBRE] = nombre
+    for pos, valor in posiciones.items():
+        datos[int(pos[1:])] = valor
+    return datos
+
+
+def test_respuesta_con_prefijo_y_envoltorio_de_busqueda():
+    resumido = lugar('0xa:0x1', 'Estudio A')
+    completo = lugar('0xa:0x1', 'Estudio A', p4=[None] * 7 + [4.6, 31], p7=['https://a.pe'],
+                     p13=['Contador'], p39='Av. Arequipa 100, Lima')
+    otro = lugar('0xb:0x2', 'Estudio B', p2=['Jr. Lampa 5', 'Lima'])
+    cuerpo = red_maps.PREFIJO + json.dumps([None, [[resumido], [completo], [None, [otro]]]])
+
+    # La busqueda por scroll viene con el JSON como texto dentro de {"d": ...}
+    for texto in (cuerpo, json.dumps({'c': 0, 'd': cuerpo})):
+        lugares = red_maps.lugares_de_respuesta(texto)
+        assert set(lugares) == {'0xa:0x1', '0xb:0x2'}
+        a, b = lugares['0xa:0x1'], lugares['0xb:0x2']
+        assert (a['rating'], a['review_count'], a['website'], a['category'], a['address']) == \
+            (4.6, 31, 'https://a.pe', 'Contador', 'Av. Arequipa 100, Lima')
+        assert (b['address'], b['phone'], b['rating']) == ('Jr. Lampa 5, Lima', 'N/A', 0.0)
+
+
+def test_respuestas_sin_negocios():
+    assert red_maps.lugares_de_respuesta('') == {}
+    assert red_maps.lugares_de_respuesta('<html><body>nada</body></html>') == {}
+    assert red_maps.lugares_de_respuesta(red_maps.PREFIJO + '[1, "x", [2') == {}
+    assert red_maps.lugares_de_respuesta(json.dumps([['no-es-id', 'Nombre']])) == {}
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Pruebas de ritmo.py y de su control adaptativo (sin navegador)."""
+import threading
+import time
+
+from ritmo import ControlAdaptivo, Ritmo
+
+
+def test_no_duerme_si_la_carga_ya_se_comio_el_presupuesto():
+    r = Ritmo(presupuestos={'ficha': (0.05, 0.05)})
+    r.completar('ficha', time.monotonic() - 1)
+    assert r.segundos_relleno == 0
+    r.completar('ficha', time.monotonic())
+    assert 0 < r.segundos_relleno <= 0.05
+
+
+def test_escala_cero_no_pausa():
+    r = Ritmo(escala=0)
+    inicio = time.monotonic()
+    r.pausa('entre_busquedas')
+    r.completar('listado', time.monotonic())
+    assert time.monotonic() - inicio < 0.1 and r.segundos_relleno == 0
+
+
+def test_esperar_listo_devuelve_la_senal():
+    r = Ritmo(presupuestos={'ficha': (0, 0)}, intervalo=0.01)
+    llamadas = []
+
+    def lista():
+        llamadas.append(1)
+        return len(llamadas) >= 3
+
+    assert r.esperar_listo(lista, 'ficha', time.monotonic(), timeout=1)
+    assert len(llamadas) == 3
+
+    def rota():
+        raise RuntimeError('driver')
+
+    assert not r.esperar_listo(rota, 'ficha', time.monotonic(), timeout=0.05)
+
+
+def test_turno_respeta_el_balde_por_minuto():
+    r = Ritmo(por_minuto=3, por_hora=0)
+    assert all(r.turno() for _ in range(3))
+    assert r.navegaciones == 3
+
+    # El cuarto tendria que esperar ~20 s: solo se comprueba que no pasa
+    detener = threading.Event()
+    hilo = threading.Thread(target=r.turno, args=(detener,), daemon=True)
+    hilo.start()
+    hilo.join(0.3)
+    assert hilo.is_alive() and r.navegaciones == 3
+    detener.set()
+    hilo.join(2)
+    assert not hilo.is_alive() and r.navegaciones == 3
+
+
+def test_sube_de_a_un_nivel_con_muros_de_consentimiento():
+    c = ControlAdaptivo(minimo=5)
+    estados = []
+    for _ in range(12):
+        c.observar_busqueda('consentimiento')
+        estados.append(c.estado)
+    # Nunca salta de normal a frenado, y espera `minimo` observaciones entre cambios
+    assert estados[:4] == ['normal'] * 4
+    assert estados[4] == 'precaucion'
+    assert 'frenado' in estados and estados.index('frenado') - estados.index('precaucion') >= 5
+    assert c.cambios == 2
+
+
+def test_baja_tras_observaciones_limpias():
+    c = ControlAdaptivo(minimo=5, limpias=15)
+    for _ in range(10):
+        c.observar_busqueda('consentimiento')
+    assert c.estado == 'frenado'
+
+    # Los muros siguen en la ventana de busquedas: hasta que salen no hay racha limpia
+    for _ in range(10):
+        c.observar_busqueda('ok')
+    assert c.estado == 'frenado'
+    for _ in range(15):
+        c.observar_busqueda('ok')
+    assert c.estado == 'precaucion'
+    for _ in range(15):
+        c.observar_busqueda('ok')
+    assert c.estado == 'normal'
+    assert c.riesgo() == 0.0
+
+
+def test_cargas_lentas_contra_la_mejor_mediana():
+    c = ControlAdaptivo()
+    for _ in range(30):
+        c.observar_carga('ficha', 1.0, True)
+    assert c.estado == 'normal' and c.riesgo() == 0.0
+    for _ in range(20):
+        c.observar_carga('ficha', 5.0, True)
+    assert c.estado == 'frenado'
+
+
+def test_senal_que_no_llega():
+    c = ControlAdaptivo(minimo=5)
+    for _ in range(4):
+        c.observar_carga('ficha', 1.0, True)
+    for _ in range(6):
+        c.observar_carga('ficha', 12.0, False)
+    assert c.estado != 'normal'
+
+
+def test_un_solo_listado_vacio_no_es_riesgo():
+    c = ControlAdaptivo()
+    c.observar_busqueda('vacio')
+    assert c.riesgo() == 0.0
+
+
+def test_concurrencia_y_tope_por_nivel():
+    c = ControlAdaptivo()
+    assert (c.concurrencia(4), c.escala, c.fraccion_tope) == (4, 1.0, 1.0)
+    c.nivel = 1
+    assert (c.concurrencia(4), c.escala, c.fraccion_tope) == (2, 2.0, 0.6)
+    c.nivel = 2
+    assert c.concurrencia(4) == 1  # siempre queda uno
+
+
+def test_ritmo_escala_las_pausas_con_el_control():
+    c = ControlAdaptivo()
+    r = Ritmo(presupuestos={'clic': (1, 1)}, control=c)
+    assert r._sorteo('clic') == 1
+    c.nivel = 2
+    assert r._sorteo('clic') == 4
+
+
+def test_turno_devuelve_false_si_se_pide_cortar():
+    r = Ritmo(por_minuto=1, por_hora=0)
+    assert r.turno()
+    detener = threading.Event()
+    detener.set()
+    assert r.turno(detener) is False
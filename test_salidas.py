@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Pruebas de salidas.py: JSONL de la campana, exportaciones y CSV por distrito."""
+import csv
+import json
+
+import pytest
+
+from salidas import (ArchivosDistrito, abrir_parquet, agregar_jsonl, exportar_json, exportar_parquet, leer_jsonl,
+                     leer_registros, migrar_json)
+
+
+def test_leer_jsonl_saltea_lineas_rotas_y_arranca_desde_un_byte(tmp_path):
+    ruta = tmp_path / 'campana.jsonl'
+    ruta.write_text('{"name": "Uno"}\n\n{"name": "Do\n{"name": "Tres"}\n', encoding='utf-8')
+    assert [r['name'] for r in leer_jsonl(str(ruta))] == ['Uno', 'Tres']
+
+    desde = len('{"name": "Uno"}\n'.encode('utf-8'))
+    assert [r['name'] for r in leer_jsonl(str(ruta), desde)] == ['Tres']
+
+
+def test_agregar_jsonl_cierra_la_linea_a_medias(tmp_path):
+    ruta = tmp_path / 'campana.jsonl'
+    ruta.write_text('{"name": "Uno"}\n{"name": "Do', encoding='utf-8')
+    assert agregar_jsonl(str(ruta), [{'name': 'Tres', 'rating': 4.5}]) == 1
+    assert [r['name'] for r in leer_jsonl(str(ruta))] == ['Uno', 'Tres']
+
+
+def test_exportar_json_arma_el_arreglo(tmp_path):
+    origen = tmp_path / 'campana.jsonl'
+    registros = [{'name': 'Ñandú', 'emails': ['a@b.pe']}, {'name': 'Dos', 'rating': 4.0}]
+    agregar_jsonl(str(origen), registros)
+
+    assert exportar_json(str(origen)) == 2
+    destino = tmp_path / 'campana.json'
+    assert json.loads(destino.read_text(encoding='utf-8')) == registros
+    assert 'Ñandú' in destino.read_text(encoding='utf-8')   # sin escapar
+    assert not (tmp_path / 'campana.json.tmp').exists()
+    assert list(leer_registros(str(destino))) == registros
+
+
+def test_exportar_json_vacio(tmp_path):
+    origen = tmp_path / 'vacia.jsonl'
+    origen.write_text('', encoding='utf-8')
+    destino = tmp_path / 'otra.json'
+    assert exportar_json(str(origen), str(destino)) == 0
+    assert json.loads(destino.read_text(encoding='utf-8')) == []
+
+
+def test_migrar_json_de_una_campana_vieja(tmp_path):
+    prefijo = str(tmp_path / 'campana')
+    registros = [{'name': 'Uno'}, {'name': 'Dos'}]
+    with open(f'{prefijo}.json', 'w', encoding='utf-8') as f:
+        json.dump(registros, f)
+    assert migrar_json(prefijo) == 2
+    assert list(leer_jsonl(f'{prefijo}.jsonl')) == registros
+    assert migrar_json(prefijo) == 0   # ya tiene su .jsonl: no se pisa
+
+
+def test_parquet_con_esquema_fijo_y_particiones(tmp_path):
+    pytest.importorskip('pyarrow')
+    registros = [
+        {'place_id': '0x1:0x1', 'name': 'Uno', 'rating': '4,5', 'review_count': '120',
+         'phone': 'N/A', 'emails': "['a@uno.pe']", 'timestamp': '2024-05-01T10:00:00',
+         'department': 'Lima', 'district': 'Surco', 'search_keyword': 'contador', 'extra': 'x'},
+        {'place_id': '0x2:0x2', 'name': 'Dos', 'rating': 'N/A', 'review_count': 0,
+         'emails': [], 'department': 'Lima', 'district': 'Lince', 'search_keyword': 'contador'},
+    ]
+    directorio = str(tmp_path / 'parquet')
+    assert exportar_parquet(registros, directorio, tanda=1) == 2
+    assert exportar_parquet(registros[:1], directorio) == 1   # agrega, no pisa
+
+    tabla = abrir_parquet(directorio).to_table()
+    assert tabla.num_rows == 3 and 'extra' not in tabla.column_names
+    filas = sorted(tabla.to_pylist(), key=lambda r: (r['name'], r['district']))
+    assert filas[0]['rating'] is None and filas[0]['emails'] == []
+    assert filas[1]['rating'] == 4.5 and filas[1]['review_count'] == 120
+    assert filas[1]['phone'] is None and filas[1]['emails'] == ['a@uno.pe']
+    assert filas[1]['district'] == 'Surco'
+
+
+def filas_csv(ruta):
+    with open(ruta, encoding='utf-8-sig', newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def test_csv_por_distrito_solo_agrega_lo_nuevo(tmp_path):
+    archivos = ArchivosDistrito(str(tmp_path / 'gmb_results'))
+    uno = {'name': 'Uno', 'address': 'Av 1', 'search_keyword': 'b'}
+    dos = {'name': 'Dos', 'address': 'Av 2', 'search_keyword': 'a'}
+    assert archivos.agregar('Surco', [uno, dos, dict(uno)]) == 2
+    assert archivos.agregar('Surco', [{'name': 'UNO', 'address': 'av 1'}]) == 0
+
+    # Columna nueva: se reescribe con el encabezado ampliado
+    assert archivos.agregar('Surco', [{'name': 'Tres', 'address': 'Av 3', 'phone': '01 1'}]) == 1
+    filas = filas_csv(archivos.ruta('Surco'))
+    assert [f['name'] for f in filas] == ['Uno', 'Dos', 'Tres']
+    assert filas[0]['phone'] == '' and filas[2]['phone'] == '01 1'
+
+    assert archivos.distritos() == ['Surco']
+    assert archivos.finalizar() == 1
+    assert [f['name'] for f in filas_csv(archivos.ruta('Surco'))] == ['Tres', 'Dos', 'Uno']
+    archivos.cerrar()
+
+
+def test_csv_por_distrito_editado_a_mano_rearma_el_indice(tmp_path):
+    archivos = ArchivosDistrito(str(tmp_path / 'gmb_results'))
+    archivos.agregar('Lince', [{'name': 'Uno', 'address': 'Av 1'}])
+    with open(archivos.ruta('Lince'), 'w', newline='', encoding='utf-8-sig') as f:
+        f.write('name,address\r\nOtro,Av 9\r\n')
+
+    assert archivos.agregar('Lince', [{'name': 'Uno', 'address': 'Av 1'},
+                                      {'name': 'Otro', 'address': 'Av 9'}]) == 1
+    assert [f['name'] for f in filas_csv(archivos.ruta('Lince'))] == ['Otro', 'Uno']
+    archivos.cerrar()
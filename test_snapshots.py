@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""Pruebas de snapshots.py: archivo de capturas y re-extraccion sin Chrome."""
+import os
+
+from snapshots import ArchivoSnapshots, ficha_desde_snapshot
+
+PANEL = """<!DOCTYPE html><html lang="es"><head><meta charset="utf-8"></head><body>
+<div role="main" aria-label="Resultados"><h1>Resultados</h1>
+  <div class="Nv2PK"><div class="F7nice"><span>4,1</span><span>(9.999)</span></div></div>
+</div>
+<div role="main" aria-label="Laney Contadores">
+  <h1 class="DUwDvf lfPIob">Laney Contadores</h1>
+  <div class="F7nice"><span><span aria-hidden="true">4,8</span><span role="img" aria-label="4,8 estrellas"></span></span><span><span role="img" aria-label="1.204 opiniones">(1.204)</span></span></div>
+  <button class="DkEaL" jsaction="pane.rating.category">Asesor contable</button>
+  <button class="CsEnBe" data-item-id="address" aria-label="Dirección: Av. Javier Prado Este 492, San Isidro"><div>Av. Javier Prado Este 492, San Isidro</div></button>
+  <div class="t39EBf GUrTXd" role="button" aria-label="lunes, De 9 a.m. a 6 p.m.; sábado, Cerrado, Copiar el horario de atención"></div>
+  <a class="CsEnBe" data-item-id="authority" href="https://laney.com.pe/" aria-label="Sitio web: laney.com.pe"></a>
+  <button class="CsEnBe" data-item-id="phone:tel:014405566" aria-label="Teléfono: 01 4405566"></button>
+  <div class="Io6YTe">ventas@laney.com.pe</div>
+</div></body></html>"""
+
+
+def test_nombre_archivo_valido_en_cualquier_sistema():
+    assert ArchivoSnapshots.nombre_archivo('0x91:0x1a') == '0x91_0x1a.html.gz'
+    sin_id = ArchivoSnapshots.nombre_archivo('', 'https://maps/place/x')
+    assert sin_id.endswith('.html.gz') and len(sin_id) == 16 + len('.html.gz')
+    assert sin_id == ArchivoSnapshots.nombre_archivo(None, 'https://maps/place/x')
+
+
+def test_guardar_y_recorrer(tmp_path):
+    archivo = ArchivoSnapshots(str(tmp_path / 'capturas'))
+    archivo.guardar('0x2:0xb', '<p>dos</p>', {'href': 'h2'})
+    archivo.guardar('0x1:0xa', '<p>uno\ncon salto</p>', {'href': 'h1', 'query': 'q'})
+    assert not [n for n in os.listdir(archivo.directorio) if n.endswith('.tmp')]
+
+    capturas = list(archivo)
+    assert [m['place_id'] for m, _ in capturas] == ['0x1:0xa', '0x2:0xb']
+    assert capturas[0] == ({'href': 'h1', 'query': 'q', 'place_id': '0x1:0xa'},
+                           '<p>uno\ncon salto</p>')
+
+
+def test_ficha_desde_snapshot():
+    meta = {'place_id': '0x1:0xa', 'location': 'San Isidro, Lima, Lima',
+            'query': 'estudio contable en San Isidro', 'timestamp': '2024-05-01T10:00:00'}
+    registro, emails = ficha_desde_snapshot(meta, PANEL)
+
+    assert registro['name'] == 'Laney Contadores'
+    # El rating y las opiniones salen del panel, no de la tarjeta del listado
+    assert registro['rating'] == 4.8 and registro['review_count'] == 1204
+    assert registro['address'] == 'Av. Javier Prado Este 492, San Isidro'
+    assert registro['phone'] == '01 4405566'
+    assert registro['website'] == 'https://laney.com.pe/'
+    assert registro['category'] == 'Asesor contable'
+    assert registro['hours'] == 'lunes, De 9 a.m. a 6 p.m.; sábado, Cerrado'
+    assert (registro['district'], registro['province'], registro['department']) == \
+        ('San Isidro', 'Lima', 'Lima')
+    assert registro['place_id'] == '0x1:0xa' and registro['email'] == 'N/A'
+    assert emails == ['ventas@laney.com.pe']